@@ -4,6 +4,7 @@ Configuration settings for the application
 from pydantic_settings import BaseSettings
 from typing import List
 import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -29,6 +30,41 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Chat recommendations: BM25 relevance blended with popularity
+    RECOMMEND_BM25_K1: float = 1.2
+    RECOMMEND_BM25_B: float = 0.75
+    RECOMMEND_TEXT_WEIGHT: float = 2.5
+    RECOMMEND_POPULARITY_WEIGHT: float = 1.0
+    # Boost (points) for a restaurant at the top of the user's personalized list
+    RECOMMEND_PERSONAL_WEIGHT: float = 40.0
+    # Shared on-disk snapshot of the recommendation index (empty = per-worker index only)
+    RECOMMEND_SNAPSHOT_DIR: str = os.path.join(tempfile.gettempdir(), "smart-travel-recommend")
+
+    # Retention: anonymous chat sessions idle this long, used/expired OTP codes and sent or
+    # failed outbox e-mails this old are deleted by a background job, RETENTION_BATCH_SIZE
+    # rows per transaction
+    RETENTION_ANON_CHAT_DAYS: int = 30
+    RETENTION_OTP_HOURS: int = 24
+    RETENTION_OUTBOX_DAYS: int = 7
+    RETENTION_BATCH_SIZE: int = 500
+
+    # Rate limits (per worker process, see app/core/rate_limit.py); OTP e-mails are also
+    # limited per address by OTP_RESEND_LIMIT_PER_HOUR
+    RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_PER_MINUTE: int = 10
+    LOGIN_IP_RATE_LIMIT_PER_MINUTE: int = 30
+    OTP_IP_RATE_LIMIT_PER_HOUR: int = 20
+
+    # Uploaded images: "gcs" (bucket GCS_BUCKET_NAME) or "local" (files under STORAGE_LOCAL_DIR,
+    # served at STORAGE_LOCAL_BASE_URL; for development and benchmarks)
+    STORAGE_BACKEND: str = "gcs"
+    STORAGE_LOCAL_DIR: str = "./uploads"
+    STORAGE_LOCAL_BASE_URL: str = "http://localhost:8000/uploads"
+    STORAGE_MAX_CONCURRENCY: int = 8
+    # Uploaded images are stored as resized variants (see app/core/images.py): "webp" or "jpeg"
+    IMAGE_VARIANT_FORMAT: str = "webp"
+    IMAGE_PROCESS_WORKERS: int = 2
+
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:5173,https://smart-travel-frontend-85676926926.asia-southeast1.run.app,https://habi.software"
     
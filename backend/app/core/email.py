@@ -23,9 +23,12 @@ def _smtp_settings() -> tuple[str, int, str | None, str | None]:
     return host, port, (user.strip() if user else None), (password.strip() if password else None)
 
 
-def send_email(*, to_email: str, subject: str, html: str, text: str | None = None) -> None:
-    host, port, user, password = _smtp_settings()
+def _smtp_starttls() -> bool:
+    # Disable only for a local stand-in server (tests / development).
+    return os.environ.get("BREVO_SMTP_STARTTLS", "true").strip().lower() not in ("0", "false", "no")
+
 
+def build_message(*, to_email: str, subject: str, html: str, text: str | None = None) -> EmailMessage:
     from_email = os.environ.get("EMAIL_FROM", "noreply@habi.software").strip()
     from_name = os.environ.get("EMAIL_FROM_NAME", "Smart Travel").strip()
     from_header = f"{from_name} <{from_email}>" if from_name else from_email
@@ -40,14 +43,30 @@ def send_email(*, to_email: str, subject: str, html: str, text: str | None = Non
         message.add_alternative(html, subtype="html")
     else:
         message.add_alternative(html, subtype="html")
+    return message
 
-    context = ssl.create_default_context()
-    with smtplib.SMTP(host, port, timeout=20) as server:
-        server.ehlo()
-        server.starttls(context=context)
+
+def open_smtp() -> smtplib.SMTP:
+    """A connected (and, if configured, STARTTLS-secured and logged in) SMTP session."""
+    host, port, user, password = _smtp_settings()
+    server = smtplib.SMTP(host, port, timeout=20)
+    try:
         server.ehlo()
+        if _smtp_starttls():
+            server.starttls(context=ssl.create_default_context())
+            server.ehlo()
         if user and password:
             server.login(user, password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_email(*, to_email: str, subject: str, html: str, text: str | None = None) -> None:
+    """Send one message on a fresh SMTP session (see ``app.core.outbox`` for queued sending)."""
+    message = build_message(to_email=to_email, subject=subject, html=html, text=text)
+    with open_smtp() as server:
         server.send_message(message)
 
 
@@ -0,0 +1,194 @@
+"""
+Geospatial helpers: geohash grid cells + vectorized haversine distance.
+
+Restaurants store the geohash of their coordinates in an indexed ``geo_cell`` column.
+A radius query is answered in two steps:
+
+1. candidate generation: a handful of geohash prefixes covering the search circle,
+   each turned into an index-friendly range predicate on ``geo_cell``;
+2. refinement: exact great-circle distances for the candidates, computed with NumPy.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 7  # ~150m x 150m cells
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {ch: i for i, ch in enumerate(_BASE32)}
+
+# Max cells we are willing to OR together for one query before falling back to a coarser level.
+_MAX_COVER_CELLS = 16
+
+
+def encode_geohash(lat: Optional[float], lng: Optional[float], precision: int = GEOHASH_PRECISION) -> Optional[str]:
+    if lat is None or lng is None:
+        return None
+    try:
+        lat_f = float(lat)
+        lng_f = float(lng)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat_f <= 90.0 and -180.0 <= lng_f <= 180.0):
+        return None
+
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    out: list[str] = []
+    bit = 0
+    ch = 0
+    even = True
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng_f >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat_f >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            out.append(_BASE32[ch])
+            bit = 0
+            ch = 0
+    return "".join(out)
+
+
+def cell_size_deg(precision: int) -> tuple[float, float]:
+    """(lat_height, lng_width) of a geohash cell in degrees."""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2**lat_bits), 360.0 / (2**lng_bits)
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(0.01, math.cos(math.radians(lat)))
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    return (
+        max(-90.0, lat - dlat),
+        min(90.0, lat + dlat),
+        max(-180.0, lng - dlng),
+        min(180.0, lng + dlng),
+    )
+
+
+def _cells_at(precision: int, min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> list[str]:
+    cell_h, cell_w = cell_size_deg(precision)
+    n_lat = int((max_lat - min_lat) / cell_h) + 2
+    n_lng = int((max_lng - min_lng) / cell_w) + 2
+    cells: list[str] = []
+    for i in range(n_lat):
+        lat = min(max_lat, min_lat + i * cell_h)
+        for j in range(n_lng):
+            lng = min(max_lng, min_lng + j * cell_w)
+            cell = encode_geohash(lat, lng, precision)
+            if cell and cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def cells_for_bbox(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> list[str]:
+    """Smallest set (<= _MAX_COVER_CELLS) of equal-length geohash prefixes covering a bbox."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_h, cell_w = cell_size_deg(precision)
+        n_lat = int((max_lat - min_lat) / cell_h) + 2
+        n_lng = int((max_lng - min_lng) / cell_w) + 2
+        if n_lat * n_lng > _MAX_COVER_CELLS:
+            continue
+        return _cells_at(precision, min_lat, max_lat, min_lng, max_lng)
+    return [""]
+
+
+def covering_cells(lat: float, lng: float, radius_km: float) -> list[str]:
+    return cells_for_bbox(*bounding_box(lat, lng, radius_km))
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest geohash string greater than every string starting with ``prefix``."""
+    chars = list(prefix)
+    while chars:
+        idx = _BASE32_INDEX.get(chars[-1])
+        if idx is not None and idx + 1 < len(_BASE32):
+            chars[-1] = _BASE32[idx + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+class GeoGrid:
+    """
+    Compact in-memory geohash index for radius candidate lookup.
+
+    Item positions are sorted by their geohash cell (fixed-width bytes), so the items of one
+    cell are a contiguous slice found with two binary searches. Two flat arrays, no per-item
+    Python objects.
+    """
+
+    def __init__(self, cells: np.ndarray, order: np.ndarray, precision: int):
+        self.cells = cells  # sorted geohash cells, dtype S<precision>
+        self.order = order  # item positions in cell order
+        self.precision = precision
+
+    @classmethod
+    def from_points(cls, lats: np.ndarray, lngs: np.ndarray, precision: int = 5) -> "GeoGrid":
+        positions: list[int] = []
+        cells: list[str] = []
+        for pos, (lat, lng) in enumerate(zip(lats.tolist(), lngs.tolist())):
+            cell = None if math.isnan(lat) or math.isnan(lng) else encode_geohash(lat, lng, precision)
+            if cell:
+                positions.append(pos)
+                cells.append(cell)
+        cell_array = np.asarray(cells, dtype=f"S{precision}")
+        order = np.argsort(cell_array, kind="stable")
+        return cls(cell_array[order], np.asarray(positions, dtype=np.uint32)[order], precision)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.cells.nbytes + self.order.nbytes)
+
+    def query(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions in the cells covering the circle (superset; refine with haversine_km)."""
+        slices: list[np.ndarray] = []
+        for cell in _cells_at(self.precision, *bounding_box(lat, lng, radius_km)):
+            key = cell.encode("ascii")
+            lo = int(np.searchsorted(self.cells, key, side="left"))
+            hi = int(np.searchsorted(self.cells, key, side="right"))
+            if hi > lo:
+                slices.append(self.order[lo:hi])
+        if not slices:
+            return np.empty(0, dtype=np.uint32)
+        return np.concatenate(slices)
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) from one point to arrays of points."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def format_distance(distance_km: float) -> str:
+    if distance_km < 1.0:
+        return f"{int(round(distance_km * 1000))} m"
+    return f"{distance_km:.1f} km"
@@ -0,0 +1,126 @@
+"""
+Image variants for uploads.
+
+Uploaded images are decoded once and re-encoded into fixed-size variants (``VARIANTS``: the
+longest side is scaled down to the given size, never up) in ``IMAGE_VARIANT_FORMAT``. EXIF
+orientation is applied first, then nothing but pixels is written back, so camera metadata
+(GPS, device, ...) never reaches the bucket. Only the variants are stored, not the original.
+
+Decoding and encoding are CPU-bound, so they run in a small process pool
+(``IMAGE_PROCESS_WORKERS`` processes, started on first use) instead of on the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Sequence, Union
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.core import scheduler
+from app.core.config import settings
+from app.core.storage import get_storage
+
+VARIANTS = {"thumb": 160, "card": 480, "full": 1600}
+_ACCEPTED_FORMATS = {"JPEG", "MPO", "PNG", "WEBP", "GIF"}
+_MAX_PIXELS = 40_000_000  # reject decompression bombs before decoding
+_QUALITY = {"WEBP": 80, "JPEG": 85}
+_FORMATS = {"webp": ("WEBP", "webp", "image/webp"), "jpeg": ("JPEG", "jpg", "image/jpeg")}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _output_format() -> tuple[str, str, str]:
+    return _FORMATS.get(settings.IMAGE_VARIANT_FORMAT.lower(), _FORMATS["webp"])
+
+
+def render_variants(source: Union[bytes, str], names: Sequence[str], fmt: str) -> dict[str, bytes]:
+    """Encode ``source`` (image bytes or a file path) into the named variants (runs in a worker process)."""
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            if img.format not in _ACCEPTED_FORMATS:
+                raise InvalidImage(f"unsupported format {img.format}")
+            if img.width * img.height > _MAX_PIXELS:
+                raise InvalidImage("image too large")
+            img.seek(0)  # first frame of animations
+            base = ImageOps.exif_transpose(img)
+            base.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError, SyntaxError) as exc:
+        raise InvalidImage(str(exc)) from None
+
+    has_alpha = base.mode in ("RGBA", "LA") or (base.mode == "P" and "transparency" in base.info)
+    if fmt == "WEBP" and has_alpha:
+        base = base.convert("RGBA")
+    elif has_alpha:
+        rgba = base.convert("RGBA")
+        base = Image.new("RGB", rgba.size, (255, 255, 255))
+        base.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        base = base.convert("RGB")
+
+    out: dict[str, bytes] = {}
+    for name in names:
+        size = VARIANTS[name]
+        variant = base.copy()
+        variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        variant.save(buf, format=fmt, quality=_QUALITY[fmt], optimize=fmt == "JPEG")
+        out[name] = buf.getvalue()
+    return out
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and thread pools is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.IMAGE_PROCESS_WORKERS), mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def make_variants(source: Union[bytes, str], names: Sequence[str] = tuple(VARIANTS)) -> dict[str, bytes]:
+    """Encoded variants of ``source`` (bytes, or a path the worker reads itself, so uploads
+    streamed to disk are never loaded in this process); raises ``InvalidImage`` if it is not
+    a usable image."""
+    global _pool
+    fmt = _output_format()[0]
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), render_variants, source, tuple(names), fmt)
+    except BrokenProcessPool:
+        _pool = None  # a worker died (e.g. out of memory); start a fresh pool next time
+        raise
+
+
+def variant_objects(object_base: str, variants: dict[str, bytes]) -> list[tuple[str, bytes, str]]:
+    """Storage items ``{object_base}_{name}.{ext}`` for ``ObjectStorage.upload_many``."""
+    _, ext, content_type = _output_format()
+    return [(f"{object_base}_{name}.{ext}", data, content_type) for name, data in variants.items()]
+
+
+async def store_variants(
+    object_base: str, source: Union[bytes, str], names: Sequence[str] = tuple(VARIANTS)
+) -> dict[str, str]:
+    """Make and upload the variants of one image; returns their URLs by variant name."""
+    variants = await make_variants(source, names)
+    urls = await get_storage().upload_many(variant_objects(object_base, variants))
+    return dict(zip(variants, urls))
+
+
+async def _shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.shutdown, True, cancel_futures=True)
+
+
+scheduler.at_stop(_shutdown)
@@ -0,0 +1,95 @@
+"""
+Single-writer leases for periodic jobs.
+
+Every worker (and every instance) runs the scheduler, but jobs that rewrite shared tables
+(similar restaurants, personalized candidates, trending scores) must have one writer at a
+time. Such a job calls ``acquire(name, ttl)`` on each tick: it returns the job's state when
+this process holds the lease (a row of ``job_leases``, claimed with a conditional UPDATE and
+renewed on every tick), otherwise None and the tick is skipped. A writer that dies only
+stalls the job until its lease expires.
+
+The row also keeps the job's own bookkeeping (``last_run_at``, ``watermark``), so "when did
+the last full run happen" survives a run that produced no rows.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, String, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal, Base
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobLease(Base):
+    __tablename__ = "job_leases"
+
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(100), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    last_run_at = Column(DateTime, nullable=True)  # last full run of the job
+    watermark = Column(DateTime, nullable=True)  # job-defined progress marker
+
+
+@dataclass
+class LeaseState:
+    last_run_at: Optional[datetime]
+    watermark: Optional[datetime]
+
+
+async def acquire(name: str, ttl_seconds: float) -> Optional[LeaseState]:
+    """Claim or renew the lease on ``name``; the job's state if this process holds it."""
+    now = datetime.utcnow()
+    until = now + timedelta(seconds=ttl_seconds)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(JobLease)
+            .where(
+                JobLease.name == name,
+                or_(JobLease.holder == HOLDER, JobLease.lease_until.is_(None), JobLease.lease_until < now),
+            )
+            .values(holder=HOLDER, lease_until=until)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            if (await db.execute(select(JobLease.name).where(JobLease.name == name))).scalar() is not None:
+                return None  # held by another process
+            db.add(JobLease(name=name, holder=HOLDER, lease_until=until))
+            try:
+                await db.commit()
+            except IntegrityError:
+                return None  # another process created it first
+            return LeaseState(last_run_at=None, watermark=None)
+        row = (await db.execute(select(JobLease.last_run_at, JobLease.watermark).where(JobLease.name == name))).one()
+        await db.commit()
+        return LeaseState(last_run_at=row.last_run_at, watermark=row.watermark)
+
+
+async def record(
+    db: AsyncSession, name: str, *, last_run_at: Optional[datetime] = None, watermark: Optional[datetime] = None
+) -> bool:
+    """Store the job's bookkeeping in ``db``'s transaction, next to the job's own writes.
+
+    Returns False if this process no longer holds the lease: the caller should roll back.
+    """
+    values: dict = {"lease_until": JobLease.lease_until}
+    if last_run_at is not None:
+        values["last_run_at"] = last_run_at
+    if watermark is not None:
+        values["watermark"] = watermark
+    result = await db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.holder == HOLDER)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return bool(result.rowcount)
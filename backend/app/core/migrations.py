@@ -13,6 +13,8 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from app.core.config import settings
+from app.core.geo import encode_geohash
+from app.modules.restaurants.models import rank_score_for
 
 
 def _clamp_int(value: Any, lo: int, hi: int) -> int | None:
@@ -83,6 +85,32 @@ def _build_restaurant_description(
     return " • ".join(parts)
 
 
+async def _backfill_geo_cells(conn) -> None:
+    result = await conn.execute(
+        text(
+            """
+            SELECT id, latitude, longitude
+            FROM restaurants
+            WHERE geo_cell IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+            """
+        )
+    )
+    params = []
+    for row in result.fetchall():
+        cell = encode_geohash(row[1], row[2])
+        if cell:
+            params.append({"id": row[0], "geo_cell": cell})
+    if params:
+        await conn.execute(text("UPDATE restaurants SET geo_cell = :geo_cell WHERE id = :id"), params)
+
+
+async def _backfill_rank_scores(conn) -> None:
+    result = await conn.execute(text("SELECT id, rating, review_count FROM restaurants WHERE rank_score IS NULL"))
+    params = [{"id": row[0], "rank_score": rank_score_for(row[1], row[2])} for row in result.fetchall()]
+    if params:
+        await conn.execute(text("UPDATE restaurants SET rank_score = :rank_score WHERE id = :id"), params)
+
+
 async def run_migrations(engine: AsyncEngine) -> None:
     if settings.CLOUD_SQL_CONNECTION_NAME:
         await _run_postgres_migrations(engine)
@@ -98,6 +126,44 @@ async def _run_postgres_migrations(engine: AsyncEngine) -> None:
         await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS description_generated BOOLEAN DEFAULT TRUE"))
         await conn.execute(text("ALTER TABLE restaurants ALTER COLUMN description_generated SET DEFAULT TRUE"))
 
+        # Incremental catalog import (source key + content hash)
+        await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS source_id VARCHAR(255)"))
+        await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"))
+        await conn.execute(
+            text("CREATE UNIQUE INDEX IF NOT EXISTS ix_restaurants_source_id ON restaurants (source_id)")
+        )
+
+        # Geospatial grid index (geohash cell)
+        await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS geo_cell VARCHAR(12)"))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_restaurants_geo_cell ON restaurants (geo_cell)"))
+        await _backfill_geo_cells(conn)
+
+        # Trending feed (time-decayed activity score)
+        await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS trending_score DOUBLE PRECISION DEFAULT 0"))
+        await conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_restaurants_active_trending ON restaurants (is_active, trending_score)"
+            )
+        )
+
+        # Bayesian rank score for rating sorts (keyset-paginated listing)
+        await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS rank_score DOUBLE PRECISION"))
+        await _backfill_rank_scores(conn)
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_restaurants_active_rank ON restaurants (is_active, rank_score, id)")
+        )
+
+        # Resized variants of uploaded restaurant images
+        await conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS image_variants JSON"))
+
+        # Keyset pagination of chat history and messages
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_chat_messages_session_created ON chat_messages (session_id, created_at, id)")
+        )
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_updated ON chat_sessions (user_id, updated_at, id)")
+        )
+
         # Menu approval workflow
         await conn.execute(text("ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS is_approved BOOLEAN DEFAULT TRUE"))
 
@@ -193,6 +259,39 @@ async def _run_sqlite_migrations(engine: AsyncEngine) -> None:
             await conn.execute(text("ALTER TABLE restaurants ADD COLUMN rating_override FLOAT"))
         if "description_generated" not in columns:
             await conn.execute(text("ALTER TABLE restaurants ADD COLUMN description_generated BOOLEAN DEFAULT 1"))
+        if "source_id" not in columns:
+            await conn.execute(text("ALTER TABLE restaurants ADD COLUMN source_id VARCHAR(255)"))
+        if "content_hash" not in columns:
+            await conn.execute(text("ALTER TABLE restaurants ADD COLUMN content_hash VARCHAR(64)"))
+        await conn.execute(
+            text("CREATE UNIQUE INDEX IF NOT EXISTS ix_restaurants_source_id ON restaurants (source_id)")
+        )
+        if "geo_cell" not in columns:
+            await conn.execute(text("ALTER TABLE restaurants ADD COLUMN geo_cell VARCHAR(12)"))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_restaurants_geo_cell ON restaurants (geo_cell)"))
+        await _backfill_geo_cells(conn)
+        if "trending_score" not in columns:
+            await conn.execute(text("ALTER TABLE restaurants ADD COLUMN trending_score FLOAT DEFAULT 0"))
+        await conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_restaurants_active_trending ON restaurants (is_active, trending_score)"
+            )
+        )
+        if "rank_score" not in columns:
+            await conn.execute(text("ALTER TABLE restaurants ADD COLUMN rank_score FLOAT"))
+        if "image_variants" not in columns:
+            await conn.execute(text("ALTER TABLE restaurants ADD COLUMN image_variants JSON"))
+        await _backfill_rank_scores(conn)
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_restaurants_active_rank ON restaurants (is_active, rank_score, id)")
+        )
+
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_chat_messages_session_created ON chat_messages (session_id, created_at, id)")
+        )
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_updated ON chat_sessions (user_id, updated_at, id)")
+        )
 
         result = await conn.execute(text("PRAGMA table_info(menu_items)"))
         columns = {row[1] for row in result.fetchall()}
@@ -0,0 +1,255 @@
+"""
+Transactional e-mail outbox.
+
+Request handlers call ``enqueue_email`` with their DB session: the message is a row of
+``email_outbox`` committed together with whatever produced it (e.g. the OTP code), and the
+request returns without talking to SMTP.
+
+A periodic job on every worker claims due rows in batches (claiming pushes
+``next_attempt_at`` ``_LEASE_SECONDS`` ahead, so a row is sent by one worker, and a worker
+that dies mid-batch only delays its rows) and sends them over one authenticated SMTP
+connection per worker that is kept open between batches. Failed sends are retried with
+exponential backoff up to ``_MAX_ATTEMPTS``; permanent (5xx) rejections and messages past
+their ``expires_at`` are not retried. Bodies are cleared once a row is final, so delivered
+OTP codes are not left in plain text.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import enum
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import scheduler
+from app.core.database import AsyncSessionLocal, Base
+from app.core.email import build_message, open_smtp
+
+logger = logging.getLogger(__name__)
+
+_POLL_SECONDS = 1.0
+_BATCH_SIZE = 50
+_LEASE_SECONDS = 300
+_MAX_ATTEMPTS = 6
+_BACKOFF_BASE_SECONDS = 30
+_BACKOFF_MAX_SECONDS = 3600
+_IDLE_CHECK_SECONDS = 30  # NOOP an idle connection before reusing it
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (Index("ix_email_outbox_status_next", "status", "next_attempt_at"),)
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html = Column(Text, nullable=False)
+    text = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default=OutboxStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    claim_token = Column(String(36), nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True)  # not worth sending after this
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+def enqueue_email(
+    db: AsyncSession,
+    *,
+    to_email: str,
+    subject: str,
+    html: str,
+    text: Optional[str] = None,
+    expires_at: Optional[datetime] = None,
+) -> EmailOutbox:
+    """Add a message to the outbox; it is sent after ``db`` commits."""
+    row = EmailOutbox(to_email=to_email, subject=subject, html=html, text=text, expires_at=expires_at)
+    db.add(row)
+    return row
+
+
+class SmtpConnection:
+    """One reusable SMTP session (connected, STARTTLS, logged in), reopened when it drops."""
+
+    def __init__(self) -> None:
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _ensure(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > _IDLE_CHECK_SECONDS:
+            try:
+                self._server.noop()
+            except (smtplib.SMTPException, OSError):
+                self._drop()
+        if self._server is None:
+            self._server = open_smtp()
+        return self._server
+
+    def _drop(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
+
+    def send(self, message: EmailMessage) -> None:
+        with self._lock:
+            try:
+                self._ensure().send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server closed an idle session: reconnect once.
+                self._drop()
+                self._ensure().send_message(message)
+            self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+
+@dataclass
+class _Result:
+    id: str
+    error: Optional[str] = None
+    permanent: bool = False
+
+
+def _send_batch(connection: SmtpConnection, rows: list[EmailOutbox]) -> list[_Result]:
+    results: list[_Result] = []
+    now = datetime.utcnow()
+    for pos, row in enumerate(rows):
+        if row.expires_at is not None and row.expires_at < now:
+            results.append(_Result(row.id, "expired before it could be sent", permanent=True))
+            continue
+        message = build_message(to_email=row.to_email, subject=row.subject, html=row.html, text=row.text)
+        try:
+            connection.send(message)
+        except smtplib.SMTPRecipientsRefused as exc:
+            results.append(_Result(row.id, repr(exc), permanent=True))
+        except smtplib.SMTPResponseException as exc:
+            results.append(_Result(row.id, repr(exc), permanent=exc.smtp_code >= 500))
+        except Exception as exc:
+            # Connection-level failure: the rest of the batch would fail the same way.
+            connection.close()
+            results.extend(_Result(r.id, repr(exc)) for r in rows[pos:])
+            break
+        else:
+            results.append(_Result(row.id))
+    return results
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), _BACKOFF_MAX_SECONDS))
+
+
+class OutboxSender:
+    def __init__(self) -> None:
+        self.connection = SmtpConnection()
+        self._lock = asyncio.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def _claim(self, limit: int) -> list[EmailOutbox]:
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        due = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == OutboxStatus.PENDING.value, EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(limit)
+        )
+        async with AsyncSessionLocal() as db:
+            # Re-checking the due condition makes concurrent claims of the same row exclusive.
+            await db.execute(
+                update(EmailOutbox)
+                .where(
+                    EmailOutbox.id.in_(due),
+                    EmailOutbox.status == OutboxStatus.PENDING.value,
+                    EmailOutbox.next_attempt_at <= now,
+                )
+                .values(claim_token=token, next_attempt_at=now + timedelta(seconds=_LEASE_SECONDS))
+                .execution_options(synchronize_session=False)
+            )
+            rows = (await db.execute(select(EmailOutbox).where(EmailOutbox.claim_token == token))).scalars().all()
+            await db.commit()
+        return list(rows)
+
+    async def _record(self, rows: list[EmailOutbox], results: list[_Result]) -> None:
+        now = datetime.utcnow()
+        attempts = {row.id: (row.attempts or 0) + 1 for row in rows}
+        sent = [r.id for r in results if r.error is None]
+        async with AsyncSessionLocal() as db:
+            if sent:
+                await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(sent))
+                    .values(
+                        status=OutboxStatus.SENT.value, attempts=EmailOutbox.attempts + 1, sent_at=now,
+                        html="", text=None, last_error=None, claim_token=None,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            for result in results:
+                if result.error is None:
+                    continue
+                tries = attempts[result.id]
+                values: dict = {"attempts": tries, "last_error": result.error[:1000], "claim_token": None}
+                if result.permanent or tries >= _MAX_ATTEMPTS:
+                    values.update(status=OutboxStatus.FAILED.value, html="", text=None)
+                    self.failed += 1
+                    logger.warning("Outbox e-mail %s failed permanently: %s", result.id, result.error)
+                else:
+                    values["next_attempt_at"] = now + _backoff(tries)
+                    self.retried += 1
+                await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id == result.id)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        self.sent += len(sent)
+
+    async def drain(self) -> None:
+        """Send due messages batch by batch until none are left."""
+        async with self._lock:
+            while True:
+                rows = await self._claim(_BATCH_SIZE)
+                if not rows:
+                    return
+                results = await asyncio.to_thread(_send_batch, self.connection, rows)
+                await self._record(rows, results)
+                if len(rows) < _BATCH_SIZE:
+                    return
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.connection.close)
+
+    def stats(self) -> dict[str, int]:
+        return {"sent": self.sent, "failed": self.failed, "retried": self.retried}
+
+
+sender = OutboxSender()
+scheduler.register("email-outbox", _POLL_SECONDS, sender.drain, initial_delay_seconds=2.0)
+scheduler.at_stop(sender.close)
@@ -0,0 +1,141 @@
+"""
+Request rate limiting.
+
+Limits are sliding windows ("at most ``limit`` requests per ``window_seconds``") counted per
+client IP and/or per e-mail address from the JSON body. ``rate_limit(...)`` builds a FastAPI
+dependency, so rejected requests never reach the endpoint (no DB query, no password hashing).
+A rejection raises ``RateLimitExceeded``, rendered by ``rate_limit_exceeded_handler`` as a
+429 with the usual ``error_response`` body and a ``Retry-After`` header.
+
+Counters live in a per-process ``MemoryBackend`` by default: with several workers each one
+counts on its own, so the effective limit is up to ``limit x workers``. A shared store (e.g.
+Redis) can be plugged in with ``set_backend`` by implementing ``RateLimitBackend.hit``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Optional, Protocol
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.shared.schemas import error_response
+
+
+class RateLimitBackend(Protocol):
+    async def hit(self, key: str, limit: int, window_seconds: float) -> float:
+        """Count one request for ``key``; returns 0 if allowed, else seconds until it would be.
+
+        Rejected requests are not counted, so a client that backs off recovers after the window.
+        """
+        ...
+
+
+class MemoryBackend:
+    """Exact sliding-window log per key, in this process; least recently used keys are evicted."""
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self._hits: OrderedDict[str, deque[float]] = OrderedDict()
+        self._max_keys = max_keys
+        self._lock = asyncio.Lock()
+
+    async def hit(self, key: str, limit: int, window_seconds: float) -> float:
+        async with self._lock:
+            now = time.monotonic()
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            else:
+                self._hits.move_to_end(key)
+            while hits and hits[0] <= now - window_seconds:
+                hits.popleft()
+            if len(hits) >= limit:
+                return hits[0] + window_seconds - now
+            hits.append(now)
+            while len(self._hits) > self._max_keys:
+                self._hits.popitem(last=False)
+            return 0.0
+
+    def reset(self) -> None:
+        self._hits.clear()
+
+
+_backend: RateLimitBackend = MemoryBackend()
+
+
+def set_backend(backend: RateLimitBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> RateLimitBackend:
+    return _backend
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, code: str, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.retry_after = retry_after
+
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content=error_response(exc.code, exc.message),
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+@dataclass(frozen=True)
+class Rule:
+    key: str  # "ip" or "email"
+    limit: int
+    window_seconds: float
+
+
+def client_ip(request: Request) -> str:
+    # Behind the load balancer the peer is the proxy; the last X-Forwarded-For hop is the
+    # address it saw (earlier hops are client-supplied and can be forged).
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        hop = forwarded.split(",")[-1].strip()
+        if hop:
+            return hop
+    return request.client.host if request.client else "unknown"
+
+
+async def _body_email(request: Request) -> Optional[str]:
+    try:
+        body = await request.json()
+    except Exception:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def rate_limit(scope: str, *rules: Rule, code: str, message: str) -> Callable:
+    """Dependency enforcing ``rules`` for the endpoint ``scope`` (a name shared by its rules)."""
+
+    async def _dep(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        email = await _body_email(request) if any(r.key == "email" for r in rules) else None
+        for rule in rules:
+            subject = client_ip(request) if rule.key == "ip" else email
+            if not subject or rule.limit <= 0:
+                continue
+            retry_after = await _backend.hit(
+                f"{scope}:{rule.key}:{rule.window_seconds:g}:{subject}", rule.limit, rule.window_seconds
+            )
+            if retry_after > 0:
+                raise RateLimitExceeded(code, message, retry_after)
+
+    return _dep
@@ -0,0 +1,160 @@
+"""
+Retention of short-lived rows.
+
+Anonymous chat sessions (``user_id`` NULL) not updated for ``RETENTION_ANON_CHAT_DAYS`` are
+deleted with their messages, and OTP codes that are consumed or expired are deleted once
+they are older than ``RETENTION_OTP_HOURS`` (never within the hour the OTP rate limits
+count). Sent or failed outbox e-mails are deleted after ``RETENTION_OUTBOX_DAYS``. Deletes
+run in batches of ``RETENTION_BATCH_SIZE``, each in its own short transaction with a pause
+in between, and at most ``_MAX_BATCHES_PER_RUN`` batches per kind per run, so the job never
+holds long locks on these hot tables; a larger backlog is worked off over the following
+runs.
+
+Deleting is idempotent, so every worker may run the job.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import scheduler
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.outbox import EmailOutbox, OutboxStatus
+from app.modules.auth.models import OtpCode
+from app.modules.chat.models import ChatMessage, ChatSession
+from app.modules.chat.persistence import turn_buffer
+
+logger = logging.getLogger(__name__)
+
+_INTERVAL_SECONDS = 3600
+_MAX_BATCHES_PER_RUN = 100
+_BATCH_PAUSE_SECONDS = 0.05
+_MIN_OTP_HOURS = 1  # OTP send limits count the codes created in the last hour
+
+_metrics: dict[str, Any] = {
+    "runs": 0,
+    "last_run_at": None,
+    "last_duration_ms": None,
+    "last_deleted": {},
+    "total_deleted": {"chat_sessions": 0, "chat_messages": 0, "otp_codes": 0, "email_outbox": 0},
+    "backlog": False,  # the last run stopped at _MAX_BATCHES_PER_RUN
+}
+
+
+async def delete_anonymous_sessions(db: AsyncSession, cutoff: datetime, batch_size: int) -> dict[str, int]:
+    """Delete one batch of idle anonymous sessions and their messages."""
+    ids = (
+        await db.execute(
+            select(ChatSession.id)
+            .where(ChatSession.user_id.is_(None), ChatSession.updated_at < cutoff)
+            .limit(batch_size)
+        )
+    ).scalars().all()
+    if not ids:
+        return {"chat_sessions": 0, "chat_messages": 0}
+    messages = await db.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(ids)))
+    sessions = await db.execute(delete(ChatSession).where(ChatSession.id.in_(ids)))
+    turn_buffer.forget(ids)
+    return {"chat_sessions": sessions.rowcount, "chat_messages": messages.rowcount}
+
+
+async def delete_used_otp_codes(db: AsyncSession, cutoff: datetime, now: datetime, batch_size: int) -> dict[str, int]:
+    """Delete one batch of consumed or expired OTP codes created before ``cutoff``."""
+    ids = (
+        await db.execute(
+            select(OtpCode.id)
+            .where(
+                OtpCode.created_at < cutoff,
+                or_(OtpCode.consumed_at.is_not(None), OtpCode.expires_at < now),
+            )
+            .limit(batch_size)
+        )
+    ).scalars().all()
+    if not ids:
+        return {"otp_codes": 0}
+    result = await db.execute(delete(OtpCode).where(OtpCode.id.in_(ids)))
+    return {"otp_codes": result.rowcount}
+
+
+async def delete_final_emails(db: AsyncSession, cutoff: datetime, batch_size: int) -> dict[str, int]:
+    """Delete one batch of sent or failed outbox e-mails created before ``cutoff``."""
+    ids = (
+        await db.execute(
+            select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status.in_([OutboxStatus.SENT.value, OutboxStatus.FAILED.value]),
+                EmailOutbox.created_at < cutoff,
+            )
+            .limit(batch_size)
+        )
+    ).scalars().all()
+    if not ids:
+        return {"email_outbox": 0}
+    result = await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(ids)))
+    return {"email_outbox": result.rowcount}
+
+
+async def _drain(
+    step: Callable[[AsyncSession], Awaitable[dict[str, int]]], table: str, batch_size: int
+) -> tuple[dict[str, int], bool]:
+    """Run ``step`` one transaction at a time until it deletes fewer than ``batch_size`` rows
+    of ``table``; returns the summed counts and whether ``_MAX_BATCHES_PER_RUN`` cut it short."""
+    totals: dict[str, int] = {}
+    for _ in range(_MAX_BATCHES_PER_RUN):
+        async with AsyncSessionLocal() as db:
+            counts = await step(db)
+            await db.commit()
+        for key, count in counts.items():
+            totals[key] = totals.get(key, 0) + count
+        if counts[table] < batch_size:
+            return totals, False
+        await asyncio.sleep(_BATCH_PAUSE_SECONDS)
+    return totals, True
+
+
+async def run_retention() -> dict[str, int]:
+    """One retention pass; returns the rows deleted per table."""
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    batch_size = max(1, settings.RETENTION_BATCH_SIZE)
+    chat_cutoff = now - timedelta(days=settings.RETENTION_ANON_CHAT_DAYS)
+    otp_cutoff = now - timedelta(hours=max(_MIN_OTP_HOURS, settings.RETENTION_OTP_HOURS))
+    outbox_cutoff = now - timedelta(days=settings.RETENTION_OUTBOX_DAYS)
+
+    chat, chat_backlog = await _drain(
+        lambda db: delete_anonymous_sessions(db, chat_cutoff, batch_size), "chat_sessions", batch_size
+    )
+    otp, otp_backlog = await _drain(
+        lambda db: delete_used_otp_codes(db, otp_cutoff, now, batch_size), "otp_codes", batch_size
+    )
+    emails, outbox_backlog = await _drain(
+        lambda db: delete_final_emails(db, outbox_cutoff, batch_size), "email_outbox", batch_size
+    )
+
+    deleted = {**chat, **otp, **emails}
+    _metrics["runs"] += 1
+    _metrics["last_run_at"] = now.isoformat()
+    _metrics["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _metrics["last_deleted"] = deleted
+    _metrics["backlog"] = chat_backlog or otp_backlog or outbox_backlog
+    for key, count in deleted.items():
+        _metrics["total_deleted"][key] += count
+    if any(deleted.values()):
+        logger.info("Retention deleted %s in %.0f ms", deleted, _metrics["last_duration_ms"])
+    return deleted
+
+
+def stats() -> dict[str, Any]:
+    """Counters of this worker's retention runs."""
+    return {**_metrics, "total_deleted": dict(_metrics["total_deleted"])}
+
+
+scheduler.register("retention", _INTERVAL_SECONDS, run_retention, initial_delay_seconds=60.0)
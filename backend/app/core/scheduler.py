@@ -0,0 +1,79 @@
+"""
+Minimal in-process periodic job runner.
+
+Jobs are registered at import time by the modules that own them and run as asyncio tasks
+for the lifetime of the app (started/stopped from the FastAPI lifespan). Every worker runs
+its own loop, so jobs that must run once per deployment coordinate through a lock of their
+own (e.g. a file lock or a DB row), not through the scheduler.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    interval_seconds: float
+    func: Callable[[], Awaitable[None]]
+    initial_delay_seconds: float = 0.0
+
+
+_jobs: dict[str, PeriodicJob] = {}
+_tasks: list[asyncio.Task] = []
+_stop_hooks: list[Callable[[], Awaitable[None]]] = []
+
+
+def register(
+    name: str,
+    interval_seconds: float,
+    func: Callable[[], Awaitable[None]],
+    initial_delay_seconds: float = 0.0,
+) -> PeriodicJob:
+    job = PeriodicJob(name, interval_seconds, func, initial_delay_seconds)
+    _jobs[name] = job
+    return job
+
+
+async def _run(job: PeriodicJob) -> None:
+    if job.initial_delay_seconds:
+        await asyncio.sleep(job.initial_delay_seconds)
+    while True:
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Periodic job %s failed", job.name)
+        await asyncio.sleep(job.interval_seconds)
+
+
+def at_stop(func: Callable[[], Awaitable[None]]) -> None:
+    """Run ``func`` on shutdown, after the periodic jobs are cancelled (e.g. a final flush)."""
+    _stop_hooks.append(func)
+
+
+def start(names: Optional[list[str]] = None) -> None:
+    if _tasks:
+        return
+    for job in _jobs.values():
+        if names is None or job.name in names:
+            _tasks.append(asyncio.create_task(_run(job), name=f"job:{job.name}"))
+
+
+async def stop() -> None:
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    for hook in _stop_hooks:
+        try:
+            await hook()
+        except Exception:
+            logger.exception("Shutdown hook %s failed", getattr(hook, "__qualname__", hook))
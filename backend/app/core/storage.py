@@ -0,0 +1,129 @@
+"""
+Object storage for uploaded images.
+
+``get_storage()`` returns the process-wide backend selected by ``STORAGE_BACKEND``:
+
+- ``gcs``: Google Cloud Storage bucket ``GCS_BUCKET_NAME``. The client (credentials, HTTP
+  session) is created once, on first upload, and shared by all requests.
+- ``local``: files under ``STORAGE_LOCAL_DIR``, served by the app at ``STORAGE_LOCAL_BASE_URL``
+  (for development and benchmarks; no Google dependency or credentials needed).
+
+Uploads run in worker threads; at most ``STORAGE_MAX_CONCURRENCY`` run at once across all
+requests, so a burst of multi-file uploads cannot exhaust the thread pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+
+_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ObjectStorage:
+    """Base class: subclasses implement the blocking ``_put`` and ``public_url``."""
+
+    def __init__(self, max_concurrency: int) -> None:
+        self._max_concurrency = max(1, max_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def public_url(self, object_name: str) -> str:
+        raise NotImplementedError
+
+    def _put(self, object_name: str, data: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+    async def upload(self, object_name: str, data: bytes, content_type: str) -> str:
+        """Store ``data`` as ``object_name``; returns its public URL."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        async with self._semaphore:
+            await asyncio.to_thread(self._put, object_name, data, content_type)
+        return self.public_url(object_name)
+
+    async def upload_many(self, items: list[tuple[str, bytes, str]]) -> list[str]:
+        """Upload (object name, data, content type) items concurrently; URLs in input order.
+
+        Raises the first failure once every upload has finished.
+        """
+        results = await asyncio.gather(*(self.upload(*item) for item in items), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
+
+
+class GcsStorage(ObjectStorage):
+    def __init__(self, bucket_name: str, max_concurrency: int) -> None:
+        super().__init__(max_concurrency)
+        self.bucket_name = bucket_name
+        self._bucket: Any = None
+        self._lock = threading.Lock()
+
+    def _get_bucket(self) -> Any:
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    from google.cloud import storage
+
+                    self._bucket = storage.Client().bucket(self.bucket_name)
+        return self._bucket
+
+    def public_url(self, object_name: str) -> str:
+        return f"https://storage.googleapis.com/{self.bucket_name}/{object_name}"
+
+    def _put(self, object_name: str, data: bytes, content_type: str) -> None:
+        blob = self._get_bucket().blob(object_name)
+        blob.cache_control = _CACHE_CONTROL
+        blob.upload_from_string(data, content_type=content_type)
+
+
+class LocalStorage(ObjectStorage):
+    def __init__(self, root: str, base_url: str, max_concurrency: int) -> None:
+        super().__init__(max_concurrency)
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+
+    def public_url(self, object_name: str) -> str:
+        return f"{self.base_url}/{object_name}"
+
+    def path_for(self, object_name: str) -> Path:
+        path = (self.root / object_name).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Invalid object name: {object_name!r}")
+        return path
+
+    def _put(self, object_name: str, data: bytes, content_type: str) -> None:
+        path = self.path_for(object_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+_storage: Optional[ObjectStorage] = None
+
+
+def get_storage() -> ObjectStorage:
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "local":
+            _storage = LocalStorage(
+                settings.STORAGE_LOCAL_DIR, settings.STORAGE_LOCAL_BASE_URL, settings.STORAGE_MAX_CONCURRENCY
+            )
+        else:
+            _storage = GcsStorage(
+                os.environ.get("GCS_BUCKET_NAME", "smart-travel-images-2025"), settings.STORAGE_MAX_CONCURRENCY
+            )
+    return _storage
@@ -0,0 +1,193 @@
+"""
+Streaming multipart uploads.
+
+``receive_files`` parses a ``multipart/form-data`` body while it arrives, instead of letting
+FastAPI read the whole form before the endpoint runs. File parts are written to temporary
+files chunk by chunk, so the memory an upload takes is bounded by the chunk size, and sizes
+are enforced as bytes arrive:
+
+- a file over ``max_file_bytes`` stops being written as soon as it crosses the limit and is
+  reported with ``too_large`` (its remaining bytes are read and discarded);
+- a body larger than ``max_files`` full-size files is rejected with ``UploadRejected`` before
+  anything is read when ``Content-Length`` says so, otherwise as soon as it crosses the limit.
+
+Endpoints take ``request: Request`` and declare their form with ``multipart_openapi`` so the
+docs still show the file field.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, BinaryIO, Optional
+
+import multipart
+from fastapi import Request
+from multipart.multipart import parse_options_header
+
+_PART_OVERHEAD = 16 * 1024  # boundary + part headers, per file, in the total body limit
+
+
+class UploadRejected(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+
+@dataclass
+class ReceivedFile:
+    field_name: str
+    filename: str
+    content_type: str
+    path: Optional[str] = None  # temporary file; removed when ``receive_files`` exits
+    size: int = 0
+    too_large: bool = False
+
+
+class _Parser:
+    def __init__(self, max_file_bytes: int, max_files: int) -> None:
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.files: list[ReceivedFile] = []
+        self._file: Optional[ReceivedFile] = None
+        self._handle: Optional[BinaryIO] = None
+        self._headers: dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._pending: list[tuple[BinaryIO, bytes]] = []
+        self._to_close: list[BinaryIO] = []
+
+    def on_part_begin(self) -> None:
+        self._file = None
+        self._handle = None
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"filename" not in options:
+            return  # plain form fields are ignored
+        if len(self.files) >= self.max_files:
+            raise UploadRejected(f"Tối đa {self.max_files} file mỗi lần upload")
+        content_type, _ = parse_options_header(self._headers.get(b"content-type", b""))
+        self._file = ReceivedFile(
+            field_name=options.get(b"name", b"").decode("utf-8", "replace"),
+            filename=options[b"filename"].decode("utf-8", "replace"),
+            content_type=content_type.decode("latin-1").lower(),
+        )
+        fd, self._file.path = tempfile.mkstemp(prefix="upload-")
+        self._handle = os.fdopen(fd, "wb")
+        self._to_close.append(self._handle)
+        self.files.append(self._file)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part, handle = self._file, self._handle
+        if part is None or handle is None or part.too_large:
+            return
+        part.size += end - start
+        if part.size > self.max_file_bytes:
+            part.too_large = True
+            return
+        self._pending.append((handle, data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self._handle is not None:
+            self._pending.append((self._handle, b""))  # b"" marks the file as complete
+
+    def take_pending(self) -> list[tuple[BinaryIO, bytes]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def cleanup(self) -> None:
+        for handle in self._to_close:
+            handle.close()
+        for part in self.files:
+            if part.path:
+                try:
+                    os.unlink(part.path)
+                except FileNotFoundError:
+                    pass
+
+
+def _write(pending: list[tuple[BinaryIO, bytes]]) -> None:
+    for handle, data in pending:
+        if data:
+            handle.write(data)
+        else:
+            handle.close()
+
+
+@asynccontextmanager
+async def receive_files(request: Request, *, max_file_bytes: int, max_files: int) -> AsyncIterator[list[ReceivedFile]]:
+    """Stream the request's file parts to temporary files; yields them in upload order."""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected("Yêu cầu phải là multipart/form-data")
+
+    max_total = max_files * (max_file_bytes + _PART_OVERHEAD)
+    too_large = f"Dung lượng upload vượt quá giới hạn (tối đa {max_files * max_file_bytes // (1024 * 1024)}MB)"
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_total:
+        raise UploadRejected(too_large)
+
+    state = _Parser(max_file_bytes, max_files)
+    parser = multipart.MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": state.on_part_begin,
+            "on_part_data": state.on_part_data,
+            "on_part_end": state.on_part_end,
+            "on_header_field": state.on_header_field,
+            "on_header_value": state.on_header_value,
+            "on_header_end": state.on_header_end,
+            "on_headers_finished": state.on_headers_finished,
+        },
+    )
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_total:
+                raise UploadRejected(too_large)
+            parser.write(chunk)
+            pending = state.take_pending()
+            if pending:
+                await asyncio.to_thread(_write, pending)
+        parser.finalize()
+        await asyncio.to_thread(_write, state.take_pending())
+        for part in state.files:
+            if part.too_large and part.path:
+                os.unlink(part.path)
+                part.path = None
+        yield state.files
+    finally:
+        await asyncio.to_thread(state.cleanup)
+
+
+def multipart_openapi(field: str, multiple: bool = False) -> dict[str, Any]:
+    """``openapi_extra`` documenting a multipart body with file field ``field``."""
+    item = {"type": "string", "format": "binary"}
+    schema = {"type": "array", "items": item} if multiple else item
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {"type": "object", "properties": {field: schema}, "required": [field]}
+                }
+            },
+        }
+    }
@@ -1,7 +1,6 @@
 """
 Authentication API routes
 """
-import asyncio
 import hashlib
 import hmac
 import json
@@ -14,7 +13,9 @@ from sqlalchemy import select, update, func
 from typing import Optional
 
 from app.core.database import get_db
-from app.core.email import render_otp_email, send_email
+from app.core.email import render_otp_email
+from app.core.outbox import enqueue_email
+from app.core.rate_limit import Rule, rate_limit
 from app.core.security import (
     verify_password,
     get_password_hash,
@@ -50,6 +51,25 @@ def _otp_settings() -> tuple[int, int, int]:
     return ttl_min, max_attempts, resend_limit
 
 
+_login_rate_limit = rate_limit(
+    "login",
+    Rule("ip", settings.LOGIN_IP_RATE_LIMIT_PER_MINUTE, 60),
+    Rule("email", settings.LOGIN_RATE_LIMIT_PER_MINUTE, 60),
+    code="E1018",
+    message="Bạn đã đăng nhập quá nhiều lần. Vui lòng thử lại sau.",
+)
+
+
+def _otp_rate_limit(purpose: OtpPurpose):
+    return rate_limit(
+        f"otp-{purpose.value}",
+        Rule("ip", settings.OTP_IP_RATE_LIMIT_PER_HOUR, 3600),
+        Rule("email", _otp_settings()[2], 3600),
+        code="E1011",
+        message="Bạn đã yêu cầu OTP quá nhiều lần. Vui lòng thử lại sau.",
+    )
+
+
 def _hash_otp(*, email: str, purpose: str, otp: str) -> str:
     key = (settings.SECRET_KEY or "otp").encode("utf-8")
     msg = f"{purpose}:{email.strip().lower()}:{otp.strip()}".encode("utf-8")
@@ -60,12 +80,14 @@ def _generate_otp() -> str:
     return f"{secrets.randbelow(1_000_000):06d}"
 
 
-async def _send_otp_email(*, email: str, otp: str, ttl_min: int, title: str) -> None:
+def _queue_otp_email(db: AsyncSession, *, email: str, otp: str, ttl_min: int, expires_at: datetime) -> None:
+    """Queue the OTP e-mail in the outbox; it is sent once the request's transaction commits."""
+    title = os.environ.get("EMAIL_FROM_NAME", "Smart Travel").strip() or "Smart Travel"
     subject, text, html = render_otp_email(code=otp, ttl_minutes=ttl_min, title=title)
-    await asyncio.to_thread(send_email, to_email=email, subject=subject, html=html, text=text)
+    enqueue_email(db, to_email=email, subject=subject, html=html, text=text, expires_at=expires_at)
 
 
-@router.post("/login", response_model=dict)
+@router.post("/login", response_model=dict, dependencies=[Depends(_login_rate_limit)])
 async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Login with email and password"""
     # Find user by email
@@ -93,7 +115,7 @@ async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     )
 
 
-@router.post("/register/start", response_model=dict)
+@router.post("/register/start", response_model=dict, dependencies=[Depends(_otp_rate_limit(OtpPurpose.REGISTER))])
 async def register_start(request: RegisterStartRequest, db: AsyncSession = Depends(get_db)):
     """Start registration flow by sending an OTP code to email."""
     email = request.email.strip().lower()
@@ -142,12 +164,7 @@ async def register_start(request: RegisterStartRequest, db: AsyncSession = Depen
         )
     )
 
-    title = os.environ.get("EMAIL_FROM_NAME", "Smart Travel").strip() or "Smart Travel"
-    try:
-        await _send_otp_email(email=email, otp=otp, ttl_min=ttl_min, title=title)
-    except Exception:
-        await db.rollback()
-        return error_response("E1012", "Gửi OTP thất bại. Vui lòng thử lại sau.")
+    _queue_otp_email(db, email=email, otp=otp, ttl_min=ttl_min, expires_at=now + timedelta(minutes=ttl_min))
 
     return success_response(data={"email": email}, message="Đã gửi OTP qua email")
 
@@ -268,7 +285,7 @@ async def register(request: RegisterRequest, db: AsyncSession = Depends(get_db))
     )
 
 
-@router.post("/forgot-password", response_model=dict)
+@router.post("/forgot-password", response_model=dict, dependencies=[Depends(_otp_rate_limit(OtpPurpose.RESET_PASSWORD))])
 async def forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Depends(get_db)):
     """Send OTP for resetting password. Always responds success for privacy."""
     email = request.email.strip().lower()
@@ -313,12 +330,7 @@ async def forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Dep
         )
     )
 
-    title = os.environ.get("EMAIL_FROM_NAME", "Smart Travel").strip() or "Smart Travel"
-    try:
-        await _send_otp_email(email=email, otp=otp, ttl_min=ttl_min, title=title)
-    except Exception:
-        await db.rollback()
-        return error_response("E1012", "Gửi OTP thất bại. Vui lòng thử lại sau.")
+    _queue_otp_email(db, email=email, otp=otp, ttl_min=ttl_min, expires_at=now + timedelta(minutes=ttl_min))
 
     return success_response(data={"email": email}, message="Đã gửi OTP đặt lại mật khẩu")
 
@@ -38,8 +38,8 @@ class Booking(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    user = relationship("User", back_populates="bookings")
-    restaurant = relationship("Restaurant", back_populates="bookings")
+    user = relationship("User")
+    restaurant = relationship("Restaurant")
     
     def generate_confirmation_code(self):
         """Generate unique confirmation code"""
@@ -11,7 +11,7 @@ from app.core.database import get_db
 from app.core.security import get_current_user_id
 from app.core.deps import require_admin_or_owner
 from app.modules.bookings.models import Booking, BookingStatus
-from app.modules.restaurants.models import Restaurant
+from app.modules.restaurants.models import Restaurant, card_image
 from app.modules.auth.models import User, UserRole
 from app.modules.bookings.schemas import (
     CreateBookingRequest,
@@ -73,7 +73,7 @@ async def get_bookings(
             booking_data["restaurant_name"] = restaurant.name
             booking_data["restaurant_address"] = restaurant.address
             booking_data["restaurant_phone"] = restaurant.phone
-            booking_data["restaurant_image"] = restaurant.image
+            booking_data["restaurant_image"] = card_image(restaurant.image, restaurant.image_variants)
         
         booking_list.append(booking_data)
     
@@ -115,7 +115,7 @@ async def get_booking(
         booking_data["restaurant_name"] = restaurant.name
         booking_data["restaurant_address"] = restaurant.address
         booking_data["restaurant_phone"] = restaurant.phone
-        booking_data["restaurant_image"] = restaurant.image
+        booking_data["restaurant_image"] = card_image(restaurant.image, restaurant.image_variants)
     
     return success_response(
         data=booking_data,
@@ -165,7 +165,7 @@ async def create_booking(
     booking_data["restaurant_name"] = restaurant.name
     booking_data["restaurant_address"] = restaurant.address
     booking_data["restaurant_phone"] = restaurant.phone
-    booking_data["restaurant_image"] = restaurant.image
+    booking_data["restaurant_image"] = card_image(restaurant.image, restaurant.image_variants)
     
     return success_response(
         data=booking_data,
@@ -316,7 +316,7 @@ async def get_bookings_for_restaurant(
         item["restaurant_name"] = restaurant.name
         item["restaurant_address"] = restaurant.address
         item["restaurant_phone"] = restaurant.phone
-        item["restaurant_image"] = restaurant.image
+        item["restaurant_image"] = card_image(restaurant.image, restaurant.image_variants)
         payload.append(item)
 
     return paginated_response(
@@ -361,6 +361,6 @@ async def update_booking_status(
     data["restaurant_name"] = restaurant.name
     data["restaurant_address"] = restaurant.address
     data["restaurant_phone"] = restaurant.phone
-    data["restaurant_image"] = restaurant.image
+    data["restaurant_image"] = card_image(restaurant.image, restaurant.image_variants)
 
     return success_response(data=data, message="Cập nhật trạng thái đặt bàn thành công")
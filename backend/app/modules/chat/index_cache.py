@@ -0,0 +1,134 @@
+"""
+Where the recommendation index lives at runtime.
+
+Without a snapshot directory every worker builds and caches its own index, rebuilt every
+``_CACHE_TTL_SECONDS``. With ``settings.RECOMMEND_SNAPSHOT_DIR`` set (the default), one
+process at a time builds the index and publishes it as a snapshot (see ``snapshot``); every
+worker maps the current snapshot read-only and hot-swaps to a newer one as soon as it is
+published, so N workers share one copy of the arrays and the build cost is paid once.
+
+A periodic job keeps the snapshot fresh; requests only fall back to building when no usable
+snapshot exists.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import scheduler
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.modules.chat import snapshot
+from app.modules.chat.recommender import RestaurantIndex, build_index, fetch_rows
+
+logger = logging.getLogger(__name__)
+
+_CACHE_TTL_SECONDS = 300
+_POLL_SECONDS = 5  # how often a worker looks for a newer snapshot
+_REFRESH_INTERVAL_SECONDS = 60
+_RESTAURANT_INDEX_CACHE: dict[str, Any] = {"ts": 0.0, "index": None, "version": None, "checked": 0.0}
+_lock = asyncio.Lock()
+
+
+def _snapshot_dir() -> Optional[Path]:
+    return Path(settings.RECOMMEND_SNAPSHOT_DIR) if settings.RECOMMEND_SNAPSHOT_DIR else None
+
+
+def _log_built(index: RestaurantIndex) -> None:
+    footprint = index.memory_footprint()
+    logger.info(
+        "Recommendation index built: %d restaurants, %d terms, %.1f MB (%.1f MB per 10k restaurants)",
+        footprint["restaurants"],
+        footprint["terms"],
+        footprint["total_bytes"] / 1e6,
+        footprint["bytes_per_10k_restaurants"] / 1e6,
+    )
+
+
+def _swap(index: RestaurantIndex, built: float, version: Optional[str]) -> RestaurantIndex:
+    # Readers hold their own reference, so replacing the cache entry is the whole swap.
+    _RESTAURANT_INDEX_CACHE["index"] = index
+    _RESTAURANT_INDEX_CACHE["ts"] = built
+    _RESTAURANT_INDEX_CACHE["version"] = version
+    return index
+
+
+async def _adopt_current(directory: Path) -> None:
+    """Switch to the published snapshot if it is newer than the one in use."""
+    version = snapshot.current_version(directory)
+    if version is None or version == _RESTAURANT_INDEX_CACHE["version"]:
+        return
+    try:
+        built = snapshot.built_at(directory, version)
+        index = await asyncio.to_thread(snapshot.load, directory, version)
+    except (OSError, KeyError, ValueError):
+        logger.exception("Could not load recommendation snapshot %s", version)
+        return
+    _swap(index, built, version)
+    logger.info("Recommendation index switched to snapshot %s (%d restaurants)", version, len(index))
+
+
+async def _rebuild(db: AsyncSession) -> RestaurantIndex:
+    directory = _snapshot_dir()
+    if directory is None:
+        index = await asyncio.to_thread(build_index, await fetch_rows(db))
+        _log_built(index)
+        return _swap(index, time.time(), None)
+
+    with snapshot.leader_lock(directory) as leader:
+        stale = _RESTAURANT_INDEX_CACHE["index"]
+        if not leader and stale is not None:
+            # Another process is publishing a fresh snapshot; keep serving until it lands.
+            return stale
+
+        built = time.time()
+        index = await asyncio.to_thread(build_index, await fetch_rows(db))
+        _log_built(index)
+        if not leader:
+            return _swap(index, built, None)
+        try:
+            version = await asyncio.to_thread(snapshot.write, directory, index, built)
+            index = await asyncio.to_thread(snapshot.load, directory, version)
+        except (OSError, ValueError):
+            logger.exception("Could not publish recommendation snapshot; using the in-process index")
+            return _swap(index, built, None)
+        return _swap(index, built, version)
+
+
+async def get_restaurant_index(db: AsyncSession) -> RestaurantIndex:
+    cached = _RESTAURANT_INDEX_CACHE
+    directory = _snapshot_dir()
+    now = time.time()
+    if directory is not None and now - cached["checked"] >= _POLL_SECONDS:
+        cached["checked"] = now
+        await _adopt_current(directory)
+
+    if cached["index"] is not None and now - cached["ts"] < _CACHE_TTL_SECONDS:
+        return cached["index"]
+
+    async with _lock:
+        if cached["index"] is not None and time.time() - cached["ts"] < _CACHE_TTL_SECONDS:
+            return cached["index"]
+        return await _rebuild(db)
+
+
+async def _refresh_snapshot() -> None:
+    """Republish the snapshot when it is missing or older than the TTL, then adopt it."""
+    directory = _snapshot_dir()
+    if directory is None:
+        return
+    age = snapshot.age_seconds(directory)
+    if age is None or age >= _CACHE_TTL_SECONDS:
+        async with _lock:
+            async with AsyncSessionLocal() as db:
+                await _rebuild(db)
+    await _adopt_current(directory)
+
+
+scheduler.register("recommend-snapshot", _REFRESH_INTERVAL_SECONDS, _refresh_snapshot, initial_delay_seconds=5.0)
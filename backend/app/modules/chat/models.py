@@ -1,7 +1,7 @@
 """
 Chat model
 """
-from sqlalchemy import Column, String, DateTime, Text, Boolean, JSON, ForeignKey, Enum
+from sqlalchemy import Column, String, DateTime, Text, Boolean, JSON, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -18,6 +18,7 @@ class MessageRole(str, enum.Enum):
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (Index("ix_chat_sessions_user_updated", "user_id", "updated_at", "id"),)
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String(36), ForeignKey("users.id"), nullable=True, index=True)
@@ -33,6 +34,7 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),)
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     session_id = Column(String(36), ForeignKey("chat_sessions.id"), nullable=False, index=True)
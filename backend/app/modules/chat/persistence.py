@@ -0,0 +1,220 @@
+"""
+Chat turn persistence.
+
+A chat turn is written as one batch: the session insert (or its ``updated_at`` bump) and
+both messages, with ids and timestamps assigned up front so nothing has to be flushed or
+refreshed to answer the request.
+
+Turns of anonymous sessions go through ``turn_buffer``, a per-process write-behind buffer
+flushed every ``_FLUSH_INTERVAL_SECONDS`` (and on shutdown), so anonymous chat latency does
+not wait on the database. Sessions created through the buffer are remembered by the process
+that created them for ``_KNOWN_TTL_SECONDS`` (far shorter than the retention window, so a
+remembered session cannot have been deleted meanwhile); another worker only sees them after
+the next flush. If a batch fails it is retried turn by turn, so one bad turn (e.g. for a
+session deleted by another worker) is dropped alone instead of taking the batch with it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import scheduler
+from app.core.database import AsyncSessionLocal
+from app.modules.chat.models import ChatMessage, ChatSession, MessageRole
+
+logger = logging.getLogger(__name__)
+
+_FLUSH_INTERVAL_SECONDS = 1.0
+_FLUSH_BATCH = 500  # pending turns that trigger an immediate flush
+_MAX_PENDING = 10_000  # oldest turns are dropped beyond this (e.g. while the DB is down)
+_MAX_KNOWN_SESSIONS = 50_000
+_KNOWN_TTL_SECONDS = 3600
+_MAX_ATTEMPTS = 3
+
+
+def session_title(message: str) -> str:
+    return message[:50] + "..." if len(message) > 50 else message
+
+
+@dataclass
+class ChatTurn:
+    chat_id: str
+    new_session: bool
+    user_id: Optional[str]
+    user_content: str
+    reply: str = ""
+    metadata: Optional[dict[str, Any]] = None
+    message_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    attempts: int = 0  # failed buffered flushes
+
+    @classmethod
+    def start(cls, chat_id: Optional[str], user_id: Optional[str], message: str) -> "ChatTurn":
+        return cls(chat_id=chat_id or str(uuid.uuid4()), new_session=not chat_id, user_id=user_id, user_content=message)
+
+    def finish(self, reply: str, metadata: Optional[dict[str, Any]]) -> None:
+        self.reply = reply
+        self.metadata = metadata
+        self.finished_at = datetime.utcnow()
+
+    def rows(self) -> list[Any]:
+        """ORM objects for this turn: the new session (if any) and both messages."""
+        rows: list[Any] = []
+        if self.new_session:
+            rows.append(
+                ChatSession(
+                    id=self.chat_id,
+                    user_id=self.user_id,
+                    title=session_title(self.user_content),
+                    created_at=self.started_at,
+                    updated_at=self.finished_at,
+                )
+            )
+        rows.append(
+            ChatMessage(
+                session_id=self.chat_id,
+                role=MessageRole.USER,
+                content=self.user_content,
+                created_at=self.started_at,
+            )
+        )
+        rows.append(
+            ChatMessage(
+                id=self.message_id,
+                session_id=self.chat_id,
+                role=MessageRole.ASSISTANT,
+                content=self.reply,
+                message_metadata=self.metadata,
+                created_at=self.finished_at,
+            )
+        )
+        return rows
+
+
+async def stage_turns(db: AsyncSession, turns: list[ChatTurn]) -> None:
+    """Add ``turns`` to ``db``: their rows plus one executemany ``updated_at`` bump."""
+    touched: dict[str, datetime] = {}
+    for turn in turns:
+        if not turn.new_session:
+            touched[turn.chat_id] = turn.finished_at
+        db.add_all(turn.rows())
+    if touched:
+        # Sessions created earlier in the same batch must exist before they are bumped.
+        await db.flush()
+        sessions = ChatSession.__table__
+        await db.execute(
+            update(sessions)
+            .where(sessions.c.id == bindparam("chat_id"))
+            .values(updated_at=bindparam("at")),
+            [{"chat_id": chat_id, "at": at} for chat_id, at in touched.items()],
+        )
+
+
+async def persist_turn(turn: ChatTurn) -> None:
+    async with AsyncSessionLocal() as db:
+        await stage_turns(db, [turn])
+        await db.commit()
+
+
+class TurnBuffer:
+    def __init__(self) -> None:
+        self._pending: list[ChatTurn] = []
+        self._sessions: OrderedDict[str, float] = OrderedDict()  # chat id -> last seen (monotonic)
+        self._lock = asyncio.Lock()
+        self.flushed = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def knows(self, chat_id: str) -> bool:
+        """Whether ``chat_id`` is an anonymous session this process created or saw recently."""
+        seen = self._sessions.get(chat_id)
+        return seen is not None and time.monotonic() - seen < _KNOWN_TTL_SECONDS
+
+    def remember(self, chat_id: str) -> None:
+        self._sessions[chat_id] = time.monotonic()
+        self._sessions.move_to_end(chat_id)
+        while len(self._sessions) > _MAX_KNOWN_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    def forget(self, chat_ids: Iterable[str]) -> None:
+        """Drop deleted sessions, so their next turn checks the database again."""
+        for chat_id in chat_ids:
+            self._sessions.pop(chat_id, None)
+
+    def add(self, turn: ChatTurn) -> None:
+        self.remember(turn.chat_id)
+        self._pending.append(turn)
+        if len(self._pending) > _MAX_PENDING:
+            overflow = len(self._pending) - _MAX_PENDING
+            del self._pending[:overflow]
+            self.dropped += overflow
+            logger.warning("Chat write-behind buffer full; dropped %d turns", overflow)
+        if len(self._pending) >= _FLUSH_BATCH and not self._lock.locked():
+            asyncio.get_running_loop().create_task(self.flush())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                async with AsyncSessionLocal() as db:
+                    await stage_turns(db, batch)
+                    await db.commit()
+            except Exception:
+                self.failures += 1
+                logger.exception("Flushing %d buffered chat turns failed; retrying turn by turn", len(batch))
+                await self._flush_each(batch)
+                return
+            self.flushed += len(batch)
+
+    async def _flush_each(self, batch: list[ChatTurn]) -> None:
+        """Persist ``batch`` one turn at a time (in order, so new sessions come first).
+
+        A turn the database rejects (integrity error) is dropped. On any other error the
+        database is presumably unavailable: the rest of the batch is requeued for the next
+        flush and dropped after ``_MAX_ATTEMPTS`` failed flushes.
+        """
+        for pos, turn in enumerate(batch):
+            try:
+                await persist_turn(turn)
+            except IntegrityError as exc:
+                self.dropped += 1
+                self.forget([turn.chat_id])
+                logger.warning("Dropped buffered chat turn for session %s: %s", turn.chat_id, exc.orig)
+                continue
+            except Exception:
+                retry = []
+                for rest in batch[pos:]:
+                    rest.attempts += 1
+                    if rest.attempts < _MAX_ATTEMPTS:
+                        retry.append(rest)
+                self.dropped += len(batch) - pos - len(retry)
+                self._pending[:0] = retry
+                return
+            self.flushed += 1
+
+
+turn_buffer = TurnBuffer()
+scheduler.register("chat-write-behind", _FLUSH_INTERVAL_SECONDS, turn_buffer.flush)
+scheduler.at_stop(turn_buffer.flush)
@@ -0,0 +1,683 @@
+"""
+Restaurant recommendation index for the chat assistant.
+
+Building the index (see ``index_cache`` for when and where that happens) does the heavy
+lifting once:
+
+- tokenization of every field, in folded (ascii) and diacritic (vi) form;
+- BM25F statistics: per-field weighted term frequencies, document length normalization and
+  IDF, folded into one precomputed score per (term, restaurant) posting;
+- popularity (rating + review volume), the trigram vocabulary for typo expansion and the
+  geohash grid for location queries.
+
+The index is a struct of arrays: strings packed into UTF-8 buffers, numeric attributes as
+NumPy columns, terms interned to integer ids and postings as term-major CSR matrices of
+uint32 positions. Scoring a query is a handful of vectorized operations over the posting
+rows of its (expanded) tokens plus ``argpartition`` for the top-k. How relevance is blended
+with popularity is configured through the ``RECOMMEND_*`` settings.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.geo import GeoGrid, haversine_km
+from app.modules.restaurants.models import Restaurant, card_image
+from app.modules.search.fuzzy import TrigramIndex
+from app.shared.ranking import popularity
+from app.shared.text import fold_diacritics, has_diacritics
+
+_TOKEN_RE_ASCII = re.compile(r"[a-z0-9]+")
+_TOKEN_RE_UNICODE = re.compile(r"[\w]+", flags=re.UNICODE)
+_DISTRICT_RE_ASCII = re.compile(r"\b(?:quan|q)\s*(\d{1,2})\b")
+_DISTRICT_RE_VI = re.compile(r"\bquận\s*(\d{1,2})\b")
+
+# BM25F field weights (a token in the name counts three times one in the description).
+_FIELD_WEIGHTS = {
+    "name": 3.0,
+    "cuisine": 2.0,
+    "specialty": 2.0,
+    "description": 1.0,
+    "address": 0.5,
+}
+_FUZZY_MATCH_WEIGHT = 0.7  # credit for a query token matched only through expansion
+_VI_TEXT_BOOST = 1.2  # exact-diacritics matches are a stronger signal
+_TEXT_SCALE = 100.0  # normalized relevance (0..1) -> points
+_PRICE_MISMATCH_PENALTY = 37.5
+_DISTANCE_WEIGHT = 60.0
+_DISTANCE_DECAY_KM = 2.0
+
+# Search radius for location-aware queries: an empty radius is widened (doubling) up to the max.
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 30.0
+
+_ADDRESS_STOP_TOKENS_ASCII = {
+    # Common location words that would cause false matches (e.g. "thành phố").
+    "thanh",
+    "pho",
+    "viet",
+    "nam",
+    "vietnam",
+    "tp",
+    "tphcm",
+    "hcm",
+    "ho",
+    "chi",
+    "minh",
+    "city",
+}
+
+
+def normalize_text(text: Any) -> str:
+    return fold_diacritics(text)
+
+
+def _terms_ascii(text: Any) -> list[str]:
+    """Folded tokens of ``text`` in order (with repeats, for term frequencies)."""
+    norm = normalize_text(text)
+    terms = [t for t in _TOKEN_RE_ASCII.findall(norm) if len(t) >= 2 and not t.isdigit()]
+    terms.extend(f"quan{num}" for num in _DISTRICT_RE_ASCII.findall(norm))
+    return terms
+
+
+def _terms_vi(text: Any) -> list[str]:
+    raw = str(text or "").lower()
+    terms = [t for t in _TOKEN_RE_UNICODE.findall(raw) if len(t) >= 2 and not t.isdigit() and "_" not in t]
+    terms.extend(f"quận{num}" for num in _DISTRICT_RE_VI.findall(raw))
+    return terms
+
+
+def tokenize_ascii(text: Any) -> set[str]:
+    return set(_terms_ascii(text))
+
+
+def tokenize_vi(text: Any) -> set[str]:
+    return set(_terms_vi(text))
+
+
+_ADDRESS_STOP_TOKENS_VI = {
+    "thành",
+    "phố",
+    "việt",
+    "nam",
+    "vietnam",
+    "tp",
+    "tphcm",
+    "hcm",
+    "hồ",
+    "chí",
+    "minh",
+    "city",
+}
+
+
+_QUERY_STOP_TOKENS_ASCII = {
+    "quan",
+    "gia",
+    "re",
+    "ngon",
+    "tot",
+    "an",
+    "tim",
+    "goi",
+    "y",
+    "gan",
+    "o",
+    "tai",
+    "cho",
+    "toi",
+    "minh",
+    "muon",
+    "can",
+    "nha",
+    "hang",
+}
+
+_QUERY_STOP_TOKENS_VI = {
+    "quán",
+    "quận",
+    "giá",
+    "rẻ",
+    "ngon",
+    "tốt",
+    "ăn",
+    "tìm",
+    "gợi",
+    "ý",
+    "gần",
+    "ở",
+    "tại",
+    "cho",
+    "tôi",
+    "mình",
+    "muốn",
+    "cần",
+    "nhà",
+    "hàng",
+}
+
+_FOOD_KEYWORDS_ASCII = {
+    "pho",
+    "bun",
+    "banh",
+    "mi",
+    "com",
+    "tam",
+    "lau",
+    "nuong",
+    "chay",
+    "cafe",
+    "tra",
+    "pizza",
+    "sushi",
+}
+
+
+def detect_price_preference(query_tokens: set[str]) -> tuple[Optional[int], Optional[int]]:
+    # Returns (min_price_level, max_price_level)
+    if {"re", "binh", "dan", "gia", "tiet"}.intersection(query_tokens):
+        return None, 2
+    if {"cao", "cap", "sang", "trong", "fine", "dining"}.intersection(query_tokens):
+        return 3, None
+    return None, None
+
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer plus offsets (no per-string Python objects)."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values: Iterable[str]) -> "StringColumn":
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes + self.offsets.nbytes)
+
+
+class Vocabulary(StringColumn):
+    """Interned terms: sorted, so a term's id is found by binary search over the packed bytes."""
+
+    __slots__ = ()
+
+    def id_of(self, term: str) -> Optional[int]:
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.raw(lo) == key:
+            return lo
+        return None
+
+
+class TermMatrix:
+    """
+    Term-major CSR matrix over interned term ids: row ``t`` holds the sorted positions of the
+    items containing term ``t`` (uint32) and a per-item value (BM25 weight, or 1.0 for plain
+    membership).
+    """
+
+    __slots__ = ("indptr", "indices", "data")
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_postings(cls, n_terms: int, postings: dict[int, list[tuple[int, float]]]) -> "TermMatrix":
+        counts = np.zeros(n_terms + 1, dtype=np.int64)
+        for term_id, row in postings.items():
+            counts[term_id + 1] = len(row)
+        indptr = np.cumsum(counts).astype(np.uint32)
+        indices = np.empty(int(indptr[-1]), dtype=np.uint32)
+        data = np.empty(int(indptr[-1]), dtype=np.float32)
+        for term_id, row in postings.items():
+            start, end = indptr[term_id], indptr[term_id + 1]
+            indices[start:end] = [pos for pos, _ in row]
+            data[start:end] = [value for _, value in row]
+        return cls(indptr, indices, data)
+
+    def row(self, term_id: Optional[int]) -> tuple[np.ndarray, np.ndarray]:
+        if term_id is None:
+            return _EMPTY_INDICES, _EMPTY_DATA
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def has_row(self, term_id: Optional[int]) -> bool:
+        return term_id is not None and self.indptr[term_id + 1] > self.indptr[term_id]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.indptr.nbytes + self.indices.nbytes + self.data.nbytes)
+
+
+_EMPTY_INDICES = np.empty(0, dtype=np.uint32)
+_EMPTY_DATA = np.empty(0, dtype=np.float32)
+
+
+def _bm25_postings(docs: list[dict[str, list[int]]]) -> dict[int, list[tuple[int, float]]]:
+    """
+    BM25F weights: per-field weighted term frequencies with length normalization, times IDF.
+
+    ``docs`` holds, per item, the term ids of each field in ``_FIELD_WEIGHTS``.
+    """
+    k1 = settings.RECOMMEND_BM25_K1
+    b = settings.RECOMMEND_BM25_B
+    weighted_tf: list[dict[int, float]] = []
+    lengths: list[float] = []
+    df: Counter[int] = Counter()
+    for fields in docs:
+        tf: dict[int, float] = {}
+        length = 0.0
+        for name, terms in fields.items():
+            weight = _FIELD_WEIGHTS[name]
+            length += weight * len(terms)
+            for term in terms:
+                tf[term] = tf.get(term, 0.0) + weight
+        weighted_tf.append(tf)
+        lengths.append(length)
+        df.update(tf.keys())
+
+    n_docs = len(docs)
+    avg_len = (sum(lengths) / n_docs) if n_docs else 1.0
+    idf = {term: math.log(1.0 + (n_docs - n + 0.5) / (n + 0.5)) for term, n in df.items()}
+
+    postings: dict[int, list[tuple[int, float]]] = {}
+    for pos, tf in enumerate(weighted_tf):
+        norm = k1 * (1.0 - b + b * lengths[pos] / max(avg_len, 1e-9))
+        for term, freq in tf.items():
+            postings.setdefault(term, []).append((pos, idf[term] * freq * (k1 + 1.0) / (freq + norm)))
+    return postings
+
+
+@dataclass
+class RestaurantIndex:
+    """Struct-of-arrays restaurant index; position ``i`` in every column is one restaurant."""
+
+    ids: StringColumn
+    names: StringColumn
+    cuisines: StringColumn
+    addresses: StringColumn
+    images: StringColumn
+    rating: np.ndarray
+    review_count: np.ndarray
+    price_level: np.ndarray
+    latitude: np.ndarray  # NaN when unknown
+    longitude: np.ndarray
+    popularity: np.ndarray
+    has_image: np.ndarray
+    vocab: Vocabulary  # every ascii and diacritic term
+    bm25_ascii: TermMatrix
+    bm25_vi: TermMatrix
+    food_ascii: TermMatrix  # membership of folded name/cuisine/specialty/description tokens
+    # Diacritic forms of folded terms: (folded term id, diacritic term id), sorted by folded id.
+    fold_keys: np.ndarray
+    fold_values: np.ndarray
+    grid: GeoGrid
+    trigrams: TrigramIndex = field(default_factory=TrigramIndex)  # ascii vocabulary
+    _positions: Optional[dict[str, int]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, ids: Iterable[str]) -> dict[str, int]:
+        """Positions of the given restaurant ids that are in the index."""
+        if self._positions is None:
+            self._positions = {self.ids[pos]: pos for pos in range(len(self))}
+        return {rid: self._positions[rid] for rid in ids if rid in self._positions}
+
+    def card(self, pos: int) -> dict[str, Any]:
+        """Display fields of one item."""
+        lat = float(self.latitude[pos])
+        lng = float(self.longitude[pos])
+        return {
+            "id": self.ids[pos],
+            "name": self.names[pos],
+            "cuisine": self.cuisines[pos],
+            "address": self.addresses[pos],
+            "image": self.images[pos],
+            "rating": float(self.rating[pos]),
+            "review_count": int(self.review_count[pos]),
+            "price_level": int(self.price_level[pos]),
+            "latitude": None if math.isnan(lat) else lat,
+            "longitude": None if math.isnan(lng) else lng,
+        }
+
+    def vi_forms(self, folded: str) -> list[str]:
+        term_id = self.vocab.id_of(folded)
+        if term_id is None:
+            return []
+        lo = int(np.searchsorted(self.fold_keys, term_id, side="left"))
+        hi = int(np.searchsorted(self.fold_keys, term_id, side="right"))
+        return [self.vocab[int(v)] for v in self.fold_values[lo:hi]]
+
+    def memory_footprint(self) -> dict[str, Any]:
+        """Bytes held by the index (arrays exactly, the trigram index approximately)."""
+        columns = (
+            self.ids, self.names, self.cuisines, self.addresses, self.images,
+            self.rating, self.review_count, self.price_level, self.latitude, self.longitude,
+            self.popularity, self.has_image, self.fold_keys, self.fold_values,
+        )
+        parts = {
+            "records": sum(int(c.nbytes) for c in columns),
+            "vocabulary": self.vocab.nbytes,
+            "postings": self.bm25_ascii.nbytes + self.bm25_vi.nbytes + self.food_ascii.nbytes,
+            "geo_grid": self.grid.nbytes,
+            "trigrams": self.trigrams.approx_nbytes(),
+        }
+        total = sum(parts.values())
+        n = len(self)
+        return {
+            "restaurants": n,
+            "terms": len(self.vocab),
+            "bytes": parts,
+            "total_bytes": total,
+            "bytes_per_10k_restaurants": int(total * 10_000 / n) if n else 0,
+        }
+
+
+def build_index(rows: Iterable[Any]) -> RestaurantIndex:
+    strings: dict[str, list[str]] = {k: [] for k in ("ids", "names", "cuisines", "addresses", "images")}
+    columns: dict[str, list[Any]] = {k: [] for k in ("rating", "review_count", "price_level", "latitude", "longitude")}
+    docs_ascii: list[dict[str, list[str]]] = []
+    docs_vi: list[dict[str, list[str]]] = []
+    for row in rows:
+        name = row[1] or ""
+        cuisine = row[2] or ""
+        address = row[3] or ""
+        description = row[4] or ""
+        specialty = row[5] if isinstance(row[5], list) else []
+        images = row[10] if isinstance(row[10], list) else []
+        specialty_text = " ".join([str(t) for t in specialty if t])
+
+        docs_ascii.append(
+            {
+                "name": _terms_ascii(name),
+                "cuisine": _terms_ascii(cuisine),
+                "specialty": _terms_ascii(specialty_text),
+                "description": _terms_ascii(description),
+                "address": [t for t in _terms_ascii(address) if t not in _ADDRESS_STOP_TOKENS_ASCII],
+            }
+        )
+        docs_vi.append(
+            {
+                "name": _terms_vi(name),
+                "cuisine": _terms_vi(cuisine),
+                "specialty": _terms_vi(specialty_text),
+                "description": _terms_vi(description),
+                "address": [t for t in _terms_vi(address) if t not in _ADDRESS_STOP_TOKENS_VI],
+            }
+        )
+
+        strings["ids"].append(str(row[0]))
+        strings["names"].append(name)
+        strings["cuisines"].append(cuisine)
+        strings["addresses"].append(address)
+        strings["images"].append(str(card_image(row[9] or (images[0] if images else ""), row[13]) or ""))
+        columns["price_level"].append(int(row[6] or 2))
+        columns["rating"].append(float(row[7] or 0.0))
+        columns["review_count"].append(int(row[8] or 0))
+        columns["latitude"].append(float(row[11]) if row[11] is not None else math.nan)
+        columns["longitude"].append(float(row[12]) if row[12] is not None else math.nan)
+
+    # Intern every term once; documents become lists of term ids.
+    terms = sorted(
+        {t for doc in docs_ascii for ts in doc.values() for t in ts}
+        | {t for doc in docs_vi for ts in doc.values() for t in ts}
+    )
+    term_ids = {t: i for i, t in enumerate(terms)}
+    ids_ascii = [{f: [term_ids[t] for t in ts] for f, ts in doc.items()} for doc in docs_ascii]
+    ids_vi = [{f: [term_ids[t] for t in ts] for f, ts in doc.items()} for doc in docs_vi]
+
+    food: dict[int, list[tuple[int, float]]] = {}
+    for pos, doc in enumerate(ids_ascii):
+        for term in {t for f, ts in doc.items() if f != "address" for t in ts}:
+            food.setdefault(term, []).append((pos, 1.0))
+
+    bm25_ascii = _bm25_postings(ids_ascii)
+    bm25_vi = _bm25_postings(ids_vi)
+    folds = sorted(
+        (term_ids[folded], vid)
+        for vid in bm25_vi
+        if (folded := normalize_text(terms[vid])) in term_ids and term_ids[folded] in bm25_ascii
+    )
+
+    rating = np.asarray(columns["rating"], dtype=np.float32)
+    review_count = np.asarray(columns["review_count"], dtype=np.uint32)
+    latitude = np.asarray(columns["latitude"], dtype=np.float64)
+    longitude = np.asarray(columns["longitude"], dtype=np.float64)
+    index = RestaurantIndex(
+        ids=StringColumn.from_strings(strings["ids"]),
+        names=StringColumn.from_strings(strings["names"]),
+        cuisines=StringColumn.from_strings(strings["cuisines"]),
+        addresses=StringColumn.from_strings(strings["addresses"]),
+        images=StringColumn.from_strings(strings["images"]),
+        rating=rating,
+        review_count=review_count,
+        price_level=np.asarray(columns["price_level"], dtype=np.int8),
+        latitude=latitude,
+        longitude=longitude,
+        popularity=popularity(rating, review_count).astype(np.float32),
+        has_image=np.fromiter((bool(i) for i in strings["images"]), dtype=bool, count=len(strings["images"])),
+        vocab=Vocabulary.from_strings(terms),
+        bm25_ascii=TermMatrix.from_postings(len(terms), bm25_ascii),
+        bm25_vi=TermMatrix.from_postings(len(terms), bm25_vi),
+        food_ascii=TermMatrix.from_postings(len(terms), food),
+        fold_keys=np.asarray([k for k, _ in folds], dtype=np.uint32),
+        fold_values=np.asarray([v for _, v in folds], dtype=np.uint32),
+        grid=GeoGrid.from_points(latitude, longitude),
+    )
+    for term_id in bm25_ascii:
+        index.trigrams.add(terms[term_id])
+    return index
+
+
+async def fetch_rows(db: AsyncSession) -> list[Any]:
+    """Rows expected by ``build_index``, for every active restaurant."""
+    result = await db.execute(
+        select(
+            Restaurant.id,
+            Restaurant.name,
+            Restaurant.cuisine,
+            Restaurant.address,
+            Restaurant.description,
+            Restaurant.specialty,
+            Restaurant.price_level,
+            Restaurant.rating,
+            Restaurant.review_count,
+            Restaurant.image,
+            Restaurant.images,
+            Restaurant.latitude,
+            Restaurant.longitude,
+            Restaurant.image_variants,
+        ).where(Restaurant.is_active == True)
+    )
+    return result.fetchall()
+
+
+# -- queries ---------------------------------------------------------------
+
+
+@dataclass
+class RecommendQuery:
+    text: str
+    use_vi: bool
+    groups: dict[str, set[str]]  # typed token -> index terms it may match
+    food_tokens: set[str]
+    min_price: Optional[int]
+    max_price: Optional[int]
+
+
+def _expand_ascii(index: RestaurantIndex, tokens: set[str]) -> dict[str, set[str]]:
+    """Query token -> index tokens it may match (itself if known, else nearest by edit distance)."""
+    return {t: set(index.trigrams.expand(t)) or {t} for t in tokens}
+
+
+def _expand_vi(index: RestaurantIndex, tokens: set[str]) -> dict[str, set[str]]:
+    """Like ``_expand_ascii`` for diacritic tokens; unknown ones are folded, corrected and re-toned."""
+    out: dict[str, set[str]] = {}
+    for t in tokens:
+        if index.bm25_vi.has_row(index.vocab.id_of(t)):
+            out[t] = {t}
+            continue
+        restored: set[str] = set()
+        for term in index.trigrams.expand(normalize_text(t)):
+            restored.update(index.vi_forms(term))
+        out[t] = restored or {t}
+    return out
+
+
+def parse_query(index: RestaurantIndex, message: str) -> RecommendQuery:
+    tokens_ascii = tokenize_ascii(message)
+    tokens_vi = tokenize_vi(message)
+    use_vi = has_diacritics(message) and bool(tokens_vi)
+
+    match_ascii = {t for t in tokens_ascii if t not in _QUERY_STOP_TOKENS_ASCII} or tokens_ascii
+    match_vi = {t for t in tokens_vi if t not in _QUERY_STOP_TOKENS_VI} or tokens_vi
+
+    min_price, max_price = detect_price_preference(tokens_ascii or tokens_vi)
+
+    # Typo tolerance / tone restoration: expand query tokens to nearby index vocabulary.
+    ascii_groups = _expand_ascii(index, match_ascii)
+    groups = _expand_vi(index, match_vi) if use_vi else ascii_groups
+    food_tokens = set().union(*ascii_groups.values()).intersection(_FOOD_KEYWORDS_ASCII) if ascii_groups else set()
+    return RecommendQuery(
+        text=normalize_text(message),
+        use_vi=use_vi,
+        groups=groups,
+        food_tokens=food_tokens,
+        min_price=min_price,
+        max_price=max_price,
+    )
+
+
+def relevance(index: RestaurantIndex, query: RecommendQuery) -> np.ndarray:
+    """BM25 relevance per item, normalized to 0..1 (1 = best possible hit for every query token)."""
+    matrix = index.bm25_vi if query.use_vi else index.bm25_ascii
+    n = len(index)
+    scores = np.zeros(n, dtype=np.float32)
+    ideal = 0.0
+    best = np.empty(n, dtype=np.float32)
+    for typed, terms in query.groups.items():
+        best.fill(0.0)
+        for term in terms:
+            indices, data = matrix.row(index.vocab.id_of(term))
+            if not len(indices):
+                continue
+            credit = 1.0 if term == typed else _FUZZY_MATCH_WEIGHT
+            np.maximum.at(best, indices, data * credit)
+        top = float(best.max()) if n else 0.0
+        if top > 0.0:
+            ideal += top
+            scores += best
+    if ideal > 0.0:
+        scores /= ideal
+    return scores
+
+
+def nearby_candidates(index: RestaurantIndex, lat: float, lng: float, radius_km: float) -> dict[int, float]:
+    """Item positions within ``radius_km`` (via the geohash grid) -> distance in km."""
+    positions = index.grid.query(lat, lng, radius_km).astype(np.int64)
+    if not len(positions):
+        return {}
+    dist = haversine_km(lat, lng, index.latitude[positions], index.longitude[positions])
+    keep = dist <= radius_km
+    return dict(zip(positions[keep].tolist(), dist[keep].tolist()))
+
+
+def widening_candidates(
+    index: RestaurantIndex, lat: float, lng: float, radius_km: float, max_radius_km: float = MAX_RADIUS_KM
+) -> tuple[dict[int, float], float]:
+    """``nearby_candidates`` with the radius doubled until something is found (up to
+    ``max_radius_km``); returns the candidates and the radius actually searched."""
+    while True:
+        distances = nearby_candidates(index, lat, lng, radius_km)
+        if distances or radius_km >= max_radius_km:
+            return distances, radius_km
+        radius_km = min(radius_km * 2.0, max_radius_km)
+
+
+def rank(
+    index: RestaurantIndex,
+    query: RecommendQuery,
+    distances: Optional[dict[int, float]] = None,
+    limit: int = 6,
+    min_filtered: int = 25,
+    affinity: Optional[dict[int, float]] = None,
+) -> list[int]:
+    """
+    Top ``limit`` item positions (with an image), best first.
+
+    ``distances`` (position -> km) is None without a location; otherwise only its positions
+    are eligible, so an empty map means nothing nearby (and no results).
+
+    ``affinity`` (position -> 0..1) is the caller's personalized boost, if any.
+    """
+    n = len(index)
+    if not n:
+        return []
+
+    mask = index.has_image.copy()
+    dist = None
+    if distances is not None:
+        dist = np.full(n, np.inf)
+        dist[np.fromiter(distances.keys(), dtype=np.int64)] = np.fromiter(distances.values(), dtype=np.float64)
+        mask &= np.isfinite(dist)
+    if query.food_tokens:
+        food = np.zeros(n, dtype=bool)
+        for term in query.food_tokens:
+            food[index.food_ascii.row(index.vocab.id_of(term))[0]] = True
+        # Only apply the hard filter when we still have enough candidates.
+        if int(np.count_nonzero(mask & food)) >= min_filtered:
+            mask &= food
+
+    text_weight = settings.RECOMMEND_TEXT_WEIGHT * (_VI_TEXT_BOOST if query.use_vi else 1.0) * _TEXT_SCALE
+    score = relevance(index, query) * text_weight + index.popularity * settings.RECOMMEND_POPULARITY_WEIGHT
+    if query.min_price is not None:
+        score -= (index.price_level < query.min_price) * _PRICE_MISMATCH_PENALTY
+    if query.max_price is not None:
+        score -= (index.price_level > query.max_price) * _PRICE_MISMATCH_PENALTY
+    if dist is not None:
+        score += _DISTANCE_WEIGHT * np.exp(-dist / _DISTANCE_DECAY_KM)
+    if affinity:
+        boost = np.fromiter(affinity.values(), dtype=np.float64, count=len(affinity))
+        score[np.fromiter(affinity.keys(), dtype=np.int64, count=len(affinity))] += (
+            settings.RECOMMEND_PERSONAL_WEIGHT * boost
+        )
+
+    candidates = np.flatnonzero(mask)
+    if len(candidates) > limit:
+        top = np.argpartition(-score[candidates], limit - 1)[:limit]
+        candidates = candidates[top]
+    return candidates[np.argsort(-score[candidates], kind="stable")].tolist()
@@ -1,31 +1,50 @@
 """
 Chat API routes
 """
-import math
-import re
-import time
-import unicodedata
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy import delete, select, update
+from starlette.background import BackgroundTask
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.deps import require_admin
+from app.core.geo import format_distance
 from app.core.security import get_current_user_id, get_current_user_id_optional
+from app.modules.auth.models import User
 from app.modules.chat.models import ChatSession, ChatMessage, MessageRole
-from app.modules.restaurants.models import Restaurant
+from app.modules.chat.persistence import ChatTurn, persist_turn, turn_buffer
+from app.modules.chat.index_cache import get_restaurant_index
+from app.modules.chat.recommender import (
+    DEFAULT_RADIUS_KM,
+    MAX_RADIUS_KM,
+    RecommendQuery,
+    parse_query,
+    rank,
+    widening_candidates,
+)
+from app.modules.restaurants.personalized import load_affinity
+from app.modules.users.models import UserAddress
 from app.modules.chat.schemas import (
     SendMessageRequest,
+    StreamMessageRequest,
     SendMessageResponse,
     ChatMessageResponse,
     ChatSessionResponse,
     ChatSessionDetailResponse
 )
-from app.shared.schemas import success_response, error_response
+from app.shared.pagination import after, decode_cursor, encode_cursor
+from app.shared.schemas import success_response, error_response, cursor_response
 from typing import Optional, Any
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
+logger = logging.getLogger(__name__)
 
 
 # Simple chatbot responses (in production, integrate with AI service)
@@ -59,235 +78,22 @@ def get_chatbot_response(message: str) -> tuple[str, list]:
     return CHATBOT_RESPONSES["default"].format(query=message), ["Tìm nhà hàng", "Đặt bàn", "Liên hệ hỗ trợ"]
 
 
-_TOKEN_RE_ASCII = re.compile(r"[a-z0-9]+")
-_TOKEN_RE_UNICODE = re.compile(r"[\w]+", flags=re.UNICODE)
-_DISTRICT_RE_ASCII = re.compile(r"\b(?:quan|q)\s*(\d{1,2})\b")
-_DISTRICT_RE_VI = re.compile(r"\bquận\s*(\d{1,2})\b")
-_CACHE_TTL_SECONDS = 300
-_RESTAURANT_INDEX_CACHE: dict[str, Any] = {"ts": 0.0, "items": []}
-_ADDRESS_STOP_TOKENS_ASCII = {
-    # Common location words that would cause false matches (e.g. "thành phố").
-    "thanh",
-    "pho",
-    "viet",
-    "nam",
-    "vietnam",
-    "tp",
-    "tphcm",
-    "hcm",
-    "ho",
-    "chi",
-    "minh",
-    "city",
-}
-
-
-def _normalize_text(text: Any) -> str:
-    raw = str(text or "")
-    normalized = unicodedata.normalize("NFKD", raw)
-    normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
-    return normalized.lower()
-
-
-def _tokenize_ascii(text: Any) -> set[str]:
-    norm = _normalize_text(text)
-    tokens = set(_TOKEN_RE_ASCII.findall(norm))
-    filtered = {t for t in tokens if len(t) >= 2 and not t.isdigit()}
-
-    for num in _DISTRICT_RE_ASCII.findall(norm):
-        filtered.add(f"quan{num}")
-
-    return filtered
-
-
-def _tokenize_vi(text: Any) -> set[str]:
-    raw = str(text or "").lower()
-    tokens = set(_TOKEN_RE_UNICODE.findall(raw))
-    filtered: set[str] = set()
-    for t in tokens:
-        if not t or t.isdigit() or len(t) < 2:
-            continue
-        if "_" in t:
-            continue
-        filtered.add(t)
-
-    for num in _DISTRICT_RE_VI.findall(raw):
-        filtered.add(f"quận{num}")
-
-    return filtered
-
-
-_ADDRESS_STOP_TOKENS_VI = {
-    "thành",
-    "phố",
-    "việt",
-    "nam",
-    "vietnam",
-    "tp",
-    "tphcm",
-    "hcm",
-    "hồ",
-    "chí",
-    "minh",
-    "city",
-}
-
-
-def _has_diacritics(text: str) -> bool:
-    return any(ord(ch) > 127 for ch in (text or ""))
-
-
-_QUERY_STOP_TOKENS_ASCII = {
-    "quan",
-    "gia",
-    "re",
-    "ngon",
-    "tot",
-    "an",
-    "tim",
-    "goi",
-    "y",
-    "gan",
-    "o",
-    "tai",
-    "cho",
-    "toi",
-    "minh",
-    "muon",
-    "can",
-    "nha",
-    "hang",
-}
-
-_QUERY_STOP_TOKENS_VI = {
-    "quán",
-    "quận",
-    "giá",
-    "rẻ",
-    "ngon",
-    "tốt",
-    "ăn",
-    "tìm",
-    "gợi",
-    "ý",
-    "gần",
-    "ở",
-    "tại",
-    "cho",
-    "tôi",
-    "mình",
-    "muốn",
-    "cần",
-    "nhà",
-    "hàng",
-}
-
-_FOOD_KEYWORDS_ASCII = {
-    "pho",
-    "bun",
-    "banh",
-    "mi",
-    "com",
-    "tam",
-    "lau",
-    "nuong",
-    "chay",
-    "cafe",
-    "tra",
-    "pizza",
-    "sushi",
-}
-
-
-def _detect_price_preference(query_tokens: set[str]) -> tuple[Optional[int], Optional[int]]:
-    # Returns (min_price_level, max_price_level)
-    if {"re", "binh", "dan", "gia", "tiet"}.intersection(query_tokens):
-        return None, 2
-    if {"cao", "cap", "sang", "trong", "fine", "dining"}.intersection(query_tokens):
-        return 3, None
-    return None, None
-
-
-async def _get_restaurant_index(db: AsyncSession) -> list[dict[str, Any]]:
-    now = time.time()
-    cached = _RESTAURANT_INDEX_CACHE
-    if cached.get("items") and now - float(cached.get("ts") or 0) < _CACHE_TTL_SECONDS:
-        return cached["items"]
-
+async def _default_location(db: AsyncSession, user_id: str) -> Optional[tuple[float, float]]:
+    """Coordinates of the user's default address (or any geocoded address)."""
     result = await db.execute(
-        select(
-            Restaurant.id,
-            Restaurant.name,
-            Restaurant.cuisine,
-            Restaurant.address,
-            Restaurant.description,
-            Restaurant.specialty,
-            Restaurant.price_level,
-            Restaurant.rating,
-            Restaurant.review_count,
-            Restaurant.image,
-            Restaurant.images,
-            Restaurant.latitude,
-            Restaurant.longitude,
-        ).where(Restaurant.is_active == True)
-    )
-    items: list[dict[str, Any]] = []
-    for row in result.fetchall():
-        rid = str(row[0])
-        name = row[1] or ""
-        cuisine = row[2] or ""
-        address = row[3] or ""
-        description = row[4] or ""
-        specialty = row[5] if isinstance(row[5], list) else []
-        price_level = int(row[6] or 2)
-        rating = float(row[7] or 0.0)
-        review_count = int(row[8] or 0)
-        image = row[9] or ""
-        images = row[10] if isinstance(row[10], list) else []
-        latitude = row[11]
-        longitude = row[12]
-
-        food_tokens_ascii = (
-            _tokenize_ascii(name)
-            | _tokenize_ascii(cuisine)
-            | _tokenize_ascii(description)
-            | _tokenize_ascii(" ".join([str(t) for t in specialty if t]))
-        )
-        address_tokens_ascii = _tokenize_ascii(address) - _ADDRESS_STOP_TOKENS_ASCII
-        tokens_ascii = food_tokens_ascii | address_tokens_ascii
-
-        address_tokens_vi = _tokenize_vi(address) - _ADDRESS_STOP_TOKENS_VI
-        tokens_vi = (
-            _tokenize_vi(name)
-            | _tokenize_vi(cuisine)
-            | _tokenize_vi(description)
-            | _tokenize_vi(" ".join([str(t) for t in specialty if t]))
-            | address_tokens_vi
-        )
-        items.append(
-            {
-                "id": rid,
-                "name": name,
-                "cuisine": cuisine,
-                "address": address,
-                "description": description,
-                "specialty": specialty,
-                "price_level": price_level,
-                "rating": rating,
-                "review_count": review_count,
-                "image": image,
-                "images": images,
-                "latitude": latitude,
-                "longitude": longitude,
-                "tokens_ascii": tokens_ascii,
-                "tokens_vi": tokens_vi,
-                "food_tokens_ascii": food_tokens_ascii,
-            }
+        select(UserAddress.latitude, UserAddress.longitude)
+        .where(
+            UserAddress.user_id == user_id,
+            UserAddress.latitude.is_not(None),
+            UserAddress.longitude.is_not(None),
         )
-
-    _RESTAURANT_INDEX_CACHE["ts"] = now
-    _RESTAURANT_INDEX_CACHE["items"] = items
-    return items
+        .order_by(UserAddress.is_default.desc(), UserAddress.updated_at.desc())
+        .limit(1)
+    )
+    row = result.first()
+    if not row:
+        return None
+    return float(row[0]), float(row[1])
 
 
 def _build_google_maps_url(place_id: str, lat: Any = None, lng: Any = None) -> str:
@@ -298,116 +104,128 @@ def _build_google_maps_url(place_id: str, lat: Any = None, lng: Any = None) -> s
     return ""
 
 
-def _score_restaurant(item: dict[str, Any], query_tokens: set[str], min_price: Optional[int], max_price: Optional[int]) -> float:
-    if not query_tokens:
-        match_score = 0.0
-    else:
-        match_score = (len(query_tokens.intersection(item.get("tokens_ascii", set()))) / max(1, len(query_tokens))) * 100.0
-
-    rating = float(item.get("rating") or 0.0)
-    review_count = int(item.get("review_count") or 0)
-    popularity = rating * 10.0 + math.log10(review_count + 1) * 8.0
-
-    price_level = int(item.get("price_level") or 2)
-    if min_price is not None and price_level < min_price:
-        match_score -= 15.0
-    if max_price is not None and price_level > max_price:
-        match_score -= 15.0
-
-    return match_score * 2.5 + popularity
-
-
 class RecommendRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=500)
     limit: int = Field(6, ge=1, le=12)
+    # Optional location; when omitted, the caller's default saved address is used.
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lng: Optional[float] = Field(None, ge=-180, le=180)
+    radius_km: float = Field(DEFAULT_RADIUS_KM, gt=0, le=MAX_RADIUS_KM)
+    use_saved_address: bool = True
+
+
+async def _resolve_location(
+    db: AsyncSession,
+    user_id: Optional[str],
+    lat: Optional[float],
+    lng: Optional[float],
+    use_saved_address: bool,
+) -> Optional[tuple[float, float]]:
+    if lat is not None and lng is not None:
+        return lat, lng
+    if user_id and use_saved_address:
+        return await _default_location(db, user_id)
+    return None
+
+
+async def _recommend(
+    db: AsyncSession,
+    user_id: Optional[str],
+    message: str,
+    limit: int,
+    location: Optional[tuple[float, float]],
+    radius_km: float,
+) -> tuple[RecommendQuery, list[dict[str, Any]], Optional[float]]:
+    """Parse ``message`` and return the query, the top ``limit`` restaurant cards and the
+    radius actually searched (None without a location).
+
+    With a location, only restaurants around it are ranked: if none lie within ``radius_km``
+    the radius is widened (see ``widening_candidates``), and if still none, no cards.
+    """
+    index = await get_restaurant_index(db)
+    query = parse_query(index, message)
+    distances: Optional[dict[int, float]] = None
+    searched_km: Optional[float] = None
+    if location is not None:
+        distances, searched_km = widening_candidates(index, location[0], location[1], radius_km)
+    affinity: dict[int, float] = {}
+    if user_id:
+        personal = await load_affinity(db, user_id)
+        affinity = {pos: personal[rid] for rid, pos in index.positions(personal).items()}
+    ranked = rank(
+        index,
+        query,
+        distances,
+        limit=limit,
+        min_filtered=limit if distances is not None else 25,
+        affinity=affinity,
+    )
+
+    picked: list[dict[str, Any]] = []
+    # Entries without any image are already skipped by the ranker to keep results attractive.
+    for pos in ranked:
+        card = index.card(pos)
+        rid = card["id"]
+        entry = {
+            "id": rid,
+            "name": card["name"],
+            "cuisine": card["cuisine"],
+            "address": card["address"],
+            "rating": round(card["rating"], 2),
+            "review_count": card["review_count"],
+            "price_level": card["price_level"],
+            "image": card["image"],
+            "google_maps_url": _build_google_maps_url(rid, card["latitude"], card["longitude"]),
+        }
+        if distances is not None and pos in distances:
+            entry["distance_km"] = round(distances[pos], 3)
+            entry["distance"] = format_distance(distances[pos])
+        picked.append(entry)
+    return query, picked, searched_km
+
+
+def _radius_note(requested_km: float, searched_km: float) -> str:
+    return (
+        f"Không có nhà hàng nào trong bán kính {requested_km:g} km quanh vị trí của bạn, "
+        f"mình đã mở rộng tìm kiếm đến {searched_km:g} km."
+    )
 
 
 @router.post("/recommend", response_model=dict)
 async def recommend_restaurants(
     request: RecommendRequest,
+    user_id: Optional[str] = Depends(get_current_user_id_optional),
     db: AsyncSession = Depends(get_db),
 ):
     raw_message = str(request.message or "").strip()
-    query_norm = _normalize_text(raw_message)
-    query_tokens_ascii = _tokenize_ascii(raw_message)
-    query_tokens_vi = _tokenize_vi(raw_message)
-    use_vi = _has_diacritics(raw_message) and bool(query_tokens_vi)
-
-    query_tokens_ascii_match = {t for t in query_tokens_ascii if t not in _QUERY_STOP_TOKENS_ASCII}
-    query_tokens_vi_match = {t for t in query_tokens_vi if t not in _QUERY_STOP_TOKENS_VI}
-    if not query_tokens_ascii_match:
-        query_tokens_ascii_match = query_tokens_ascii
-    if not query_tokens_vi_match:
-        query_tokens_vi_match = query_tokens_vi
-
-    query_tokens_for_price = query_tokens_ascii or query_tokens_vi
-    min_price, max_price = _detect_price_preference(query_tokens_for_price)
-
-    index = await _get_restaurant_index(db)
-    query_food_tokens = query_tokens_ascii_match.intersection(_FOOD_KEYWORDS_ASCII)
-    candidates = index
-    if query_food_tokens:
-        filtered = [item for item in index if query_food_tokens.intersection(item.get("food_tokens_ascii", set()))]
-        # Only apply the hard filter when we still have enough candidates.
-        if len(filtered) >= 25:
-            candidates = filtered
-
-    def score(item: dict[str, Any]) -> float:
-        if use_vi:
-            tokens = item.get("tokens_vi", set())
-            q = query_tokens_vi_match
-            match = (len(q.intersection(tokens)) / max(1, len(q))) * 100.0
-            # Small boost for exact diacritics match.
-            popularity = float(item.get("rating") or 0.0) * 10.0 + math.log10(int(item.get("review_count") or 0) + 1) * 8.0
-            price_level = int(item.get("price_level") or 2)
-            if min_price is not None and price_level < min_price:
-                match -= 15.0
-            if max_price is not None and price_level > max_price:
-                match -= 15.0
-            return match * 3.0 + popularity
-
-        return _score_restaurant(item, query_tokens_ascii_match, min_price, max_price)
-
-    ranked = sorted(candidates, key=score, reverse=True)
+    location = await _resolve_location(db, user_id, request.lat, request.lng, request.use_saved_address)
+    query, picked, searched_km = await _recommend(
+        db, user_id, raw_message, request.limit, location, request.radius_km
+    )
+    widened = searched_km is not None and searched_km > request.radius_km
 
-    picked: list[dict[str, Any]] = []
-    for item in ranked:
-        if len(picked) >= request.limit:
-            break
-        # Skip entries without any image to keep results attractive.
-        if not item.get("image") and not item.get("images"):
-            continue
-
-        rid = item["id"]
-        picked.append(
-            {
-                "id": rid,
-                "name": item.get("name") or "",
-                "cuisine": item.get("cuisine") or "",
-                "address": item.get("address") or "",
-                "rating": float(item.get("rating") or 0.0),
-                "review_count": int(item.get("review_count") or 0),
-                "price_level": int(item.get("price_level") or 2),
-                "image": item.get("image") or (item.get("images") or [""])[0],
-                "google_maps_url": _build_google_maps_url(rid, item.get("latitude"), item.get("longitude")),
-            }
+    if not picked and searched_km is not None:
+        reply = (
+            f"Mình chưa tìm được nhà hàng phù hợp trong bán kính {searched_km:g} km quanh vị trí của bạn.\n"
+            "Bạn thử tìm ở khu vực khác hoặc bỏ vị trí để tìm trên toàn thành phố nhé."
         )
-
-    if not picked:
+    elif not picked:
         reply = (
             "Mình chưa tìm được nhà hàng phù hợp với mô tả của bạn.\n"
             "Bạn thử thêm món bạn muốn ăn, khu vực (quận/huyện) hoặc mức giá nhé."
         )
     else:
-        lines = [
+        lines = [_radius_note(request.radius_km, searched_km)] if widened else []
+        lines += [
             "Mình gợi ý một vài nhà hàng phù hợp:",
             "",
         ]
         for idx, r in enumerate(picked, start=1):
             price = "$" * int(r.get("price_level") or 2)
-            lines.append(
-                f"{idx}. {r.get('name')} • {r.get('rating'):.1f}⭐ ({r.get('review_count')} đánh giá) • {price}"
-            )
+            line = f"{idx}. {r.get('name')} • {r.get('rating'):.1f}⭐ ({r.get('review_count')} đánh giá) • {price}"
+            if r.get("distance"):
+                line += f" • cách {r['distance']}"
+            lines.append(line)
         lines.append("")
         lines.append("Bạn muốn mình lọc theo khu vực/mức giá/món ăn cụ thể hơn không?")
         reply = "\n".join(lines)
@@ -416,73 +234,77 @@ async def recommend_restaurants(
         data={
             "reply": reply,
             "restaurants": picked,
-            "query": query_norm,
+            "query": query.text,
+            "location": {
+                "lat": location[0],
+                "lng": location[1],
+                "radius_km": searched_km,
+                "requested_radius_km": request.radius_km,
+            }
+            if location
+            else None,
         },
         message="OK",
     )
 
 
+@router.get("/recommend/index-stats", response_model=dict)
+async def recommend_index_stats(
+    user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Memory footprint of the recommendation index (admin only)."""
+    index = await get_restaurant_index(db)
+    return success_response(data=index.memory_footprint(), message="OK")
+
+
 @router.post("/message", response_model=dict)
 async def send_message(
     request: SendMessageRequest,
     user_id: Optional[str] = Depends(get_current_user_id_optional),
     db: AsyncSession = Depends(get_db)
 ):
-    """Send a message to chatbot"""
-    # Get or create chat session
+    """Send a message to chatbot
+
+    The whole turn is written as one batch: the session insert (or one UPDATE that both checks
+    the session exists and bumps ``updated_at``) plus both messages, flushed on commit.
+    Anonymous turns go through the write-behind buffer instead.
+    """
+    turn = ChatTurn.start(request.chat_id, user_id, request.message)
+    buffered = user_id is None
     if request.chat_id:
-        result = await db.execute(
-            select(ChatSession).where(ChatSession.id == request.chat_id)
-        )
-        session = result.scalar_one_or_none()
-        if not session:
-            return error_response("E3001", "Không tìm thấy phiên chat")
-    else:
-        # Create new session
-        session = ChatSession(
-            user_id=user_id,
-            title=request.message[:50] + "..." if len(request.message) > 50 else request.message
-        )
-        db.add(session)
-        await db.flush()
-    
-    # Save user message
-    user_message = ChatMessage(
-        session_id=session.id,
-        role=MessageRole.USER,
-        content=request.message
-    )
-    db.add(user_message)
-    await db.flush()
-    
+        if buffered and not turn_buffer.knows(request.chat_id):
+            result = await db.execute(select(ChatSession.id).where(ChatSession.id == request.chat_id))
+            if result.scalar_one_or_none() is None:
+                return error_response("E3001", "Không tìm thấy phiên chat")
+        elif not buffered:
+            result = await db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == request.chat_id)
+                .values(updated_at=turn.started_at)
+            )
+            if not result.rowcount:
+                return error_response("E3001", "Không tìm thấy phiên chat")
+
     # Generate bot response
     bot_response, suggestions = get_chatbot_response(request.message)
-    
-    # Save bot message
-    bot_message = ChatMessage(
-        session_id=session.id,
-        role=MessageRole.ASSISTANT,
-        content=bot_response,
-        message_metadata={"suggestions": suggestions}
-    )
-    db.add(bot_message)
-    await db.flush()
-    await db.refresh(bot_message)
-    
-    # Update session
-    session.updated_at = datetime.utcnow()
-    await db.flush()
-    
+    turn.finish(bot_response, {"suggestions": suggestions})
+
+    if buffered:
+        turn_buffer.add(turn)
+    else:
+        db.add_all(turn.rows())
+
     return success_response(
         data={
-            "chat_id": session.id,
+            "chat_id": turn.chat_id,
             "message": {
-                "id": bot_message.id,
-                "chat_id": session.id,
-                "role": bot_message.role.value,
-                "content": bot_message.content,
-                "timestamp": bot_message.created_at.isoformat(),
-                "metadata": bot_message.message_metadata
+                "id": turn.message_id,
+                "chat_id": turn.chat_id,
+                "role": MessageRole.ASSISTANT.value,
+                "content": turn.reply,
+                "timestamp": turn.finished_at.isoformat(),
+                "metadata": turn.metadata
             },
             "suggestions": suggestions
         },
@@ -490,25 +312,163 @@ async def send_message(
     )
 
 
+_STREAM_CHUNK_WORDS = 4
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _reply_chunks(text: str) -> list[str]:
+    """Split a reply into a few words per chunk, keeping whitespace/newlines intact."""
+    words = text.split(" ")
+    return [
+        " ".join(words[i : i + _STREAM_CHUNK_WORDS]) + (" " if i + _STREAM_CHUNK_WORDS < len(words) else "")
+        for i in range(0, len(words), _STREAM_CHUNK_WORDS)
+    ]
+
+
+async def _stream_cards(
+    user_id: Optional[str],
+    message: str,
+    limit: int,
+    lat: Optional[float],
+    lng: Optional[float],
+    radius_km: float,
+) -> dict[str, Any]:
+    """Payload of the ``restaurants`` event: the cards plus the radius searched, if any."""
+    # Runs while the response streams, after the request's DB session has been released.
+    try:
+        async with AsyncSessionLocal() as db:
+            location = await _resolve_location(db, user_id, lat, lng, True)
+            query, picked, searched_km = await _recommend(db, user_id, message, limit, location, radius_km)
+    except Exception:
+        logger.exception("Ranking restaurant cards for a streamed reply failed")
+        return {"restaurants": []}
+    payload: dict[str, Any] = {"restaurants": picked if query.food_tokens else []}
+    if searched_km is not None:
+        payload["radius_km"] = searched_km
+        payload["requested_radius_km"] = radius_km
+    return payload
+
+
+@router.post("/message/stream")
+async def stream_message(
+    request: StreamMessageRequest,
+    user_id: Optional[str] = Depends(get_current_user_id_optional),
+    db: AsyncSession = Depends(get_db)
+):
+    """Send a message to chatbot and stream the reply as Server-Sent Events.
+
+    Events, in order: ``session`` (chat id), ``delta`` (reply text chunks), ``restaurants``
+    (recommendation cards, as soon as ranking finishes; may arrive between deltas) and
+    ``done`` (message id + suggestions). The turn is persisted after the stream completes
+    (anonymous turns through the write-behind buffer).
+    """
+    buffered = user_id is None
+    if request.chat_id and not (buffered and turn_buffer.knows(request.chat_id)):
+        result = await db.execute(select(ChatSession.id).where(ChatSession.id == request.chat_id))
+        if result.scalar_one_or_none() is None:
+            return error_response("E3001", "Không tìm thấy phiên chat")
+    turn = ChatTurn.start(request.chat_id, user_id, request.message)
+
+    async def events():
+        yield _sse("session", {"chat_id": turn.chat_id})
+        cards_task = asyncio.create_task(
+            _stream_cards(user_id, request.message, request.limit, request.lat, request.lng, request.radius_km)
+        )
+        reply, suggestions = get_chatbot_response(request.message)
+        turn.finish(reply, {"suggestions": suggestions})
+
+        cards_sent = False
+        try:
+            for chunk in _reply_chunks(reply):
+                if not cards_sent and cards_task.done():
+                    cards_sent = True
+                    yield _sse("restaurants", cards_task.result())
+                yield _sse("delta", {"text": chunk})
+                await asyncio.sleep(0)
+            cards = await cards_task
+        finally:
+            cards_task.cancel()
+        if not cards_sent:
+            yield _sse("restaurants", cards)
+        if cards["restaurants"]:
+            turn.metadata["restaurants"] = cards["restaurants"]
+        yield _sse(
+            "done",
+            {
+                "chat_id": turn.chat_id,
+                "message_id": turn.message_id,
+                "suggestions": suggestions,
+                "timestamp": turn.finished_at.isoformat(),
+            },
+        )
+
+    async def persist() -> None:
+        if turn.finished_at is None:
+            return
+        if buffered:
+            turn_buffer.add(turn)
+        else:
+            await persist_turn(turn)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(persist),
+    )
+
+
+def _time_cursor(cursor: str) -> Optional[list[Any]]:
+    """Decode a ``(timestamp, id)`` cursor made by ``encode_cursor``; None if malformed."""
+    values = decode_cursor(cursor, 2)
+    if values is None or not isinstance(values[0], str) or not isinstance(values[1], str):
+        return None
+    try:
+        return [datetime.fromisoformat(values[0]), values[1]]
+    except ValueError:
+        return None
+
+
+def _next_cursor(rows: list[Any], limit: int, time_attr: str) -> Optional[str]:
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor([getattr(last, time_attr).isoformat(), last.id])
+
+
 @router.get("/history", response_model=dict)
 async def get_chat_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get user's chat history"""
-    result = await db.execute(
-        select(ChatSession)
-        .where(ChatSession.user_id == user_id)
-        .order_by(ChatSession.updated_at.desc())
-    )
+    """Get user's chat history, most recently updated first.
+
+    Keyset-paginated on ``(updated_at, id)``: pass ``meta.pagination.next_cursor`` as ``cursor``
+    to get the next page.
+    """
+    key = (ChatSession.updated_at, ChatSession.id)
+    query = select(ChatSession).where(ChatSession.user_id == user_id)
+    if cursor:
+        values = _time_cursor(cursor)
+        if values is None:
+            return error_response("E4000", "Cursor không hợp lệ")
+        query = query.where(after(key, values, descending=True))
+    result = await db.execute(query.order_by(*(col.desc() for col in key)).limit(limit + 1))
     sessions = result.scalars().all()
     
-    return success_response(
+    return cursor_response(
         data=[{
             "id": s.id,
             "title": s.title,
             "updated_at": s.updated_at.isoformat()
-        } for s in sessions],
+        } for s in sessions[:limit]],
+        next_cursor=_next_cursor(sessions, limit, "updated_at"),
+        limit=limit,
         message="Lấy lịch sử chat thành công"
     )
 
@@ -516,10 +476,23 @@ async def get_chat_history(
 @router.get("/{chat_id}", response_model=dict)
 async def get_chat_session(
     chat_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     user_id: Optional[str] = Depends(get_current_user_id_optional),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get chat session with messages"""
+    """Get chat session with its latest messages.
+
+    ``messages`` are in chronological order; ``meta.pagination.next_cursor`` (passed back as
+    ``cursor``) loads the page of older messages, keyset-paginated on ``(created_at, id)``.
+    """
+    key = (ChatMessage.created_at, ChatMessage.id)
+    values = None
+    if cursor:
+        values = _time_cursor(cursor)
+        if values is None:
+            return error_response("E4000", "Cursor không hợp lệ")
+
     result = await db.execute(
         select(ChatSession).where(ChatSession.id == chat_id)
     )
@@ -528,15 +501,14 @@ async def get_chat_session(
     if not session:
         return error_response("E3001", "Không tìm thấy phiên chat")
     
-    # Get messages
-    msg_result = await db.execute(
-        select(ChatMessage)
-        .where(ChatMessage.session_id == chat_id)
-        .order_by(ChatMessage.created_at)
-    )
+    # Get messages, newest first, then flip the page back to chronological order
+    msg_query = select(ChatMessage).where(ChatMessage.session_id == chat_id)
+    if values is not None:
+        msg_query = msg_query.where(after(key, values, descending=True))
+    msg_result = await db.execute(msg_query.order_by(*(col.desc() for col in key)).limit(limit + 1))
     messages = msg_result.scalars().all()
     
-    return success_response(
+    return cursor_response(
         data={
             "id": session.id,
             "title": session.title,
@@ -546,8 +518,10 @@ async def get_chat_session(
                 "content": m.content,
                 "timestamp": m.created_at.isoformat(),
                 "metadata": m.message_metadata
-            } for m in messages]
+            } for m in reversed(messages[:limit])]
         },
+        next_cursor=_next_cursor(messages, limit, "created_at"),
+        limit=limit,
         message="Lấy phiên chat thành công"
     )
 
@@ -559,26 +533,19 @@ async def delete_chat_session(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a chat session"""
-    result = await db.execute(
-        select(ChatSession).where(
-            ChatSession.id == chat_id,
-            ChatSession.user_id == user_id
-        )
+    owned = select(ChatSession.id).where(
+        ChatSession.id == chat_id,
+        ChatSession.user_id == user_id
     )
-    session = result.scalar_one_or_none()
-    
-    if not session:
-        return error_response("E3001", "Không tìm thấy phiên chat")
     
-    # Delete messages first
-    msg_result = await db.execute(
-        select(ChatMessage).where(ChatMessage.session_id == chat_id)
+    # Messages first (only if the session is the caller's), then the session itself
+    await db.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(owned)))
+    result = await db.execute(
+        delete(ChatSession).where(ChatSession.id == chat_id, ChatSession.user_id == user_id)
     )
-    for msg in msg_result.scalars().all():
-        await db.delete(msg)
     
-    await db.delete(session)
-    await db.flush()
+    if not result.rowcount:
+        return error_response("E3001", "Không tìm thấy phiên chat")
     
     return success_response(
         data=None,
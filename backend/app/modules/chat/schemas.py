@@ -1,11 +1,13 @@
 """
 Chat schemas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Any
 from datetime import datetime
 from enum import Enum
 
+from app.modules.chat.recommender import DEFAULT_RADIUS_KM, MAX_RADIUS_KM
+
 
 class MessageRole(str, Enum):
     USER = "user"
@@ -31,6 +33,14 @@ class SendMessageRequest(BaseModel):
     context: Optional[ChatContext] = None
 
 
+class StreamMessageRequest(SendMessageRequest):
+    # Location for the restaurant cards; the user's saved address is used when omitted.
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lng: Optional[float] = Field(None, ge=-180, le=180)
+    radius_km: float = Field(DEFAULT_RADIUS_KM, gt=0, le=MAX_RADIUS_KM)
+    limit: int = Field(6, ge=1, le=12)
+
+
 # Response Schemas
 class ChatMessageResponse(BaseModel):
     id: str
@@ -0,0 +1,173 @@
+"""
+Versioned on-disk snapshots of the recommendation index, shared by all workers.
+
+Layout under ``settings.RECOMMEND_SNAPSHOT_DIR``::
+
+    CURRENT            name of the live version (replaced atomically)
+    build.lock         held by the single process (re)building the index
+    v-<version>/       one ``.npy`` file per array + meta.json
+
+The index is a struct of arrays, so a snapshot is just those arrays. A worker maps them
+read-only (``np.load(mmap_mode="r")``), so N workers share one copy through the page cache,
+and switches to a new version by swapping a single reference. Old versions are removed
+after a newer one is published; readers that still map them keep the inode alive.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from app.core.geo import GeoGrid
+from app.modules.chat.recommender import RestaurantIndex, StringColumn, TermMatrix, Vocabulary
+from app.modules.search.fuzzy import TrigramIndex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None
+
+FORMAT_VERSION = 1
+_KEEP_VERSIONS = 2
+_CURRENT = "CURRENT"
+_LOCK = "build.lock"
+
+_STRING_COLUMNS = ("ids", "names", "cuisines", "addresses", "images")
+_ARRAY_COLUMNS = (
+    "rating", "review_count", "price_level", "latitude", "longitude",
+    "popularity", "has_image", "fold_keys", "fold_values",
+)
+_MATRICES = ("bm25_ascii", "bm25_vi", "food_ascii")
+
+
+def current_version(directory: Path) -> Optional[str]:
+    try:
+        return (directory / _CURRENT).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def built_at(directory: Path, version: str) -> float:
+    meta = json.loads((directory / f"v-{version}" / "meta.json").read_text(encoding="utf-8"))
+    return float(meta["built_at"])
+
+
+@contextlib.contextmanager
+def leader_lock(directory: Path) -> Iterator[bool]:
+    """Non-blocking exclusive lock; yields whether this process is the builder."""
+    directory.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield True
+        return
+    with open(directory / _LOCK, "a+") as handle:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def write(directory: Path, index: RestaurantIndex, built: float) -> str:
+    """Write ``index`` as a new version and make it current; returns the version."""
+    version = f"{int(built * 1000)}-{os.getpid()}"
+    tmp = directory / f".v-{version}.tmp"
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    def save(name: str, array: np.ndarray) -> None:
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+
+    for name in _STRING_COLUMNS:
+        column: StringColumn = getattr(index, name)
+        save(f"{name}.data", column.data)
+        save(f"{name}.offsets", column.offsets)
+    for name in _ARRAY_COLUMNS:
+        save(name, getattr(index, name))
+    save("vocab.data", index.vocab.data)
+    save("vocab.offsets", index.vocab.offsets)
+    for name in _MATRICES:
+        matrix: TermMatrix = getattr(index, name)
+        save(f"{name}.indptr", matrix.indptr)
+        save(f"{name}.indices", matrix.indices)
+        save(f"{name}.data", matrix.data)
+    save("grid.cells", index.grid.cells)
+    save("grid.order", index.grid.order)
+    (tmp / "meta.json").write_text(
+        json.dumps(
+            {
+                "format": FORMAT_VERSION,
+                "version": version,
+                "built_at": built,
+                "restaurants": len(index),
+                "grid_precision": index.grid.precision,
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    os.replace(tmp, directory / f"v-{version}")
+    pointer = directory / f".{_CURRENT}.{os.getpid()}.tmp"
+    pointer.write_text(version, encoding="utf-8")
+    os.replace(pointer, directory / _CURRENT)
+    _prune(directory, keep=version)
+    return version
+
+
+def _prune(directory: Path, keep: str) -> None:
+    versions = sorted(
+        (p for p in directory.glob("v-*") if p.is_dir()),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for path in versions[_KEEP_VERSIONS:]:
+        if path.name != f"v-{keep}":
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load(directory: Path, version: str) -> RestaurantIndex:
+    """Map a snapshot read-only; only the trigram vocabulary is rebuilt in process memory."""
+    root = directory / f"v-{version}"
+    meta = json.loads((root / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported recommendation snapshot format: {meta.get('format')}")
+
+    def arr(name: str) -> np.ndarray:
+        return np.load(root / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+
+    vocab = Vocabulary(arr("vocab.data"), arr("vocab.offsets"))
+    matrices = {
+        name: TermMatrix(arr(f"{name}.indptr"), arr(f"{name}.indices"), arr(f"{name}.data"))
+        for name in _MATRICES
+    }
+    index = RestaurantIndex(
+        **{name: StringColumn(arr(f"{name}.data"), arr(f"{name}.offsets")) for name in _STRING_COLUMNS},
+        **{name: arr(name) for name in _ARRAY_COLUMNS},
+        **matrices,
+        vocab=vocab,
+        grid=GeoGrid(arr("grid.cells"), arr("grid.order"), int(meta["grid_precision"])),
+        trigrams=TrigramIndex(),
+    )
+    ascii_rows = np.flatnonzero(np.diff(matrices["bm25_ascii"].indptr.astype(np.int64)))
+    for term_id in ascii_rows.tolist():
+        index.trigrams.add(vocab[term_id])
+    return index
+
+
+def age_seconds(directory: Path) -> Optional[float]:
+    version = current_version(directory)
+    if version is None:
+        return None
+    try:
+        return time.time() - built_at(directory, version)
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
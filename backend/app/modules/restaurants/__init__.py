@@ -1,4 +1,5 @@
 # Restaurants module
 from app.modules.restaurants.routes import router
+from app.modules.restaurants import trending  # noqa: F401  (registers the periodic score refresh)
 
 __all__ = ["router"]
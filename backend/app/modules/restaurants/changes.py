@@ -0,0 +1,193 @@
+"""
+In-process change feed for restaurant catalog caches.
+
+Restaurant rows written through the ORM are collected per session on flush and published
+only after the transaction commits, so in-memory indexes (map tiles, autocomplete, ...) can
+update incrementally instead of rebuilding. Writes that bypass the unit of work (bulk
+UPDATEs in the catalog importer) call ``mark_catalog_reset`` and listeners rebuild lazily.
+
+The feed is per process: every cache still keeps a TTL-based full rebuild so changes made
+by other workers show up eventually.
+
+Menu items go through the same feed; listeners that index dishes implement the optional
+``on_menu_changes`` hook.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, Optional, Protocol
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.modules.restaurants.models import MenuItem, Restaurant, card_image
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "restaurant_changes"
+_MENU_PENDING_KEY = "menu_item_changes"
+_RESET_KEY = "restaurant_catalog_reset"
+
+
+@dataclass(frozen=True)
+class RestaurantChange:
+    id: str
+    name: str
+    cuisine: str
+    specialty: tuple[str, ...]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    rating: float
+    review_count: int
+    is_active: bool
+    deleted: bool = False
+    address: str = ""
+    description: str = ""
+    image: str = ""  # card-sized (see ``card_image``)
+    price_level: int = 2
+
+    @property
+    def visible(self) -> bool:
+        return self.is_active and not self.deleted
+
+    @classmethod
+    def from_restaurant(cls, r: Restaurant, *, deleted: bool = False) -> "RestaurantChange":
+        specialty = r.specialty if isinstance(r.specialty, list) else []
+        return cls(
+            id=str(r.id),
+            name=r.name or "",
+            cuisine=r.cuisine or "",
+            specialty=tuple(str(t) for t in specialty if t),
+            latitude=r.latitude,
+            longitude=r.longitude,
+            rating=float(r.rating or 0.0),
+            review_count=int(r.review_count or 0),
+            is_active=r.is_active is None or bool(r.is_active),
+            deleted=deleted,
+            address=r.address or "",
+            description=r.description or "",
+            image=card_image(r.image, r.image_variants) or "",
+            price_level=int(r.price_level or 2),
+        )
+
+
+@dataclass(frozen=True)
+class MenuItemChange:
+    id: str
+    restaurant_id: str
+    name: str
+    category: str
+    is_available: bool
+    is_approved: bool
+    deleted: bool = False
+    description: str = ""
+    price: int = 0
+    image: str = ""
+
+    @property
+    def visible(self) -> bool:
+        return self.is_available and self.is_approved and not self.deleted
+
+    @classmethod
+    def from_menu_item(cls, m: MenuItem, *, deleted: bool = False) -> "MenuItemChange":
+        return cls(
+            id=str(m.id),
+            restaurant_id=str(m.restaurant_id),
+            name=m.name or "",
+            category=m.category or "",
+            is_available=m.is_available is None or bool(m.is_available),
+            is_approved=m.is_approved is None or bool(m.is_approved),
+            deleted=deleted,
+            description=m.description or "",
+            price=int(m.price or 0),
+            image=m.image or "",
+        )
+
+
+class RestaurantChangeListener(Protocol):
+    def on_changes(self, changes: list[RestaurantChange]) -> None: ...
+
+    def on_reset(self) -> None: ...
+
+
+_listeners: list[RestaurantChangeListener] = []
+
+
+def subscribe(listener: RestaurantChangeListener) -> RestaurantChangeListener:
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def publish(changes: list[RestaurantChange]) -> None:
+    for listener in list(_listeners):
+        try:
+            listener.on_changes(changes)
+        except Exception:
+            logger.exception("Restaurant change listener failed; resetting it")
+            listener.on_reset()
+
+
+def publish_menu(changes: list[MenuItemChange]) -> None:
+    for listener in list(_listeners):
+        handler = getattr(listener, "on_menu_changes", None)
+        if handler is None:
+            continue
+        try:
+            handler(changes)
+        except Exception:
+            logger.exception("Menu change listener failed; resetting it")
+            listener.on_reset()
+
+
+def publish_reset() -> None:
+    for listener in list(_listeners):
+        try:
+            listener.on_reset()
+        except Exception:
+            logger.exception("Restaurant change listener reset failed")
+
+
+def mark_catalog_reset(session: Any) -> None:
+    """Ask every listener to rebuild once ``session`` commits (for bulk writes)."""
+    session.info[_RESET_KEY] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    pending: Optional[dict[str, RestaurantChange]] = None
+    menu_pending: Optional[dict[str, MenuItemChange]] = None
+    for deleted, objs in ((False, chain(session.new, session.dirty)), (True, session.deleted)):
+        for obj in objs:
+            if isinstance(obj, Restaurant):
+                if pending is None:
+                    pending = session.info.setdefault(_PENDING_KEY, {})
+                pending[str(obj.id)] = RestaurantChange.from_restaurant(obj, deleted=deleted)
+            elif isinstance(obj, MenuItem):
+                if menu_pending is None:
+                    menu_pending = session.info.setdefault(_MENU_PENDING_KEY, {})
+                menu_pending[str(obj.id)] = MenuItemChange.from_menu_item(obj, deleted=deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    menu_pending = session.info.pop(_MENU_PENDING_KEY, None)
+    reset = session.info.pop(_RESET_KEY, False)
+    if reset:
+        publish_reset()
+        return
+    if pending:
+        publish(list(pending.values()))
+    if menu_pending:
+        publish_menu(list(menu_pending.values()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_MENU_PENDING_KEY, None)
+    session.info.pop(_RESET_KEY, None)
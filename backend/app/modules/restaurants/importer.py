@@ -0,0 +1,283 @@
+"""
+Incremental (diff-based) restaurant catalog import.
+
+Every imported restaurant is keyed on a stable source id (the Google place id) and stores a
+hash of the raw source record, so a refresh only writes the delta:
+
+- unknown source ids are inserted,
+- known source ids with a different hash are updated in place (ids, user reviews and
+  bookings are preserved),
+- source ids that disappeared from the feed are deactivated (never deleted).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.geo import encode_geohash
+from app.modules.restaurants.changes import mark_catalog_reset
+from app.modules.restaurants.models import Restaurant, rank_score_for
+from app.modules.reviews.models import Review
+
+
+def content_hash(record: Any) -> str:
+    """Stable hash of a raw source record (key order independent)."""
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def source_id_for(record: dict[str, Any]) -> str:
+    """Stable source id for a raw record: place id when present, else name + address."""
+    for key in ("place_id", "placeId", "id"):
+        value = record.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()[:255]
+    name = str(record.get("name") or "").strip().lower()
+    address = str(record.get("address") or "").strip().lower()
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"restaurant:{name}|{address}"))
+
+
+def review_id_for(source_id: str, key: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source_id}:review:{key}"))
+
+
+@dataclass
+class CatalogRow:
+    """One transformed source record, ready to be upserted."""
+
+    source_id: str
+    content_hash: str
+    values: dict[str, Any]
+    reviews: list[dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class ImportStats:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    reactivated: int = 0
+    deactivated: int = 0
+    reviews_inserted: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "reactivated": self.reactivated,
+            "deactivated": self.deactivated,
+            "reviews_inserted": self.reviews_inserted,
+        }
+
+
+@dataclass
+class _Existing:
+    id: str
+    source_id: Optional[str]
+    content_hash: Optional[str]
+    is_active: bool
+    description_generated: bool
+    rating_override: Optional[float]
+
+
+def _legacy_key(name: Any, address: Any) -> tuple[str, str]:
+    return str(name or "").strip().lower(), str(address or "").strip().lower()
+
+
+class CatalogImporter:
+    """
+    Upsert catalog rows chunk by chunk.
+
+    Usage::
+
+        importer = CatalogImporter()
+        await importer.load(db)
+        for chunk in chunks:
+            await importer.apply(db, chunk)
+            await db.commit()
+        stats = await importer.finish(db)
+        await db.commit()
+    """
+
+    def __init__(self, *, deactivate_missing: bool = True):
+        self.deactivate_missing = deactivate_missing
+        self.stats = ImportStats()
+        self._by_source: dict[str, _Existing] = {}
+        self._by_id: dict[str, _Existing] = {}
+        self._legacy: dict[tuple[str, str], _Existing] = {}
+        self._seen: set[str] = set()
+
+    async def load(self, db: AsyncSession) -> None:
+        """Load a lightweight snapshot of the current catalog (no JSON/text columns)."""
+        result = await db.execute(
+            select(
+                Restaurant.id,
+                Restaurant.source_id,
+                Restaurant.content_hash,
+                Restaurant.is_active,
+                Restaurant.description_generated,
+                Restaurant.rating_override,
+                Restaurant.name,
+                Restaurant.address,
+            )
+        )
+        for row in result.fetchall():
+            existing = _Existing(
+                id=row[0],
+                source_id=row[1],
+                content_hash=row[2],
+                is_active=bool(row[3]),
+                description_generated=row[4] is None or bool(row[4]),
+                rating_override=row[5],
+            )
+            self._by_id[existing.id] = existing
+            if existing.source_id:
+                self._by_source[existing.source_id] = existing
+            else:
+                # Rows created before source ids existed can be adopted by name + address.
+                self._legacy.setdefault(_legacy_key(row[6], row[7]), existing)
+
+    def _match(self, row: CatalogRow) -> Optional[_Existing]:
+        existing = self._by_source.get(row.source_id)
+        if existing:
+            return existing
+        existing = self._by_id.get(row.source_id)
+        if existing and not existing.source_id:
+            return existing
+        existing = self._legacy.pop(_legacy_key(row.values.get("name"), row.values.get("address")), None)
+        if existing and not existing.source_id:
+            return existing
+        return None
+
+    async def apply(self, db: AsyncSession, rows: Iterable[CatalogRow]) -> list[str]:
+        """Upsert one chunk; returns the ids of restaurants that were written."""
+        inserts: list[Restaurant] = []
+        updates: list[dict[str, Any]] = []
+        review_targets: list[tuple[str, CatalogRow]] = []
+
+        for row in rows:
+            if row.source_id in self._seen:
+                continue
+            self._seen.add(row.source_id)
+
+            existing = self._match(row)
+            if existing is None:
+                restaurant_id = row.source_id if len(row.source_id) <= 36 and row.source_id not in self._by_id else str(uuid.uuid4())
+                inserts.append(
+                    Restaurant(
+                        id=restaurant_id,
+                        source_id=row.source_id,
+                        content_hash=row.content_hash,
+                        is_active=True,
+                        is_open=True,
+                        **row.values,
+                    )
+                )
+                tracked = _Existing(
+                    id=restaurant_id,
+                    source_id=row.source_id,
+                    content_hash=row.content_hash,
+                    is_active=True,
+                    description_generated=True,
+                    rating_override=None,
+                )
+                self._by_source[row.source_id] = tracked
+                self._by_id[restaurant_id] = tracked
+                review_targets.append((restaurant_id, row))
+                self.stats.inserted += 1
+                continue
+
+            if existing.content_hash == row.content_hash and existing.source_id == row.source_id:
+                self.stats.unchanged += 1
+                continue
+
+            values = dict(row.values)
+            if not existing.description_generated:
+                # Keep owner-written descriptions.
+                values.pop("description", None)
+                values.pop("description_generated", None)
+            if existing.rating_override is not None:
+                values.pop("rating", None)
+            # A NULL hash on an inactive row means the importer deactivated it, so bring it back.
+            if not existing.is_active and existing.source_id and existing.content_hash is None:
+                values["is_active"] = True
+                existing.is_active = True
+                self.stats.reactivated += 1
+
+            # Bulk UPDATEs bypass mapper events, so keep the geohash/ranking columns in sync here.
+            if "latitude" in values or "longitude" in values:
+                values["geo_cell"] = encode_geohash(values.get("latitude"), values.get("longitude"))
+            if "rating" in values or "review_count" in values:
+                rating = values.get("rating", existing.rating_override)
+                values["rank_score"] = rank_score_for(rating, values.get("review_count"))
+            values.update(id=existing.id, source_id=row.source_id, content_hash=row.content_hash)
+            updates.append(values)
+
+            existing.source_id = row.source_id
+            existing.content_hash = row.content_hash
+            self._by_source[row.source_id] = existing
+            review_targets.append((existing.id, row))
+            self.stats.updated += 1
+
+        if inserts:
+            db.add_all(inserts)
+            await db.flush()
+        if updates:
+            await db.execute(update(Restaurant), updates)
+            # Bulk UPDATEs are invisible to the ORM change feed.
+            mark_catalog_reset(db)
+
+        await self._insert_reviews(db, review_targets)
+        return [r.id for r in inserts] + [u["id"] for u in updates]
+
+    async def _insert_reviews(self, db: AsyncSession, targets: list[tuple[str, CatalogRow]]) -> None:
+        candidates: dict[str, Review] = {}
+        for restaurant_id, row in targets:
+            for review in row.reviews:
+                key = str(review.get("key") or "")
+                if not key:
+                    continue
+                review_id = review_id_for(row.source_id, key)
+                if review_id in candidates:
+                    continue
+                values = {k: v for k, v in review.items() if k != "key"}
+                candidates[review_id] = Review(id=review_id, restaurant_id=restaurant_id, user_id=None, **values)
+
+        if not candidates:
+            return
+
+        existing_result = await db.execute(select(Review.id).where(Review.id.in_(list(candidates.keys()))))
+        existing_ids = set(existing_result.scalars().all())
+        new_reviews = [r for rid, r in candidates.items() if rid not in existing_ids]
+        if new_reviews:
+            db.add_all(new_reviews)
+            await db.flush()
+            self.stats.reviews_inserted += len(new_reviews)
+
+    async def finish(self, db: AsyncSession) -> ImportStats:
+        """Deactivate imported restaurants that are no longer in the feed."""
+        if self.deactivate_missing:
+            missing = [
+                e.id
+                for source_id, e in self._by_source.items()
+                if source_id not in self._seen and e.is_active
+            ]
+            for start in range(0, len(missing), 500):
+                batch = missing[start : start + 500]
+                await db.execute(
+                    update(Restaurant)
+                    .where(Restaurant.id.in_(batch))
+                    .values(is_active=False, content_hash=None)
+                )
+            self.stats.deactivated += len(missing)
+            if missing:
+                mark_catalog_reset(db)
+        return self.stats
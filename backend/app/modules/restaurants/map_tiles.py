@@ -0,0 +1,194 @@
+"""
+Server-side marker clustering for the map view.
+
+Active restaurants are aggregated into a Web Mercator tile pyramid: for every level we keep
+``(x, y) -> cell`` with the member ids and the running lat/lng sums, so a cluster is just
+``count`` + centroid. A viewport query at zoom ``z`` reads the cells of level
+``z + CLUSTER_LEVEL_OFFSET`` (roughly 32px cells) that intersect the bbox, which keeps the
+response size bounded by the viewport instead of by the catalog. A bbox much larger than the
+viewport (e.g. a whole country at street zoom) is served from a coarser level, so a response
+never covers more than ``MAX_QUERY_CELLS`` cells.
+
+The pyramid is built once from the DB, updated incrementally from the restaurant change
+feed, and fully rebuilt every ``_PYRAMID_TTL_SECONDS`` to pick up writes from other workers.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.restaurants import changes
+from app.modules.restaurants.changes import RestaurantChange
+from app.modules.restaurants.models import Restaurant
+
+MAX_ZOOM = 22
+CLUSTER_LEVEL_OFFSET = 3  # 256px tile / 2^3 = 32px cluster cells
+MAX_LEVEL = 18  # Below this, cells hold few enough points to list them individually
+_MAX_MERCATOR_LAT = 85.05112878
+_PYRAMID_TTL_SECONDS = 600
+MAX_QUERY_CELLS = 4096  # ~64x64 cells: several full-screen viewports of 32px cells
+
+
+def _tile_xy(lat: float, lng: float, level: int) -> tuple[int, int]:
+    n = 1 << level
+    lat = max(-_MAX_MERCATOR_LAT, min(_MAX_MERCATOR_LAT, lat))
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+@dataclass
+class _Cell:
+    ids: set[str] = field(default_factory=set)
+    sum_lat: float = 0.0
+    sum_lng: float = 0.0
+
+
+@dataclass(frozen=True)
+class _Point:
+    lat: float
+    lng: float
+    name: str
+
+
+class TilePyramid:
+    def __init__(self) -> None:
+        self._levels: list[dict[tuple[int, int], _Cell]] = [dict() for _ in range(MAX_LEVEL + 1)]
+        self._points: dict[str, _Point] = {}
+        self._built_at = 0.0
+
+    # -- maintenance -------------------------------------------------------
+
+    def _add(self, rid: str, point: _Point) -> None:
+        self._points[rid] = point
+        for level, cells in enumerate(self._levels):
+            key = _tile_xy(point.lat, point.lng, level)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = _Cell()
+            cell.ids.add(rid)
+            cell.sum_lat += point.lat
+            cell.sum_lng += point.lng
+
+    def _remove(self, rid: str) -> None:
+        point = self._points.pop(rid, None)
+        if point is None:
+            return
+        for level, cells in enumerate(self._levels):
+            key = _tile_xy(point.lat, point.lng, level)
+            cell = cells.get(key)
+            if cell is None:
+                continue
+            cell.ids.discard(rid)
+            if not cell.ids:
+                del cells[key]
+                continue
+            cell.sum_lat -= point.lat
+            cell.sum_lng -= point.lng
+
+    def on_changes(self, items: list[RestaurantChange]) -> None:
+        if not self._built_at:
+            return
+        for change in items:
+            self._remove(change.id)
+            if change.visible and change.latitude is not None and change.longitude is not None:
+                self._add(change.id, _Point(float(change.latitude), float(change.longitude), change.name))
+
+    def on_reset(self) -> None:
+        self._built_at = 0.0
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        now = time.time()
+        if self._built_at and now - self._built_at < _PYRAMID_TTL_SECONDS:
+            return
+
+        result = await db.execute(
+            select(Restaurant.id, Restaurant.name, Restaurant.latitude, Restaurant.longitude).where(
+                Restaurant.is_active == True,
+                Restaurant.latitude.is_not(None),
+                Restaurant.longitude.is_not(None),
+            )
+        )
+        self._levels = [dict() for _ in range(MAX_LEVEL + 1)]
+        self._points = {}
+        for row in result.fetchall():
+            self._add(str(row[0]), _Point(float(row[2]), float(row[3]), row[1] or ""))
+        self._built_at = now
+
+    # -- queries -----------------------------------------------------------
+
+    def query(
+        self,
+        min_lng: float,
+        min_lat: float,
+        max_lng: float,
+        max_lat: float,
+        zoom: int,
+    ) -> list[dict[str, Any]]:
+        level = max(0, min(MAX_LEVEL, zoom + CLUSTER_LEVEL_OFFSET))
+        while True:
+            x0, y0 = _tile_xy(max_lat, min_lng, level)  # top-left (y grows southwards)
+            x1, y1 = _tile_xy(min_lat, max_lng, level)
+            span = (x1 - x0 + 1) * (y1 - y0 + 1)
+            if span <= MAX_QUERY_CELLS or level == 0:
+                break
+            level -= 1
+        cells = self._levels[level]
+
+        if span <= len(cells):
+            keys = (
+                (x, y)
+                for x in range(x0, x1 + 1)
+                for y in range(y0, y1 + 1)
+                if (x, y) in cells
+            )
+        else:
+            keys = (key for key in cells if x0 <= key[0] <= x1 and y0 <= key[1] <= y1)
+
+        out: list[dict[str, Any]] = []
+        for key in keys:
+            cell = cells[key]
+            count = len(cell.ids)
+            if count == 1:
+                rid = next(iter(cell.ids))
+                point = self._points.get(rid)
+                if point is None:
+                    continue
+                out.append({"type": "marker", "id": rid, "name": point.name, "lat": point.lat, "lng": point.lng, "count": 1})
+                continue
+            out.append(
+                {
+                    "type": "cluster",
+                    "cell": f"{level}/{key[0]}/{key[1]}",
+                    "lat": cell.sum_lat / count,
+                    "lng": cell.sum_lng / count,
+                    "count": count,
+                }
+            )
+        return out
+
+
+def parse_bbox(raw: str) -> Optional[tuple[float, float, float, float]]:
+    """Parse ``min_lng,min_lat,max_lng,max_lat``."""
+    try:
+        parts = [float(p) for p in (raw or "").split(",")]
+    except ValueError:
+        return None
+    if len(parts) != 4:
+        return None
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180 and -90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        return None
+    if min_lng > max_lng or min_lat > max_lat:
+        return None
+    return min_lng, min_lat, max_lng, max_lat
+
+
+pyramid = changes.subscribe(TilePyramid())
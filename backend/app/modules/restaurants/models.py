@@ -1,12 +1,14 @@
 """
 Restaurant model
 """
-from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, Text, JSON, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import Any, Optional
 import uuid
 
 from app.core.database import Base
+from app.core.geo import encode_geohash
 
 
 class Restaurant(Base):
@@ -17,6 +19,7 @@ class Restaurant(Base):
     owner_id = Column(String(36), ForeignKey("users.id"), nullable=True, index=True)
     image = Column(String(500), nullable=True)
     images = Column(JSON, default=list)  # Array of image URLs
+    image_variants = Column(JSON, nullable=True)  # {image URL: {"thumb"|"card"|"full": URL}} for uploads
     cuisine = Column(String(100), nullable=False, index=True)
     rating = Column(Float, default=0.0)
     rating_override = Column(Float, nullable=True)
@@ -35,7 +38,15 @@ class Restaurant(Base):
     website = Column(String(255), nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    geo_cell = Column(String(12), nullable=True, index=True)  # Geohash of (latitude, longitude)
     is_active = Column(Boolean, default=True)
+    # Catalog import: stable source key (Google place id) + hash of the raw source record
+    source_id = Column(String(255), nullable=True, unique=True, index=True)
+    content_hash = Column(String(64), nullable=True)
+    # Bayesian-adjusted rating used for rating sorts; kept in sync with rating/review_count
+    rank_score = Column(Float, default=0.0)
+    # Time-decayed recent activity (bookings, reviews, likes); recomputed periodically
+    trending_score = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -44,6 +55,46 @@ class Restaurant(Base):
     reviews = relationship("Review", back_populates="restaurant", cascade="all, delete-orphan")
     owner = relationship("User", foreign_keys=[owner_id])
 
+    __table_args__ = (
+        Index("ix_restaurants_active_trending", "is_active", "trending_score"),
+        Index("ix_restaurants_active_rank", "is_active", "rank_score", "id"),
+    )
+
+
+# Bayesian average: every restaurant starts with RANK_PRIOR_REVIEWS virtual reviews of
+# RANK_PRIOR_RATING stars, so a handful of 5-star reviews cannot outrank a well-reviewed 4.6.
+RANK_PRIOR_RATING = 3.5
+RANK_PRIOR_REVIEWS = 10
+
+
+def rank_score_for(rating, review_count) -> float:
+    """Bayesian-adjusted rating (0-5) used to order rating sorts."""
+    n = max(0, int(review_count or 0))
+    r = float(rating or 0.0)
+    if n == 0 and r > 0:
+        n = 1  # a rating without a review count (override / seed data) still counts once
+    return round((RANK_PRIOR_RATING * RANK_PRIOR_REVIEWS + r * n) / (RANK_PRIOR_REVIEWS + n), 6)
+
+
+def card_image(image: Optional[str], variants: Any) -> Optional[str]:
+    """The URL to show ``image`` on cards: its "card" variant when it was uploaded with variants."""
+    entry = variants.get(image) if isinstance(variants, dict) and image else None
+    return (entry or {}).get("card") or image
+
+
+@event.listens_for(Restaurant, "before_insert")
+@event.listens_for(Restaurant, "before_update")
+def _sync_geo_cell(mapper, connection, target: Restaurant) -> None:
+    """Keep the geohash index column in sync with latitude/longitude."""
+    target.geo_cell = encode_geohash(target.latitude, target.longitude)
+
+
+@event.listens_for(Restaurant, "before_insert")
+@event.listens_for(Restaurant, "before_update")
+def _sync_rank_score(mapper, connection, target: Restaurant) -> None:
+    """Keep the ranking column in sync with rating/review_count."""
+    target.rank_score = rank_score_for(target.rating, target.review_count)
+
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
@@ -66,3 +117,25 @@ class MenuItem(Base):
     
     # Relationships
     restaurant = relationship("Restaurant", back_populates="menu_items")
+
+
+class RestaurantNeighbor(Base):
+    """Precomputed "similar restaurants" list: top-k neighbours of a restaurant, by rank."""
+    __tablename__ = "restaurant_neighbors"
+
+    restaurant_id = Column(String(36), ForeignKey("restaurants.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    neighbor_id = Column(String(36), ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UserRecommendation(Base):
+    """Materialized personalized candidates: a user's top restaurants from booking/review history."""
+    __tablename__ = "user_recommendations"
+
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    restaurant_id = Column(String(36), ForeignKey("restaurants.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)  # 0..1, relative to the user's best candidate
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,200 @@
+"""
+Personalized restaurant candidates from booking and review history.
+
+Implicit feedback: every (user, restaurant) pair gets a weight from the user's bookings
+(completed > confirmed > pending > no-show; cancelled ignored) and reviews (4-5 stars
+positive, 3 stars weak, 1-2 stars excluded). An item-item co-occurrence model (cosine over
+the user x restaurant matrix) is trained in NumPy, and each user's candidates are the
+restaurants most co-visited with their own history, excluding what they already visited.
+
+The top ``TOP_N`` candidates per user are materialized in ``user_recommendations`` by a
+periodic job (retrained every ``_RETRAIN_SECONDS``), so request paths only read a user's
+rows. One process at a time runs it (the holder of the ``personalized-candidates`` lease,
+see ``app.core.leases``), and the training time is recorded on the lease, so a cold start
+with no interactions does not retrain on every tick. Users without history (or without
+co-visited restaurants) have no rows: callers keep their regular ranking for them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import leases, scheduler
+from app.core.database import AsyncSessionLocal
+from app.modules.bookings.models import Booking, BookingStatus
+from app.modules.restaurants.models import Restaurant, UserRecommendation
+from app.modules.reviews.models import Review
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 50
+_REFRESH_INTERVAL_SECONDS = 600
+_RETRAIN_SECONDS = 3600
+_LEASE_SECONDS = 3 * _REFRESH_INTERVAL_SECONDS
+_JOB = "personalized-candidates"
+_MAX_HISTORY = 100  # most recent restaurants per user used for training
+
+_BOOKING_WEIGHTS = {
+    BookingStatus.COMPLETED: 3.0,
+    BookingStatus.CONFIRMED: 2.0,
+    BookingStatus.PENDING: 1.0,
+    BookingStatus.NO_SHOW: 0.5,
+}
+_MIN_POSITIVE_RATING = 3
+
+
+def _review_weight(rating: int) -> float:
+    return 0.5 if rating == _MIN_POSITIVE_RATING else float(rating - 2)
+
+
+def train(
+    interactions: Iterable[tuple[str, str, float]], active: set[str], top_n: int = TOP_N
+) -> dict[str, list[tuple[str, float]]]:
+    """
+    ``interactions``: (user id, restaurant id, weight), most recent first, duplicates allowed.
+    Returns each user's candidates as (restaurant id, score in 0..1), best first.
+    """
+    pairs: dict[tuple[str, str], float] = {}
+    per_user: dict[str, int] = {}
+    for uid, rid, weight in interactions:
+        key = (uid, rid)
+        if key not in pairs:
+            if per_user.get(uid, 0) >= _MAX_HISTORY:
+                continue
+            per_user[uid] = per_user.get(uid, 0) + 1
+        pairs[key] = pairs.get(key, 0.0) + weight
+    if not pairs:
+        return {}
+
+    users: dict[str, int] = {}
+    items: dict[str, int] = {}
+    u_idx = np.fromiter((users.setdefault(u, len(users)) for u, _ in pairs), dtype=np.int64, count=len(pairs))
+    i_idx = np.fromiter((items.setdefault(r, len(items)) for _, r in pairs), dtype=np.int64, count=len(pairs))
+    w = np.log1p(np.fromiter(pairs.values(), dtype=np.float64, count=len(pairs)))
+    n_items = len(items)
+    item_ids = list(items)
+    item_active = np.fromiter((rid in active for rid in item_ids), dtype=bool, count=n_items)
+
+    # User-major CSR of the interaction matrix.
+    order = np.argsort(u_idx, kind="stable")
+    u_idx, i_idx, w = u_idx[order], i_idx[order], w[order]
+    u_ptr = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u_idx, minlength=len(users)), out=u_ptr[1:])
+
+    # Item-item co-occurrence (R^T R), cosine-normalized, as a row-major CSR.
+    rows, cols, vals = [], [], []
+    for u in range(len(users)):
+        lo, hi = u_ptr[u], u_ptr[u + 1]
+        if hi - lo < 2:
+            continue
+        its, ws = i_idx[lo:hi], w[lo:hi]
+        rows.append(np.repeat(its, len(its)))
+        cols.append(np.tile(its, len(its)))
+        vals.append(np.outer(ws, ws).ravel())
+    if not rows:
+        return {}
+    keys = np.concatenate(rows) * n_items + np.concatenate(cols)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    co = np.bincount(inverse, weights=np.concatenate(vals))
+    co_row, co_col = unique // n_items, unique % n_items
+    norms = np.sqrt(np.bincount(i_idx, weights=w * w, minlength=n_items))
+    co = co / (norms[co_row] * norms[co_col])
+    off_diagonal = co_row != co_col
+    co_row, co_col, co = co_row[off_diagonal], co_col[off_diagonal], co[off_diagonal]
+    co_ptr = np.zeros(n_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(co_row, minlength=n_items), out=co_ptr[1:])
+
+    user_ids = list(users)
+    out: dict[str, list[tuple[str, float]]] = {}
+    for u in range(len(users)):
+        lo, hi = u_ptr[u], u_ptr[u + 1]
+        history, ws = i_idx[lo:hi], w[lo:hi]
+        spans = [(co_ptr[i], co_ptr[i + 1]) for i in history]
+        if not any(e > s for s, e in spans):
+            continue
+        targets = np.concatenate([co_col[s:e] for s, e in spans])
+        weights = np.concatenate([co[s:e] * wi for (s, e), wi in zip(spans, ws)])
+        scores = np.bincount(targets, weights=weights, minlength=n_items)
+        scores[history] = 0.0
+        scores[~item_active] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            continue
+        if len(candidates) > top_n:
+            candidates = candidates[np.argpartition(-scores[candidates], top_n - 1)[:top_n]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        best = scores[candidates[0]]
+        out[user_ids[u]] = [(item_ids[i], round(float(scores[i] / best), 4)) for i in candidates]
+    return out
+
+
+async def _load_interactions(db: AsyncSession) -> list[tuple[str, str, float]]:
+    bookings = (
+        await db.execute(
+            select(Booking.user_id, Booking.restaurant_id, Booking.status)
+            .where(Booking.status != BookingStatus.CANCELLED)
+            .order_by(Booking.created_at.desc())
+        )
+    ).all()
+    reviews = (
+        await db.execute(
+            select(Review.user_id, Review.restaurant_id, Review.rating)
+            .where(Review.user_id.is_not(None), Review.rating >= _MIN_POSITIVE_RATING)
+            .order_by(Review.created_at.desc())
+        )
+    ).all()
+    out = [(str(u), str(r), _BOOKING_WEIGHTS.get(s, 1.0)) for u, r, s in bookings]
+    out.extend((str(u), str(r), _review_weight(int(rating))) for u, r, rating in reviews)
+    return out
+
+
+async def retrain(db: AsyncSession) -> int:
+    """Retrain the model and replace every materialized list; returns the number of users."""
+    interactions = await _load_interactions(db)
+    active = set((await db.execute(select(Restaurant.id).where(Restaurant.is_active == True))).scalars().all())
+    lists = await asyncio.to_thread(train, interactions, active)
+
+    await db.execute(delete(UserRecommendation))
+    now = datetime.utcnow()
+    params = [
+        {"user_id": uid, "rank": rank, "restaurant_id": rid, "score": score, "computed_at": now}
+        for uid, candidates in lists.items()
+        for rank, (rid, score) in enumerate(candidates)
+    ]
+    for start in range(0, len(params), 1000):
+        await db.execute(insert(UserRecommendation), params[start : start + 1000])
+    logger.info("Personalized candidates trained for %d users (%d interactions)", len(lists), len(interactions))
+    return len(lists)
+
+
+async def _refresh() -> None:
+    state = await leases.acquire(_JOB, _LEASE_SECONDS)
+    now = datetime.utcnow()
+    if state is None or (state.last_run_at is not None and state.last_run_at > now - timedelta(seconds=_RETRAIN_SECONDS)):
+        return
+    async with AsyncSessionLocal() as db:
+        await retrain(db)
+        if not await leases.record(db, _JOB, last_run_at=now):
+            await db.rollback()
+            return
+        await db.commit()
+
+
+async def load_affinity(db: AsyncSession, user_id: str) -> dict[str, float]:
+    """The user's materialized candidates (restaurant id -> 0..1); empty on cold start."""
+    result = await db.execute(
+        select(UserRecommendation.restaurant_id, UserRecommendation.score)
+        .where(UserRecommendation.user_id == user_id)
+        .order_by(UserRecommendation.rank)
+    )
+    return {str(rid): float(score) for rid, score in result.all()}
+
+
+scheduler.register("personalized-candidates", _REFRESH_INTERVAL_SECONDS, _refresh, initial_delay_seconds=20.0)
@@ -1,20 +1,29 @@
 """
 Restaurant API routes
 """
+import asyncio
 import json
 import os
 from functools import lru_cache
 from pathlib import Path
 from urllib.parse import quote_plus
-from fastapi import APIRouter, Depends, Query, UploadFile, File
-from starlette.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, and_, case
 from typing import Optional
+import numpy as np
 
 from app.core.database import get_db
+from app.core.geo import bounding_box, covering_cells, format_distance, haversine_km, prefix_upper_bound
+from app.core.images import InvalidImage, make_variants, variant_objects
 from app.core.deps import require_admin, require_admin_or_owner
-from app.modules.restaurants.models import Restaurant, MenuItem
+from app.core.security import get_current_user_id_optional
+from app.core.storage import get_storage
+from app.core.uploads import UploadRejected, multipart_openapi, receive_files
+from app.modules.restaurants.models import Restaurant, MenuItem, card_image
+from app.modules.restaurants.map_tiles import MAX_ZOOM, parse_bbox, pyramid
+from app.modules.restaurants import personalized, similar
+from app.modules.search.engine import engine as search_engine
 from app.modules.restaurants.schemas import (
     RestaurantResponse,
     RestaurantListResponse,
@@ -23,7 +32,8 @@ from app.modules.restaurants.schemas import (
     RestaurantUpdate,
     MenuItemBase,
 )
-from app.shared.schemas import success_response, error_response, paginated_response
+from app.shared.pagination import after, decode_cursor, encode_cursor
+from app.shared.schemas import success_response, error_response, paginated_response, cursor_response
 from app.modules.auth.models import User, UserRole
 
 router = APIRouter(prefix="/restaurants", tags=["Restaurants"])
@@ -32,6 +42,18 @@ GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "smart-travel-images-2025")
 GCS_RESTAURANTS_PREFIX = os.environ.get("GCS_RESTAURANTS_PREFIX", "restaurants")
 GCS_RESTAURANTS_BASE = f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{GCS_RESTAURANTS_PREFIX}/"
 
+# Rating points added for a restaurant at the top of the caller's personalized candidates.
+_PERSONAL_RATING_BOOST = 1.5
+
+# sort_by=distance without a radius: search rings from this radius, doubling up to the max,
+# until the requested page is covered; only then scan everything.
+_NEAREST_START_KM = 2.0
+_NEAREST_MAX_KM = 50.0
+
+_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+_MAX_IMAGES_PER_UPLOAD = 20
+_IMAGE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp", "image/gif"}
+
 
 def _google_maps_url(place_id: str, lat: Optional[float] = None, lng: Optional[float] = None) -> str:
     if place_id:
@@ -109,6 +131,95 @@ def _augment_images(restaurant_id: str, image: Optional[str], images: Optional[l
     return main, merged
 
 
+def _list_item(r: Restaurant) -> dict:
+    item = RestaurantListResponse.model_validate(r).model_dump()
+    main, imgs = _augment_images(item["id"], item.get("image"), item.get("images"))
+    # Cards show the small variant of uploaded images; ``images`` keeps the full ones.
+    item["image"] = card_image(main, r.image_variants)
+    item["images"] = imgs
+    item["google_maps_url"] = _google_maps_url(item.get("id") or "", r.latitude, r.longitude)
+    return item
+
+
+async def _rank_by_distance(
+    db: AsyncSession, query, lat: float, lng: float, radius_km: Optional[float] = None
+) -> list[tuple[str, float]]:
+    """Nearest-first (id, distance_km) for the rows matched by ``query``.
+
+    Candidates come from geohash-cell range scans on the indexed ``geo_cell`` column (plus a
+    lat/lng bounding box); exact distances are then computed in one vectorized pass.
+    """
+    coords_query = query.with_only_columns(Restaurant.id, Restaurant.latitude, Restaurant.longitude).where(
+        Restaurant.latitude.is_not(None),
+        Restaurant.longitude.is_not(None),
+    )
+    if radius_km:
+        cell_filters = []
+        for cell in covering_cells(lat, lng, radius_km):
+            upper = prefix_upper_bound(cell)
+            if upper is None:
+                cell_filters.append(Restaurant.geo_cell >= cell)
+            else:
+                cell_filters.append(and_(Restaurant.geo_cell >= cell, Restaurant.geo_cell < upper))
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        coords_query = coords_query.where(
+            or_(*cell_filters),
+            Restaurant.latitude.between(min_lat, max_lat),
+            Restaurant.longitude.between(min_lng, max_lng),
+        )
+
+    rows = (await db.execute(coords_query)).all()
+    if not rows:
+        return []
+
+    ids = [row[0] for row in rows]
+    lats = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    lngs = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    distances = haversine_km(lat, lng, lats, lngs)
+
+    order = np.argsort(distances, kind="stable")
+    if radius_km:
+        order = order[distances[order] <= radius_km]
+    return [(ids[i], float(distances[i])) for i in order]
+
+
+async def _rank_nearest(db: AsyncSession, query, lat: float, lng: float, needed: int) -> list[tuple[str, float]]:
+    """Nearest-first rows for ``query``, enough to cover the first ``needed`` (when they exist).
+
+    Widens the search circle until it holds ``needed`` rows, so a page near the start never
+    loads the whole city; falls back to a full scan past ``_NEAREST_MAX_KM``.
+    """
+    radius_km = _NEAREST_START_KM
+    while True:
+        ranked = await _rank_by_distance(db, query, lat, lng, radius_km)
+        if len(ranked) >= needed:
+            return ranked
+        if radius_km >= _NEAREST_MAX_KM:
+            return await _rank_by_distance(db, query, lat, lng)
+        radius_km = min(radius_km * 2, _NEAREST_MAX_KM)
+
+
+async def _load_ranked_page(
+    db: AsyncSession, ranked: list[tuple[str, float]], page: int, limit: int
+) -> list[dict]:
+    window = ranked[(page - 1) * limit : page * limit]
+    if not window:
+        return []
+    result = await db.execute(select(Restaurant).where(Restaurant.id.in_([rid for rid, _ in window])))
+    by_id = {r.id: r for r in result.scalars().all()}
+
+    payload = []
+    for rid, distance_km in window:
+        r = by_id.get(rid)
+        if not r:
+            continue
+        item = _list_item(r)
+        item["distance"] = format_distance(distance_km)
+        item["distance_km"] = round(distance_km, 3)
+        payload.append(item)
+    return payload
+
+
 async def _get_restaurant_for_manage(
     restaurant_id: str, user: User, db: AsyncSession
 ) -> Optional[Restaurant]:
@@ -131,11 +242,27 @@ async def get_restaurants(
     cuisine: Optional[str] = None,
     price_level: Optional[int] = Query(None, ge=1, le=4),
     rating: Optional[float] = Query(None, ge=0, le=5),
-    sort_by: Optional[str] = Query("rating", regex="^(rating|price|name)$"),
+    sort_by: Optional[str] = Query("rating", regex="^(rating|price|name|distance|recommended|trending)$"),
     sort_order: Optional[str] = Query("desc", regex="^(asc|desc)$"),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, gt=0, le=50),
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = Depends(get_current_user_id_optional),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get list of restaurants with filters"""
+    """Get list of restaurants with filters.
+
+    ``sort_by=distance`` needs ``lat``/``lng`` and always returns nearest first; ``radius`` (km)
+    optionally restricts results to that circle; without it, the search circle widens until
+    the page is covered (``_rank_nearest``). ``sort_by=recommended`` blends the caller's
+    personalized candidates into the rating order (plain rating order for guests and users
+    without history). ``sort_by=trending`` orders by recent activity, most trending first.
+
+    ``sort_by=rating`` orders by the Bayesian ``rank_score``. Passing ``cursor`` (empty for the
+    first page, then ``meta.pagination.next_cursor``) switches that sort to keyset pagination:
+    no COUNT and no OFFSET, each page is a range scan of ``(is_active, rank_score, id)``.
+    """
     query = select(Restaurant).where(Restaurant.is_active == True)
     
     # Apply filters
@@ -156,6 +283,52 @@ async def get_restaurants(
     
     if rating:
         query = query.where(Restaurant.rating >= rating)
+
+    if cursor is not None:
+        if sort_by != "rating":
+            return error_response("E4000", "Chỉ hỗ trợ cursor khi sắp xếp theo rating")
+        descending = sort_order == "desc"
+        rank_key = (Restaurant.rank_score, Restaurant.id)
+        if cursor:
+            values = decode_cursor(cursor, len(rank_key))
+            if (
+                values is None
+                or isinstance(values[0], bool)
+                or not isinstance(values[0], (int, float))
+                or not isinstance(values[1], str)
+            ):
+                return error_response("E4000", "Cursor không hợp lệ")
+            query = query.where(after(rank_key, values, descending))
+        query = query.order_by(*(col.desc() if descending else col.asc() for col in rank_key)).limit(limit + 1)
+        rows = (await db.execute(query)).scalars().all()
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor([last.rank_score, last.id])
+        return cursor_response(
+            data=[_list_item(r) for r in rows[:limit]],
+            next_cursor=next_cursor,
+            limit=limit,
+            message="Lấy danh sách nhà hàng thành công"
+        )
+
+    if sort_by == "distance":
+        if lat is None or lng is None:
+            return error_response("E4000", "Cần truyền lat/lng để sắp xếp theo khoảng cách")
+        if radius:
+            ranked = await _rank_by_distance(db, query, lat, lng, radius)
+            total = len(ranked)
+        else:
+            ranked = await _rank_nearest(db, query, lat, lng, page * limit)
+            located = query.where(Restaurant.latitude.is_not(None), Restaurant.longitude.is_not(None))
+            total = (await db.execute(select(func.count()).select_from(located.subquery()))).scalar()
+        return paginated_response(
+            data=await _load_ranked_page(db, ranked, page, limit),
+            total=total,
+            page=page,
+            limit=limit,
+            message="Lấy danh sách nhà hàng thành công"
+        )
     
     # Count total
     count_query = select(func.count()).select_from(query.subquery())
@@ -163,17 +336,30 @@ async def get_restaurants(
     total = total_result.scalar()
     
     # Apply sorting
-    if sort_by == "rating":
-        order_col = Restaurant.rating
-    elif sort_by == "price":
-        order_col = Restaurant.price_level
-    else:
-        order_col = Restaurant.name
-    
-    if sort_order == "desc":
-        query = query.order_by(order_col.desc())
+    if sort_by == "recommended":
+        affinity = await personalized.load_affinity(db, user_id) if user_id else {}
+        if affinity:
+            boost = case(affinity, value=Restaurant.id, else_=0.0)
+            query = query.order_by(
+                (func.coalesce(Restaurant.rank_score, 0.0) + _PERSONAL_RATING_BOOST * boost).desc(),
+                Restaurant.id,
+            )
+        else:
+            query = query.order_by(Restaurant.rank_score.desc(), Restaurant.id.desc())
+    elif sort_by == "trending":
+        query = query.order_by(Restaurant.trending_score.desc(), Restaurant.id)
     else:
-        query = query.order_by(order_col.asc())
+        if sort_by == "rating":
+            order_col = Restaurant.rank_score
+        elif sort_by == "price":
+            order_col = Restaurant.price_level
+        else:
+            order_col = Restaurant.name
+
+        if sort_order == "desc":
+            query = query.order_by(order_col.desc(), Restaurant.id.desc())
+        else:
+            query = query.order_by(order_col.asc(), Restaurant.id.asc())
     
     # Apply pagination
     query = query.offset((page - 1) * limit).limit(limit)
@@ -181,14 +367,7 @@ async def get_restaurants(
     result = await db.execute(query)
     restaurants = result.scalars().all()
 
-    payload = []
-    for r in restaurants:
-        item = RestaurantListResponse.model_validate(r).model_dump()
-        main, imgs = _augment_images(item["id"], item.get("image"), item.get("images"))
-        item["image"] = main
-        item["images"] = imgs
-        item["google_maps_url"] = _google_maps_url(item.get("id") or "", r.latitude, r.longitude)
-        payload.append(item)
+    payload = [_list_item(r) for r in restaurants]
 
     return paginated_response(
         data=payload,
@@ -199,33 +378,110 @@ async def get_restaurants(
     )
 
 
+@router.get("/trending", response_model=dict)
+async def get_trending_restaurants(
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+):
+    """Restaurants with the most recent activity (time-decayed bookings, reviews and likes)."""
+    query = (
+        select(Restaurant)
+        .where(Restaurant.is_active == True, Restaurant.trending_score > 0)
+        .order_by(Restaurant.trending_score.desc(), Restaurant.id)
+    )
+    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar() or 0
+    result = await db.execute(query.offset((page - 1) * limit).limit(limit))
+
+    payload = []
+    for r in result.scalars().all():
+        item = _list_item(r)
+        item["trending_score"] = r.trending_score
+        payload.append(item)
+    return paginated_response(
+        data=payload,
+        total=total,
+        page=page,
+        limit=limit,
+        message="Lấy danh sách nhà hàng nổi bật thành công"
+    )
+
+
+@router.get("/nearby", response_model=dict)
+async def get_nearby_restaurants(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(2.0, gt=0, le=50),
+    cuisine: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get active restaurants within ``radius`` km of (lat, lng), nearest first."""
+    query = select(Restaurant).where(Restaurant.is_active == True)
+    if cuisine:
+        query = query.where(Restaurant.cuisine.ilike(f"%{cuisine}%"))
+
+    ranked = await _rank_by_distance(db, query, lat, lng, radius)
+    return paginated_response(
+        data=await _load_ranked_page(db, ranked, page, limit),
+        total=len(ranked),
+        page=page,
+        limit=limit,
+        message="Lấy danh sách nhà hàng gần bạn thành công",
+    )
+
+
+@router.get("/map", response_model=dict)
+async def get_restaurant_map(
+    bbox: str = Query(..., description="min_lng,min_lat,max_lng,max_lat"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+    db: AsyncSession = Depends(get_db),
+):
+    """Clustered map markers (count + centroid per cell) for a viewport."""
+    parsed = parse_bbox(bbox)
+    if not parsed:
+        return error_response("E4000", "bbox không hợp lệ (min_lng,min_lat,max_lng,max_lat)")
+
+    await pyramid.ensure_fresh(db)
+    items = pyramid.query(*parsed, zoom=zoom)
+    return success_response(
+        data={
+            "zoom": zoom,
+            "items": items,
+            "total": sum(item["count"] for item in items),
+        },
+        message="OK",
+    )
+
+
 @router.get("/search", response_model=dict)
 async def search_restaurants(
     q: str = Query(..., min_length=1),
     limit: int = Query(10, ge=1, le=50),
     db: AsyncSession = Depends(get_db)
 ):
-    """Search restaurants by name, cuisine, or description"""
-    query = select(Restaurant).where(
-        Restaurant.is_active == True,
-        or_(
-            Restaurant.name.ilike(f"%{q}%"),
-            Restaurant.description.ilike(f"%{q}%"),
-            Restaurant.cuisine.ilike(f"%{q}%")
-        )
-    ).order_by(Restaurant.rating.desc()).limit(limit)
-    
-    result = await db.execute(query)
-    restaurants = result.scalars().all()
+    """Search restaurants by name, cuisine, or description (typo/diacritic tolerant)"""
+    ranked, _ = await search_engine.search(q, include_dishes=False, limit=limit)
+    ids = [hit["id"] for hit in ranked.hits]
+    if ids:
+        result = await db.execute(select(Restaurant).where(Restaurant.id.in_(ids)))
+        by_id = {r.id: r for r in result.scalars().all()}
+        restaurants = [by_id[rid] for rid in ids if rid in by_id]
+    else:
+        # Substring matches inside words are still served by the plain scan.
+        query = select(Restaurant).where(
+            Restaurant.is_active == True,
+            or_(
+                Restaurant.name.ilike(f"%{q}%"),
+                Restaurant.description.ilike(f"%{q}%"),
+                Restaurant.cuisine.ilike(f"%{q}%")
+            )
+        ).order_by(Restaurant.rating.desc()).limit(limit)
+        result = await db.execute(query)
+        restaurants = result.scalars().all()
     
-    payload = []
-    for r in restaurants:
-        item = RestaurantListResponse.model_validate(r).model_dump()
-        main, imgs = _augment_images(item["id"], item.get("image"), item.get("images"))
-        item["image"] = main
-        item["images"] = imgs
-        item["google_maps_url"] = _google_maps_url(item.get("id") or "", r.latitude, r.longitude)
-        payload.append(item)
+    payload = [_list_item(r) for r in restaurants]
 
     return success_response(
         data=payload,
@@ -246,14 +502,7 @@ async def get_my_restaurants(
     result = await db.execute(query.order_by(Restaurant.updated_at.desc()))
     restaurants = result.scalars().all()
 
-    payload = []
-    for r in restaurants:
-        item = RestaurantListResponse.model_validate(r).model_dump()
-        main, imgs = _augment_images(item["id"], item.get("image"), item.get("images"))
-        item["image"] = main
-        item["images"] = imgs
-        item["google_maps_url"] = _google_maps_url(item.get("id") or "", r.latitude, r.longitude)
-        payload.append(item)
+    payload = [_list_item(r) for r in restaurants]
 
     return success_response(data=payload, message="OK")
 
@@ -429,65 +678,59 @@ async def assign_restaurant_owner(
     return success_response(data=data, message="Gán đối tác cho nhà hàng thành công")
 
 
-@router.post("/{restaurant_id}/images", response_model=dict)
+@router.post("/{restaurant_id}/images", response_model=dict, openapi_extra=multipart_openapi("files", multiple=True))
 async def upload_restaurant_images(
     restaurant_id: str,
-    files: list[UploadFile] = File(...),
+    request: Request,
     user: User = Depends(require_admin_or_owner),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload restaurant images to GCS and append to restaurant.images (admin/owner)."""
+    """Upload restaurant images to object storage and append to restaurant.images (admin/owner).
+
+    The multipart body is streamed to temporary files; files over 5MB are skipped as they arrive.
+    """
     restaurant = await _get_restaurant_for_manage(restaurant_id, user, db)
     if not restaurant:
         return error_response("E3002", "Không tìm thấy nhà hàng hoặc không có quyền")
 
-    if not files:
-        return error_response("E4000", "Chưa chọn ảnh")
-
-    bucket_name = os.environ.get("GCS_BUCKET_NAME", "smart-travel-images-2025")
     prefix = os.environ.get("GCS_RESTAURANTS_PREFIX", "restaurants")
     upload_prefix = os.environ.get("GCS_RESTAURANTS_UPLOAD_PREFIX", "uploads")
 
-    ext_map = {
-        "image/jpeg": "jpg",
-        "image/jpg": "jpg",
-        "image/png": "png",
-        "image/webp": "webp",
-        "image/gif": "gif",
-    }
-
-    uploaded_urls: list[str] = []
-    for file in files:
-        if not file.content_type or not file.content_type.startswith("image/"):
-            continue
-        raw = await file.read()
-        if not raw:
-            continue
-        if len(raw) > 5 * 1024 * 1024:
-            continue
-
-        ext = ext_map.get(file.content_type.lower())
-        if not ext:
+    try:
+        async with receive_files(request, max_file_bytes=_MAX_IMAGE_BYTES, max_files=_MAX_IMAGES_PER_UPLOAD) as files:
+            files = [f for f in files if f.field_name == "files"]
+            if not files:
+                return error_response("E4000", "Chưa chọn ảnh")
+            paths = [f.path for f in files if f.path and f.size and f.content_type in _IMAGE_TYPES]
+            # Resize every image in the process pool (workers read the temporary files).
+            processed = await asyncio.gather(*(make_variants(path) for path in paths), return_exceptions=True)
+    except UploadRejected as e:
+        return error_response("E4000", e.message)
+
+    uploads: list[tuple[str, bytes, str]] = []
+    names: list[list[str]] = []
+    for variants in processed:
+        if isinstance(variants, InvalidImage):
             continue
+        if isinstance(variants, BaseException):
+            return error_response("E5000", "Không xử lý được ảnh nhà hàng", {"error": str(variants)})
+        object_base = f"{prefix}/{upload_prefix}/{restaurant_id}/{os.urandom(12).hex()}"
+        uploads.extend(variant_objects(object_base, variants))
+        names.append(list(variants))
 
-        object_name = f"{prefix}/{upload_prefix}/{restaurant_id}/{os.urandom(12).hex()}.{ext}"
-
-        try:
-            from google.cloud import storage
-
-            client = storage.Client()
-            bucket = client.bucket(bucket_name)
-            blob = bucket.blob(object_name)
-            blob.cache_control = "public, max-age=31536000, immutable"
-            await run_in_threadpool(blob.upload_from_string, raw, content_type=file.content_type.lower())
-        except Exception as e:
-            return error_response("E5000", "Không upload được ảnh nhà hàng", {"error": str(e)})
-
-        uploaded_urls.append(f"https://storage.googleapis.com/{bucket_name}/{object_name}")
+    try:
+        urls = iter(await get_storage().upload_many(uploads))
+    except Exception as e:
+        return error_response("E5000", "Không upload được ảnh nhà hàng", {"error": str(e)})
 
+    new_variants = [{name: next(urls) for name in group} for group in names]
+    uploaded_urls = [v["full"] for v in new_variants]
     if not uploaded_urls:
         return error_response("E4000", "Không có ảnh hợp lệ để upload")
 
+    variant_map = dict(restaurant.image_variants) if isinstance(restaurant.image_variants, dict) else {}
+    variant_map.update((v["full"], v) for v in new_variants)
+    restaurant.image_variants = variant_map
     current_images = restaurant.images if isinstance(restaurant.images, list) else []
     restaurant.images = list(dict.fromkeys([*current_images, *uploaded_urls]))
     if not restaurant.image:
@@ -524,6 +767,8 @@ async def remove_restaurant_image(
     restaurant.images = new_images
     if restaurant.image == url:
         restaurant.image = new_images[0] if new_images else None
+    if isinstance(restaurant.image_variants, dict) and url in restaurant.image_variants:
+        restaurant.image_variants = {k: v for k, v in restaurant.image_variants.items() if k != url}
 
     await db.flush()
     await db.refresh(restaurant)
@@ -713,6 +958,29 @@ async def get_restaurant_stats(
     )
 
 
+@router.get("/{restaurant_id}/similar", response_model=dict)
+async def get_similar_restaurants(
+    restaurant_id: str,
+    limit: int = Query(6, ge=1, le=similar.TOP_K),
+    db: AsyncSession = Depends(get_db),
+):
+    """Restaurants similar to this one (precomputed nearest neighbours)"""
+    neighbours = await similar.load_similar(db, restaurant_id, limit)
+    if not neighbours:
+        exists = await db.execute(
+            select(Restaurant.id).where(Restaurant.id == restaurant_id, Restaurant.is_active == True)
+        )
+        if exists.scalar_one_or_none() is None:
+            return error_response("E3002", "Không tìm thấy nhà hàng")
+
+    data = []
+    for r, score in neighbours:
+        item = _list_item(r)
+        item["similarity"] = score
+        data.append(item)
+    return success_response(data=data, message="Lấy nhà hàng tương tự thành công")
+
+
 @router.get("/{restaurant_id}", response_model=dict)
 async def get_restaurant(
     restaurant_id: str,
@@ -744,6 +1012,7 @@ async def get_restaurant(
     main, imgs = _augment_images(restaurant_data["id"], restaurant_data.get("image"), restaurant_data.get("images"))
     restaurant_data["image"] = main
     restaurant_data["images"] = imgs
+    restaurant_data["image_variants"] = restaurant.image_variants if isinstance(restaurant.image_variants, dict) else {}
     restaurant_data["menu"] = [MenuItemResponse.model_validate(m).model_dump() for m in menu_items]
     restaurant_data["google_maps_url"] = _google_maps_url(restaurant_data.get("id") or "", restaurant.latitude, restaurant.longitude)
     
@@ -2,7 +2,7 @@
 Restaurant schemas
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -99,6 +99,8 @@ class RestaurantResponse(RestaurantBase):
     is_open: bool = True
     location: Optional[GeoLocation] = None
     menu: List[MenuItemResponse] = []
+    # Resized copies of uploaded images: {image URL: {"thumb"|"card"|"full": URL}}
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
     created_at: datetime
     updated_at: datetime
     
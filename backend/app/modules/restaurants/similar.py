@@ -0,0 +1,351 @@
+"""
+"Similar restaurants": precomputed nearest neighbours.
+
+Each restaurant is described by a TF-IDF vector over its folded name and specialty tokens
+plus its cuisine, and by its price level and location. Similarity is the cosine of the
+token vectors blended with price closeness and geographic proximity; only restaurants that
+share at least one token are considered. The top ``TOP_K`` neighbours of every restaurant
+are stored in ``restaurant_neighbors``, so the endpoint is a single primary-key range read.
+
+A periodic job keeps the table current. One process at a time writes it (the holder of the
+``similar-restaurants`` lease, see ``app.core.leases``); the others skip the job. The writer
+recomputes the whole table once the last full rebuild (recorded on the lease) is older than
+``_FULL_REBUILD_SECONDS``. Between rebuilds it reads the restaurants updated since its
+watermark (so edits made through any worker are seen), and those whose
+name/cuisine/specialty/price/location/visibility changed are patched into the cached model
+and recomputed together with every list they appear in and every list they now belong to.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import leases, scheduler
+from app.core.database import AsyncSessionLocal
+from app.core.geo import haversine_km
+from app.modules.restaurants import changes
+from app.modules.restaurants.changes import RestaurantChange
+from app.modules.restaurants.models import Restaurant, RestaurantNeighbor
+from app.shared.text import fold_diacritics
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 12
+_REFRESH_INTERVAL_SECONDS = 30
+_FULL_REBUILD_SECONDS = 24 * 3600
+_LEASE_SECONDS = 5 * _REFRESH_INTERVAL_SECONDS
+_WATERMARK_OVERLAP_SECONDS = 60  # re-read recent updates that may have committed late
+_JOB = "similar-restaurants"
+
+_TOKEN_RE = re.compile(r"[a-z]{2,}")
+_W_NAME = 1.0
+_W_SPECIALTY = 2.0
+_W_CUISINE = 2.0
+
+# Blend of the similarity components (sums to 1).
+_TEXT_WEIGHT = 0.7
+_PRICE_WEIGHT = 0.15
+_GEO_WEIGHT = 0.15
+_GEO_DECAY_KM = 5.0
+
+# (name, cuisine, specialty, price_level, latitude, longitude)
+Features = tuple[str, str, tuple[str, ...], int, Optional[float], Optional[float]]
+
+
+def _raw_terms(name: str, cuisine: str, specialty: Iterable[str]) -> dict[str, float]:
+    terms: dict[str, float] = {}
+    for text, weight in ((name, _W_NAME), (" ".join(specialty), _W_SPECIALTY)):
+        for token in _TOKEN_RE.findall(fold_diacritics(text)):
+            terms[token] = max(terms.get(token, 0.0), weight)
+    cuisine_key = " ".join(_TOKEN_RE.findall(fold_diacritics(cuisine)))
+    if cuisine_key:
+        terms[f"c:{cuisine_key}"] = _W_CUISINE
+    return terms
+
+
+@dataclass
+class SimilarityModel:
+    ids: list[str]
+    positions: dict[str, int]
+    features: dict[str, Features]
+    # token vectors, CSR by restaurant and by term
+    doc_ptr: np.ndarray
+    doc_terms: np.ndarray
+    doc_weights: np.ndarray
+    term_ptr: np.ndarray
+    term_docs: np.ndarray
+    term_weights: np.ndarray
+    price_level: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def patched(self, changes: dict[str, Optional[Features]]) -> "SimilarityModel":
+        """This model with ``changes`` applied (new features, or None to remove), rebuilt
+        from the cached features without reading the catalogue again."""
+        features = dict(self.features)
+        for rid, feature in changes.items():
+            if feature is None:
+                features.pop(rid, None)
+            else:
+                features[rid] = feature
+        return _build(features)
+
+    def neighbours(self, rid: str, k: int = TOP_K) -> list[tuple[str, float]]:
+        pos = self.positions.get(rid)
+        if pos is None:
+            return []
+        lo, hi = self.doc_ptr[pos], self.doc_ptr[pos + 1]
+        terms, weights = self.doc_terms[lo:hi], self.doc_weights[lo:hi]
+        if not len(terms):
+            return []
+
+        docs = [self.term_docs[self.term_ptr[t] : self.term_ptr[t + 1]] for t in terms]
+        vals = [self.term_weights[self.term_ptr[t] : self.term_ptr[t + 1]] * w for t, w in zip(terms, weights)]
+        cosine = np.bincount(np.concatenate(docs), weights=np.concatenate(vals), minlength=len(self.ids))
+        cosine[pos] = 0.0
+        candidates = np.flatnonzero(cosine > 1e-9)
+        if not len(candidates):
+            return []
+
+        price = 1.0 - np.abs(self.price_level[candidates] - self.price_level[pos]) / 3.0
+        geo = np.zeros(len(candidates))
+        if not math.isnan(self.latitude[pos]):
+            distance = haversine_km(
+                float(self.latitude[pos]), float(self.longitude[pos]),
+                self.latitude[candidates], self.longitude[candidates],
+            )
+            geo = np.nan_to_num(np.exp(-distance / _GEO_DECAY_KM), nan=0.0)
+        score = _TEXT_WEIGHT * cosine[candidates] + _PRICE_WEIGHT * price + _GEO_WEIGHT * geo
+
+        if len(candidates) > k:
+            top = np.argpartition(-score, k)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -score[top]))]
+        return [(self.ids[candidates[i]], round(float(score[i]), 4)) for i in top]
+
+
+_FEATURE_COLUMNS = (
+    Restaurant.id,
+    Restaurant.name,
+    Restaurant.cuisine,
+    Restaurant.specialty,
+    Restaurant.price_level,
+    Restaurant.latitude,
+    Restaurant.longitude,
+)
+
+
+def _features(row: Any) -> Features:
+    """Features of a ``_FEATURE_COLUMNS`` row."""
+    _, name, cuisine, specialty, price_level, lat, lng = row[:7]
+    tags = tuple(str(t) for t in specialty if t) if isinstance(specialty, list) else ()
+    return (name or "", cuisine or "", tags, int(price_level or 2), lat, lng)
+
+
+def build_model(rows: Iterable[Any]) -> SimilarityModel:
+    """Rows: (id, name, cuisine, specialty, price_level, latitude, longitude)."""
+    return _build({str(row[0]): _features(row) for row in rows})
+
+
+def _build(features: dict[str, Features]) -> SimilarityModel:
+    ids = list(features)
+    docs = [_raw_terms(f[0], f[1], f[2]) for f in features.values()]
+
+    vocab: dict[str, int] = {}
+    df: list[int] = []
+    for terms in docs:
+        for term in terms:
+            tid = vocab.setdefault(term, len(vocab))
+            if tid == len(df):
+                df.append(0)
+            df[tid] += 1
+    n = len(ids)
+    idf = np.log((1.0 + n) / (1.0 + np.asarray(df, dtype=np.float64))) + 1.0 if df else np.zeros(0)
+
+    doc_ptr = np.zeros(n + 1, dtype=np.int64)
+    doc_terms: list[int] = []
+    doc_weights: list[float] = []
+    for pos, terms in enumerate(docs):
+        tids = [vocab[t] for t in terms]
+        weights = np.asarray(list(terms.values()), dtype=np.float64) * idf[tids] if tids else np.zeros(0)
+        norm = float(np.linalg.norm(weights))
+        if norm > 0:
+            doc_terms.extend(tids)
+            doc_weights.extend((weights / norm).tolist())
+        doc_ptr[pos + 1] = len(doc_terms)
+    doc_terms_arr = np.asarray(doc_terms, dtype=np.int32)
+    doc_weights_arr = np.asarray(doc_weights, dtype=np.float32)
+
+    # Transpose to postings (term -> restaurants).
+    doc_of = np.repeat(np.arange(n, dtype=np.int32), np.diff(doc_ptr))
+    order = np.argsort(doc_terms_arr, kind="stable")
+    term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(doc_terms_arr, minlength=len(vocab)), out=term_ptr[1:])
+
+    def column(values: list[Any], dtype: Any) -> np.ndarray:
+        return np.asarray([np.nan if v is None else v for v in values], dtype=dtype)
+
+    return SimilarityModel(
+        ids=ids,
+        positions={rid: pos for pos, rid in enumerate(ids)},
+        features=features,
+        doc_ptr=doc_ptr,
+        doc_terms=doc_terms_arr,
+        doc_weights=doc_weights_arr,
+        term_ptr=term_ptr,
+        term_docs=doc_of[order],
+        term_weights=doc_weights_arr[order],
+        price_level=column([f[3] for f in features.values()], np.float32),
+        latitude=column([f[4] for f in features.values()], np.float64),
+        longitude=column([f[5] for f in features.values()], np.float64),
+    )
+
+
+class NeighbourTable:
+    """Keeps ``restaurant_neighbors`` up to date; subscribed to the restaurant change feed."""
+
+    def __init__(self) -> None:
+        self._model: Optional[SimilarityModel] = None  # only kept by the writer
+        self._dirty: set[str] = set()
+        self._reset = False
+        self._lock = asyncio.Lock()
+
+    def on_changes(self, items: list[RestaurantChange]) -> None:
+        model = self._model
+        for change in items:
+            known = model.features.get(change.id) if model else None
+            current: Features = (
+                change.name, change.cuisine, change.specialty, change.price_level,
+                change.latitude, change.longitude,
+            )
+            if known != current or not change.visible:
+                self._dirty.add(change.id)
+
+    def on_reset(self) -> None:
+        self._reset = True
+
+    async def _load_model(self, db: AsyncSession) -> SimilarityModel:
+        rows = (await db.execute(select(*_FEATURE_COLUMNS).where(Restaurant.is_active == True))).fetchall()
+        self._model = await asyncio.to_thread(build_model, rows)
+        return self._model
+
+    @staticmethod
+    async def _store(db: AsyncSession, lists: dict[str, list[tuple[str, float]]]) -> None:
+        ids = list(lists)
+        for start in range(0, len(ids), 500):
+            await db.execute(delete(RestaurantNeighbor).where(RestaurantNeighbor.restaurant_id.in_(ids[start : start + 500])))
+        now = datetime.utcnow()
+        params = [
+            {"restaurant_id": rid, "rank": rank, "neighbor_id": nid, "score": score, "computed_at": now}
+            for rid, neighbours in lists.items()
+            for rank, (nid, score) in enumerate(neighbours)
+        ]
+        for start in range(0, len(params), 1000):
+            await db.execute(insert(RestaurantNeighbor), params[start : start + 1000])
+
+    async def rebuild_all(self, db: AsyncSession) -> int:
+        model = await self._load_model(db)
+        lists = await asyncio.to_thread(lambda: {rid: model.neighbours(rid) for rid in model.ids})
+        await db.execute(delete(RestaurantNeighbor))
+        await self._store(db, lists)
+        logger.info("Similar restaurants recomputed for %d restaurants", len(lists))
+        return len(lists)
+
+    async def _changed_since(self, db: AsyncSession, since: datetime) -> dict[str, Optional[Features]]:
+        """Restaurants updated after ``since`` whose features differ from the cached model
+        (id -> new features, None when hidden), plus the ones flagged by the change feed."""
+        model = self._model
+        dirty, self._dirty = self._dirty, set()
+        rows = (
+            await db.execute(
+                select(*_FEATURE_COLUMNS, Restaurant.is_active).where(
+                    or_(Restaurant.updated_at > since, Restaurant.id.in_(list(dirty)))
+                )
+            )
+        ).fetchall()
+        changed: dict[str, Optional[Features]] = {rid: None for rid in dirty}  # deleted unless found
+        for row in rows:
+            rid = str(row.id)
+            feature = _features(row) if row.is_active is None or row.is_active else None
+            if rid in dirty or model.features.get(rid) != feature:
+                changed[rid] = feature
+        return changed
+
+    async def update(self, db: AsyncSession, changed: dict[str, Optional[Features]]) -> int:
+        """Patch ``changed`` restaurants (None: hidden) into the cached model and recompute
+        the lists they touch; returns how many were rewritten."""
+        old = self._model
+        self._model = model = await asyncio.to_thread(old.patched, changed)
+        referencing = (
+            await db.execute(
+                select(RestaurantNeighbor.restaurant_id).where(RestaurantNeighbor.neighbor_id.in_(list(changed)))
+            )
+        ).scalars().all()
+
+        affected = set(changed) | set(referencing)
+        for rid in changed:
+            affected.update(nid for nid, _ in model.neighbours(rid))
+        lists = {rid: model.neighbours(rid) for rid in affected}  # [] for hidden restaurants
+        await self._store(db, lists)
+        return len(lists)
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            state = await leases.acquire(_JOB, _LEASE_SECONDS)
+            if state is None:
+                # Another process writes the table; changes made here reach it via the watermark.
+                self._model = None
+                self._dirty.clear()
+                self._reset = False
+                return
+            now = datetime.utcnow()
+            async with AsyncSessionLocal() as db:
+                stale = state.last_run_at is None or state.last_run_at < now - timedelta(seconds=_FULL_REBUILD_SECONDS)
+                if self._reset or stale or state.watermark is None:
+                    self._reset = False
+                    self._dirty.clear()
+                    await self.rebuild_all(db)
+                    if not await leases.record(db, _JOB, last_run_at=now, watermark=now):
+                        await db.rollback()
+                        return
+                else:
+                    if self._model is None:  # just became the writer
+                        await self._load_model(db)
+                    since = min(state.watermark, now) - timedelta(seconds=_WATERMARK_OVERLAP_SECONDS)
+                    changed = await self._changed_since(db, since)
+                    if changed:
+                        await self.update(db, changed)
+                    if not await leases.record(db, _JOB, watermark=now):
+                        await db.rollback()
+                        return
+                await db.commit()
+
+
+async def load_similar(db: AsyncSession, restaurant_id: str, limit: int) -> list[tuple[Restaurant, float]]:
+    """Stored neighbours of ``restaurant_id`` that are still active, best first."""
+    result = await db.execute(
+        select(Restaurant, RestaurantNeighbor.score)
+        .join(RestaurantNeighbor, RestaurantNeighbor.neighbor_id == Restaurant.id)
+        .where(RestaurantNeighbor.restaurant_id == restaurant_id, Restaurant.is_active == True)
+        .order_by(RestaurantNeighbor.rank)
+        .limit(limit)
+    )
+    return [(r, float(score)) for r, score in result.all()]
+
+
+table = changes.subscribe(NeighbourTable())
+scheduler.register("similar-restaurants", _REFRESH_INTERVAL_SECONDS, table.refresh, initial_delay_seconds=10.0)
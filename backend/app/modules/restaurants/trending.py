@@ -0,0 +1,117 @@
+"""
+Trending restaurants: time-decayed recent activity.
+
+``Restaurant.trending_score`` is the sum of recent bookings, reviews and review likes, each
+weighted and decayed exponentially with its age (half-life ``_HALF_LIFE_DAYS``; events older
+than ``_WINDOW_DAYS`` are ignored). A periodic job recomputes the column, so the trending
+feed is a plain read of the ``(is_active, trending_score)`` index.
+
+Review likes have no timestamp of their own; they count from the review's last update.
+Only rows whose score changed are written (``updated_at`` is left alone: trending is not an
+edit), and one process at a time runs the job (the holder of the ``trending-scores`` lease,
+see ``app.core.leases``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import leases, scheduler
+from app.core.database import AsyncSessionLocal
+from app.modules.bookings.models import Booking, BookingStatus
+from app.modules.restaurants.models import Restaurant
+from app.modules.reviews.models import Review
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_INTERVAL_SECONDS = 900
+_LEASE_SECONDS = 3 * _REFRESH_INTERVAL_SECONDS
+_JOB = "trending-scores"
+_HALF_LIFE_DAYS = 7.0
+_WINDOW_DAYS = 30
+
+_BOOKING_WEIGHT = 3.0
+_REVIEW_WEIGHT = 2.0  # scaled by rating / 5
+_LIKE_WEIGHT = 0.5
+
+
+def decayed_scores(events: Iterable[tuple[str, datetime, float]], now: datetime) -> dict[str, float]:
+    """Sum of ``weight * 0.5 ** (age / half-life)`` per restaurant id."""
+    events = list(events)
+    if not events:
+        return {}
+    ids, inverse = np.unique([str(rid) for rid, _, _ in events], return_inverse=True)
+    age_days = np.fromiter(
+        ((now - at).total_seconds() / 86400.0 for _, at, _ in events), dtype=np.float64, count=len(events)
+    )
+    weights = np.fromiter((w for _, _, w in events), dtype=np.float64, count=len(events))
+    decayed = weights * np.power(0.5, np.clip(age_days, 0.0, None) / _HALF_LIFE_DAYS)
+    totals = np.bincount(inverse, weights=decayed, minlength=len(ids))
+    return {str(rid): round(float(score), 4) for rid, score in zip(ids, totals) if score > 0}
+
+
+async def recompute(db: AsyncSession) -> int:
+    """Recompute ``trending_score`` for every restaurant; returns how many are non-zero."""
+    now = datetime.utcnow()
+    since = now - timedelta(days=_WINDOW_DAYS)
+    bookings = (
+        await db.execute(
+            select(Booking.restaurant_id, Booking.created_at).where(
+                Booking.created_at >= since, Booking.status != BookingStatus.CANCELLED
+            )
+        )
+    ).all()
+    reviews = (
+        await db.execute(
+            select(Review.restaurant_id, Review.created_at, Review.updated_at, Review.rating, Review.likes).where(
+                or_(Review.created_at >= since, Review.updated_at >= since)
+            )
+        )
+    ).all()
+
+    events: list[tuple[str, datetime, float]] = [(rid, at, _BOOKING_WEIGHT) for rid, at in bookings if at]
+    for rid, created_at, updated_at, rating, likes in reviews:
+        if created_at and created_at >= since:
+            events.append((rid, created_at, _REVIEW_WEIGHT * float(rating or 0) / 5.0))
+        if likes:
+            events.append((rid, updated_at or created_at, _LIKE_WEIGHT * int(likes)))
+    scores = await asyncio.to_thread(decayed_scores, [e for e in events if e[1]], now)
+
+    # Restaurants whose activity left the window go back to 0.
+    current = (await db.execute(select(Restaurant.id).where(Restaurant.trending_score != 0))).scalars().all()
+    params = [{"rid": rid, "score": 0.0} for rid in current if rid not in scores]
+    params.extend({"rid": rid, "score": score} for rid, score in scores.items())
+    if params:
+        restaurants = Restaurant.__table__
+        await db.execute(
+            update(restaurants)
+            .where(
+                restaurants.c.id == bindparam("rid"),
+                or_(restaurants.c.trending_score.is_(None), restaurants.c.trending_score != bindparam("score")),
+            )
+            .values(trending_score=bindparam("score"), updated_at=restaurants.c.updated_at),
+            params,
+        )
+    return len(scores)
+
+
+async def _refresh() -> None:
+    if await leases.acquire(_JOB, _LEASE_SECONDS) is None:
+        return
+    async with AsyncSessionLocal() as db:
+        count = await recompute(db)
+        if not await leases.record(db, _JOB, last_run_at=datetime.utcnow()):
+            await db.rollback()
+            return
+        await db.commit()
+    logger.info("Trending scores recomputed (%d restaurants with recent activity)", count)
+
+
+scheduler.register("trending-scores", _REFRESH_INTERVAL_SECONDS, _refresh, initial_delay_seconds=15.0)
@@ -0,0 +1,7 @@
+"""
+Search module: global restaurant/dish search and typeahead autocomplete
+"""
+
+from app.modules.search.routes import router
+
+__all__ = ["router"]
@@ -0,0 +1,312 @@
+"""
+Typeahead suggestions served from memory.
+
+Every suggestion (restaurant name, cuisine, specialty, dish name) is indexed under the start
+of each of its words, in both the diacritic form ("bún bò huế", "bò huế", "huế") and the
+folded form ("bun bo hue", ...). All terms live in one sorted list, so a prefix lookup is a
+binary search plus a short bounded scan; matches are ranked by the popularity of the
+restaurants behind them. Prefixes matching more than ``_MAX_SCAN`` terms (short ones such as
+"b" or "qu") are ranked over all their matches once and the top ``_TOP_PER_PREFIX`` kept until
+the index next changes, so they are ranked by popularity rather than by alphabet.
+
+The index is built once from the DB, maintained incrementally from the restaurant/menu
+change feed, and fully rebuilt every ``_TTL_SECONDS`` to pick up writes from other workers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from bisect import bisect_left, insort
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.restaurants import changes
+from app.modules.restaurants.changes import MenuItemChange, RestaurantChange
+from app.modules.restaurants.models import MenuItem, Restaurant
+from app.shared.ranking import popularity
+from app.shared.text import fold_diacritics, has_diacritics, normalize_phrase
+
+KIND_RESTAURANT = "restaurant"
+KIND_CUISINE = "cuisine"
+KIND_SPECIALTY = "specialty"
+KIND_DISH = "dish"
+
+_TTL_SECONDS = 600
+_MAX_WORD_STARTS = 6  # index "bún bò huế" under at most this many word offsets
+_MAX_SCAN = 2000  # upper bound on terms inspected per lookup
+_TOP_PER_PREFIX = 20  # ranked matches cached per prefix past _MAX_SCAN (>= the route's max limit)
+
+SuggestionKey = tuple[str, str]  # (kind, restaurant id | normalized text)
+_Entry = tuple[str, SuggestionKey, int]  # (term, suggestion, word offset)
+
+
+def _terms(text: str) -> set[tuple[str, int]]:
+    phrase = normalize_phrase(text)
+    out: set[tuple[str, int]] = set()
+    for form in {phrase, fold_diacritics(phrase)}:
+        words = form.split()
+        for offset in range(min(len(words), _MAX_WORD_STARTS)):
+            out.add((" ".join(words[offset:]), offset))
+    return out
+
+
+class _Suggestion:
+    __slots__ = ("kind", "text", "restaurant_id", "sources")
+
+    def __init__(self, kind: str, text: str, restaurant_id: Optional[str]):
+        self.kind = kind
+        self.text = text
+        self.restaurant_id = restaurant_id
+        self.sources: dict[str, float] = {}
+
+    @property
+    def weight(self) -> float:
+        if not self.sources:
+            return 0.0
+        return max(self.sources.values()) + 4.0 * math.log1p(len(self.sources))
+
+
+class _DishRef:
+    __slots__ = ("restaurant_id", "name")
+
+    def __init__(self, restaurant_id: str, name: str):
+        self.restaurant_id = restaurant_id
+        self.name = name
+
+
+class AutocompleteIndex:
+    def __init__(self) -> None:
+        self._reset_state()
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _reset_state(self) -> None:
+        self._entries: list[_Entry] = []
+        self._suggestions: dict[SuggestionKey, _Suggestion] = {}
+        self._contrib: dict[str, list[SuggestionKey]] = {}  # source -> suggestions it feeds
+        self._restaurants: dict[str, float] = {}  # visible restaurant id -> popularity
+        self._dishes: dict[str, _DishRef] = {}  # visible menu item id -> ref
+        self._dishes_by_restaurant: dict[str, set[str]] = {}
+        self._top: dict[str, dict[SuggestionKey, int]] = {}  # prefix -> best matches, see _scan
+
+    # -- maintenance -------------------------------------------------------
+
+    def _attach(self, key: SuggestionKey, text: str, source: str, weight: float, *, bulk: bool) -> None:
+        self._top.clear()
+        suggestion = self._suggestions.get(key)
+        if suggestion is None:
+            suggestion = self._suggestions[key] = _Suggestion(
+                key[0], text, key[1] if key[0] == KIND_RESTAURANT else None
+            )
+            for term, offset in _terms(text):
+                if bulk:
+                    self._entries.append((term, key, offset))
+                else:
+                    insort(self._entries, (term, key, offset))
+        suggestion.sources[source] = weight
+
+    def _detach(self, key: SuggestionKey, source: str) -> None:
+        suggestion = self._suggestions.get(key)
+        if suggestion is None:
+            return
+        self._top.clear()
+        suggestion.sources.pop(source, None)
+        if suggestion.sources:
+            return
+        del self._suggestions[key]
+        for term, offset in _terms(suggestion.text):
+            entry = (term, key, offset)
+            pos = bisect_left(self._entries, entry)
+            if pos < len(self._entries) and self._entries[pos] == entry:
+                del self._entries[pos]
+
+    def _set_source(self, source: str, items: Iterable[tuple[SuggestionKey, str]], weight: float, *, bulk: bool = False) -> None:
+        for key in self._contrib.pop(source, ()):
+            self._detach(key, source)
+        keys: list[SuggestionKey] = []
+        for key, text in items:
+            if not key[1] or key in keys:
+                continue
+            self._attach(key, text, source, weight, bulk=bulk)
+            keys.append(key)
+        if keys:
+            self._contrib[source] = keys
+
+    def _index_restaurant(self, rid: str, name: str, cuisine: str, specialty: Iterable[str], weight: float, *, bulk: bool = False) -> None:
+        items: list[tuple[SuggestionKey, str]] = [((KIND_RESTAURANT, rid), name)]
+        if cuisine:
+            items.append(((KIND_CUISINE, fold_diacritics(normalize_phrase(cuisine))), cuisine))
+        for tag in specialty:
+            items.append(((KIND_SPECIALTY, fold_diacritics(normalize_phrase(tag))), tag))
+        self._restaurants[rid] = weight
+        self._set_source(rid, items, weight, bulk=bulk)
+        for mid in self._dishes_by_restaurant.get(rid, ()):
+            self._index_dish(mid, bulk=bulk)
+
+    def _index_dish(self, mid: str, *, bulk: bool = False) -> None:
+        ref = self._dishes.get(mid)
+        source = f"menu:{mid}"
+        weight = self._restaurants.get(ref.restaurant_id) if ref else None
+        if ref is None or weight is None:
+            self._set_source(source, (), 0.0)
+            return
+        key = (KIND_DISH, fold_diacritics(normalize_phrase(ref.name)))
+        self._set_source(source, [(key, ref.name)], weight, bulk=bulk)
+
+    def _drop_restaurant(self, rid: str) -> None:
+        self._restaurants.pop(rid, None)
+        self._set_source(rid, (), 0.0)
+        for mid in self._dishes_by_restaurant.get(rid, ()):
+            self._set_source(f"menu:{mid}", (), 0.0)
+
+    def _drop_dish(self, mid: str) -> None:
+        ref = self._dishes.pop(mid, None)
+        if ref is not None:
+            siblings = self._dishes_by_restaurant.get(ref.restaurant_id)
+            if siblings is not None:
+                siblings.discard(mid)
+        self._set_source(f"menu:{mid}", (), 0.0)
+
+    def on_changes(self, items: list[RestaurantChange]) -> None:
+        if not self._built_at:
+            return
+        for change in items:
+            if change.visible:
+                self._index_restaurant(
+                    change.id,
+                    change.name,
+                    change.cuisine,
+                    change.specialty,
+                    float(popularity(change.rating, change.review_count)),
+                )
+            else:
+                self._drop_restaurant(change.id)
+
+    def on_menu_changes(self, items: list[MenuItemChange]) -> None:
+        if not self._built_at:
+            return
+        for change in items:
+            self._drop_dish(change.id)
+            if not change.visible:
+                continue
+            self._dishes[change.id] = _DishRef(change.restaurant_id, change.name)
+            self._dishes_by_restaurant.setdefault(change.restaurant_id, set()).add(change.id)
+            self._index_dish(change.id)
+
+    def on_reset(self) -> None:
+        self._built_at = 0.0
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self._built_at and time.time() - self._built_at < _TTL_SECONDS:
+            return
+        async with self._lock:
+            now = time.time()
+            if self._built_at and now - self._built_at < _TTL_SECONDS:
+                return
+
+            restaurant_rows = (
+                await db.execute(
+                    select(
+                        Restaurant.id,
+                        Restaurant.name,
+                        Restaurant.cuisine,
+                        Restaurant.specialty,
+                        Restaurant.rating,
+                        Restaurant.review_count,
+                    ).where(Restaurant.is_active == True)
+                )
+            ).fetchall()
+            menu_rows = (
+                await db.execute(
+                    select(MenuItem.id, MenuItem.restaurant_id, MenuItem.name).where(
+                        MenuItem.is_available == True,
+                        MenuItem.is_approved == True,
+                    )
+                )
+            ).fetchall()
+
+            self._reset_state()
+            for mid, rid, name in menu_rows:
+                self._dishes[str(mid)] = _DishRef(str(rid), name or "")
+                self._dishes_by_restaurant.setdefault(str(rid), set()).add(str(mid))
+            for row in restaurant_rows:
+                specialty = row[3] if isinstance(row[3], list) else []
+                self._index_restaurant(
+                    str(row[0]),
+                    row[1] or "",
+                    row[2] or "",
+                    [str(t) for t in specialty if t],
+                    float(popularity(float(row[4] or 0.0), int(row[5] or 0))),
+                    bulk=True,
+                )
+            self._entries.sort()
+            self._built_at = now
+
+    # -- queries -----------------------------------------------------------
+
+    def _scan(self, prefix: str) -> dict[SuggestionKey, int]:
+        """Suggestion keys whose terms start with ``prefix`` -> best (lowest) word offset.
+
+        Past ``_MAX_SCAN`` terms, only the ``_TOP_PER_PREFIX`` best ranked matches (cached).
+        """
+        cached = self._top.get(prefix)
+        if cached is not None:
+            return cached
+        entries = self._entries
+        start = bisect_left(entries, (prefix,))
+        found = self._collect(start, min(len(entries), start + _MAX_SCAN), prefix)
+        end = start + _MAX_SCAN
+        if end >= len(entries) or not entries[end][0].startswith(prefix):
+            return found
+        found = self._collect(start, len(entries), prefix)
+        best = sorted(found.items(), key=lambda item: (item[1] > 0, -self._suggestions[item[0]].weight))
+        self._top[prefix] = top = dict(best[:_TOP_PER_PREFIX])
+        return top
+
+    def _collect(self, pos: int, end: int, prefix: str) -> dict[SuggestionKey, int]:
+        found: dict[SuggestionKey, int] = {}
+        entries = self._entries
+        while pos < end:
+            term, key, offset = entries[pos]
+            if not term.startswith(prefix):
+                break
+            if offset < found.get(key, _MAX_WORD_STARTS):
+                found[key] = offset
+            pos += 1
+        return found
+
+    def query(self, q: str, limit: int = 8) -> list[dict[str, Any]]:
+        phrase = normalize_phrase(q)
+        if not phrase:
+            return []
+        folded = fold_diacritics(phrase)
+
+        # Exact-tone matches rank above folded ones when the user typed diacritics.
+        ranked: dict[SuggestionKey, tuple[int, int]] = {}
+        if has_diacritics(phrase):
+            for key, offset in self._scan(phrase).items():
+                ranked[key] = (0, offset)
+        for key, offset in self._scan(folded).items():
+            ranked.setdefault(key, (1, offset))
+
+        def sort_key(item: tuple[SuggestionKey, tuple[int, int]]) -> tuple[int, bool, float]:
+            key, (tier, offset) = item
+            return (tier, offset > 0, -self._suggestions[key].weight)
+
+        out: list[dict[str, Any]] = []
+        for key, _ in sorted(ranked.items(), key=sort_key)[:limit]:
+            suggestion = self._suggestions[key]
+            entry: dict[str, Any] = {"type": suggestion.kind, "text": suggestion.text}
+            if suggestion.restaurant_id:
+                entry["restaurant_id"] = suggestion.restaurant_id
+            else:
+                entry["count"] = len(suggestion.sources)
+            out.append(entry)
+        return out
+
+
+index = changes.subscribe(AutocompleteIndex())
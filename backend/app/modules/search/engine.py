@@ -0,0 +1,340 @@
+"""
+Unified restaurant + dish search.
+
+Active restaurants and approved, available menu items are indexed together in memory: one
+inverted index per document kind (folded token -> doc ids) plus per-document field weights
+(name > cuisine/category/specialty > description). A query runs a restaurant leg and a dish
+leg; both return ranked, paginated hits, and dish hits carry their restaurant context
+straight from the index, so a search never touches the database once the index is warm.
+
+The index is loaded from the DB (restaurants and menu items in parallel), kept up to date
+from the restaurant/menu change feed and fully rebuilt every ``_TTL_SECONDS``.
+
+Query tokens are matched typo-tolerantly: unknown tokens expand to their nearest vocabulary
+terms through a trigram index (see ``fuzzy``), and a trailing partial token expands to the
+vocabulary terms it prefixes. Expanded matches score below exact ones.
+
+Query legs are pure-Python scans bound by the GIL, so they run inline on the event loop:
+worker threads would add two thread hops per query without running the legs in parallel.
+Running inline also means a leg never overlaps a change-feed update.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.modules.restaurants import changes
+from app.modules.restaurants.changes import MenuItemChange, RestaurantChange
+from app.modules.restaurants.models import MenuItem, Restaurant
+from app.modules.search.fuzzy import TrigramIndex
+from app.shared.ranking import popularity
+from app.shared.text import fold_diacritics
+
+_TTL_SECONDS = 600
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MAX_PREFIX_EXPANSIONS = 50  # vocabulary terms a trailing partial token may expand to
+
+# Field weights for a matched token.
+_W_NAME = 3.0
+_W_TAG = 2.0  # cuisine / specialty / dish category
+_W_TEXT = 1.0  # descriptions
+_FUZZY_PENALTY = 0.7  # multiplier for tokens matched through typo expansion
+
+# (typed token, vocabulary terms it may match)
+QueryGroup = tuple[str, tuple[str, ...]]
+
+
+def tokenize(text: Any) -> list[str]:
+    return _TOKEN_RE.findall(fold_diacritics(text))
+
+
+def _field_weights(fields: Iterable[tuple[Any, float]]) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for text, weight in fields:
+        for token in tokenize(text):
+            if weights.get(token, 0.0) < weight:
+                weights[token] = weight
+    return weights
+
+
+class _RestaurantDoc:
+    __slots__ = (
+        "id", "name", "cuisine", "address", "image", "rating", "review_count", "price_level", "tokens", "popularity"
+    )
+
+    def __init__(self, c: RestaurantChange):
+        self.id = c.id
+        self.name = c.name
+        self.cuisine = c.cuisine
+        self.address = c.address
+        self.image = c.image
+        self.rating = c.rating
+        self.review_count = c.review_count
+        self.price_level = c.price_level
+        self.tokens = _field_weights(
+            [(c.name, _W_NAME), (c.cuisine, _W_TAG), (" ".join(c.specialty), _W_TAG), (c.description, _W_TEXT)]
+        )
+        self.popularity = float(popularity(c.rating, c.review_count))
+
+    def context(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "cuisine": self.cuisine,
+            "address": self.address,
+            "rating": self.rating,
+            "review_count": self.review_count,
+            "price_level": self.price_level,
+            "image": self.image,
+        }
+
+
+class _DishDoc:
+    __slots__ = ("id", "restaurant_id", "name", "category", "price", "image", "tokens")
+
+    def __init__(self, c: MenuItemChange):
+        self.id = c.id
+        self.restaurant_id = c.restaurant_id
+        self.name = c.name
+        self.category = c.category
+        self.price = c.price
+        self.image = c.image
+        self.tokens = _field_weights([(c.name, _W_NAME), (c.category, _W_TAG), (c.description, _W_TEXT)])
+
+
+@dataclass
+class SearchPage:
+    hits: list[dict[str, Any]]
+    total: int
+
+
+class SearchEngine:
+    def __init__(self) -> None:
+        self._restaurants: dict[str, _RestaurantDoc] = {}
+        self._dishes: dict[str, _DishDoc] = {}
+        self._restaurant_postings: dict[str, set[str]] = {}
+        self._dish_postings: dict[str, set[str]] = {}
+        self._vocab: list[str] = []
+        self._vocab_dirty = False
+        self._trigrams = TrigramIndex()
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    # -- maintenance -------------------------------------------------------
+
+    def _post(self, postings: dict[str, set[str]], doc_id: str, tokens: Iterable[str]) -> None:
+        for token in tokens:
+            bucket = postings.get(token)
+            if bucket is None:
+                bucket = postings[token] = set()
+                self._trigrams.add(token)
+                self._vocab_dirty = True
+            bucket.add(doc_id)
+
+    def _unpost(self, postings: dict[str, set[str]], doc_id: str, tokens: Iterable[str]) -> None:
+        for token in tokens:
+            bucket = postings.get(token)
+            if bucket is None:
+                continue
+            bucket.discard(doc_id)
+            if not bucket:
+                del postings[token]
+                if token not in self._restaurant_postings and token not in self._dish_postings:
+                    self._trigrams.discard(token)
+                    self._vocab_dirty = True
+
+    def _put_restaurant(self, change: RestaurantChange) -> None:
+        old = self._restaurants.pop(change.id, None)
+        if old is not None:
+            self._unpost(self._restaurant_postings, old.id, old.tokens)
+        if not change.visible:
+            return
+        doc = _RestaurantDoc(change)
+        self._post(self._restaurant_postings, doc.id, doc.tokens)
+        self._restaurants[doc.id] = doc
+
+    def _put_dish(self, change: MenuItemChange) -> None:
+        old = self._dishes.pop(change.id, None)
+        if old is not None:
+            self._unpost(self._dish_postings, old.id, old.tokens)
+        if not change.visible:
+            return
+        doc = _DishDoc(change)
+        self._post(self._dish_postings, doc.id, doc.tokens)
+        self._dishes[doc.id] = doc
+
+    def on_changes(self, items: list[RestaurantChange]) -> None:
+        if not self._built_at:
+            return
+        for change in items:
+            self._put_restaurant(change)
+
+    def on_menu_changes(self, items: list[MenuItemChange]) -> None:
+        if not self._built_at:
+            return
+        for change in items:
+            self._put_dish(change)
+
+    def on_reset(self) -> None:
+        self._built_at = 0.0
+
+    @staticmethod
+    async def _load_restaurants() -> list[RestaurantChange]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Restaurant).where(Restaurant.is_active == True))
+            return [RestaurantChange.from_restaurant(r) for r in result.scalars().all()]
+
+    @staticmethod
+    async def _load_dishes() -> list[MenuItemChange]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(MenuItem).where(MenuItem.is_available == True, MenuItem.is_approved == True)
+            )
+            return [MenuItemChange.from_menu_item(m) for m in result.scalars().all()]
+
+    async def ensure_fresh(self) -> None:
+        if self._built_at and time.time() - self._built_at < _TTL_SECONDS:
+            return
+        async with self._lock:
+            now = time.time()
+            if self._built_at and now - self._built_at < _TTL_SECONDS:
+                return
+            restaurants, dishes = await asyncio.gather(self._load_restaurants(), self._load_dishes())
+
+            self._restaurants, self._dishes = {}, {}
+            self._restaurant_postings, self._dish_postings = {}, {}
+            self._trigrams = TrigramIndex()
+            for change in restaurants:
+                self._put_restaurant(change)
+            for change in dishes:
+                self._put_dish(change)
+            self._vocab_dirty = True
+            self._built_at = now
+
+    # -- queries -----------------------------------------------------------
+
+    def _vocabulary(self) -> list[str]:
+        if self._vocab_dirty:
+            self._vocab = sorted(set(self._restaurant_postings) | set(self._dish_postings))
+            self._vocab_dirty = False
+        return self._vocab
+
+    def _prefixed(self, partial: str) -> list[str]:
+        vocab = self._vocabulary()
+        pos = bisect_left(vocab, partial)
+        out: list[str] = []
+        while pos < len(vocab) and len(out) < _MAX_PREFIX_EXPANSIONS and vocab[pos].startswith(partial):
+            out.append(vocab[pos])
+            pos += 1
+        return out
+
+    def expand_query(self, query: str) -> list[QueryGroup]:
+        """
+        One group per query token. Known tokens match themselves, unknown ones their nearest
+        terms by edit distance; the trailing (possibly partial) token also matches prefixes.
+        """
+        tokens = tokenize(query)
+        groups: list[QueryGroup] = []
+        for pos, token in enumerate(tokens):
+            terms = self._trigrams.expand(token)
+            if pos == len(tokens) - 1:
+                terms = list(dict.fromkeys(self._prefixed(token) + terms))
+            groups.append((token, tuple(terms or [token])))
+        return groups
+
+    @staticmethod
+    def _match(postings: dict[str, set[str]], groups: list[QueryGroup]) -> set[str]:
+        """Doc ids matching every token group (AND across groups, OR inside a group)."""
+        matched: Optional[set[str]] = None
+        for _, terms in sorted(groups, key=lambda g: len(g[1])):
+            ids: set[str] = set()
+            for term in terms:
+                ids |= set(postings.get(term, ()))
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return set()
+        return matched or set()
+
+    @staticmethod
+    def _relevance(tokens: dict[str, float], groups: list[QueryGroup]) -> float:
+        total = 0.0
+        for typed, terms in groups:
+            total += max(tokens.get(t, 0.0) * (1.0 if t.startswith(typed) else _FUZZY_PENALTY) for t in terms)
+        return total / max(1, len(groups))
+
+    def search_restaurants(self, groups: list[QueryGroup], offset: int, limit: int) -> SearchPage:
+        scored: list[tuple[float, str]] = []
+        for rid in self._match(self._restaurant_postings, groups):
+            doc = self._restaurants.get(rid)
+            if doc is None:
+                continue
+            scored.append((self._relevance(doc.tokens, groups) * 30.0 + doc.popularity, rid))
+        scored.sort(reverse=True)
+
+        hits: list[dict[str, Any]] = []
+        for score, rid in scored[offset : offset + limit]:
+            doc = self._restaurants.get(rid)
+            if doc is not None:
+                hits.append({**doc.context(), "score": round(score, 3)})
+        return SearchPage(hits=hits, total=len(scored))
+
+    def search_dishes(self, groups: list[QueryGroup], offset: int, limit: int) -> SearchPage:
+        scored: list[tuple[float, str]] = []
+        for mid in self._match(self._dish_postings, groups):
+            doc = self._dishes.get(mid)
+            restaurant = self._restaurants.get(doc.restaurant_id) if doc else None
+            if doc is None or restaurant is None:
+                continue  # dish of an inactive/unknown restaurant
+            scored.append((self._relevance(doc.tokens, groups) * 30.0 + restaurant.popularity, mid))
+        scored.sort(reverse=True)
+
+        hits: list[dict[str, Any]] = []
+        for score, mid in scored[offset : offset + limit]:
+            doc = self._dishes.get(mid)
+            restaurant = self._restaurants.get(doc.restaurant_id) if doc else None
+            if doc is None or restaurant is None:
+                continue
+            hits.append(
+                {
+                    "id": doc.id,
+                    "restaurant_id": doc.restaurant_id,
+                    "name": doc.name,
+                    "category": doc.category,
+                    "price": doc.price,
+                    "image": doc.image,
+                    "score": round(score, 3),
+                    "restaurant": restaurant.context(),
+                }
+            )
+        return SearchPage(hits=hits, total=len(scored))
+
+    async def search(
+        self,
+        query: str,
+        *,
+        include_restaurants: bool = True,
+        include_dishes: bool = True,
+        page: int = 1,
+        limit: int = 10,
+    ) -> tuple[SearchPage, SearchPage]:
+        await self.ensure_fresh()
+        groups = self.expand_query(query)
+        empty = SearchPage(hits=[], total=0)
+        if not groups:
+            return empty, empty
+
+        offset = (page - 1) * limit
+        restaurants = self.search_restaurants(groups, offset, limit) if include_restaurants else empty
+        dishes = self.search_dishes(groups, offset, limit) if include_dishes else empty
+        return restaurants, dishes
+
+
+engine = changes.subscribe(SearchEngine())
@@ -0,0 +1,123 @@
+"""
+Typo-tolerant token expansion over a (diacritic-folded) vocabulary.
+
+Every vocabulary term is indexed by its character trigrams (padded like pg_trgm, so short
+terms still get a few grams). A query token that is not in the vocabulary is expanded to the
+nearest terms by edit distance: candidates are the terms sharing the most trigrams (capped),
+then a banded Levenshtein check keeps those within the allowed distance (capped again).
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Iterable
+
+_MAX_CANDIDATES = 64  # terms verified with edit distance per query token
+_MAX_EXPANSIONS = 3  # terms a single query token may expand to
+
+
+def trigrams(term: str) -> set[str]:
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edit_distance(token: str) -> int:
+    """Typos allowed for a token: none for 1-2 letters, 1 for a syllable, 2 for longer words."""
+    if len(token) <= 2:
+        return 0
+    if len(token) <= 5:
+        return 1
+    return 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` as soon as it is known to exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            )
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex:
+    def __init__(self, terms: Iterable[str] = ()) -> None:
+        self._terms: set[str] = set()
+        self._grams: dict[str, set[str]] = {}
+        for term in terms:
+            self.add(term)
+
+    def __contains__(self, term: object) -> bool:
+        return term in self._terms
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, term: str) -> None:
+        if not term or term in self._terms:
+            return
+        self._terms.add(term)
+        for gram in trigrams(term):
+            bucket = self._grams.get(gram)
+            if bucket is None:
+                bucket = self._grams[gram] = set()
+            bucket.add(term)
+
+    def discard(self, term: str) -> None:
+        if term not in self._terms:
+            return
+        self._terms.discard(term)
+        for gram in trigrams(term):
+            bucket = self._grams.get(gram)
+            if bucket is None:
+                continue
+            bucket.discard(term)
+            if not bucket:
+                del self._grams[gram]
+
+    def nearest(self, token: str, limit: int = _MAX_EXPANSIONS) -> list[tuple[str, int]]:
+        """Closest vocabulary terms as ``(term, distance)``, nearest first."""
+        max_dist = max_edit_distance(token)
+        if max_dist == 0:
+            return []
+
+        shared: dict[str, int] = {}
+        for gram in trigrams(token):
+            for term in self._grams.get(gram, ()):
+                if abs(len(term) - len(token)) <= max_dist:
+                    shared[term] = shared.get(term, 0) + 1
+        if not shared:
+            return []
+
+        candidates = sorted(shared.items(), key=lambda kv: -kv[1])[:_MAX_CANDIDATES]
+        matches: list[tuple[str, int]] = []
+        for term, _ in candidates:
+            dist = edit_distance(token, term, max_dist)
+            if dist <= max_dist:
+                matches.append((term, dist))
+        matches.sort(key=lambda kv: (kv[1], -shared[kv[0]], kv[0]))
+        return matches[:limit]
+
+    def expand(self, token: str) -> list[str]:
+        """``[token]`` when it is a known term, else its nearest terms (possibly empty)."""
+        if token in self._terms:
+            return [token]
+        return [term for term, _ in self.nearest(token)]
+
+    def approx_nbytes(self) -> int:
+        """Rough size of the Python containers and term strings held by the index."""
+        total = sys.getsizeof(self._terms) + sys.getsizeof(self._grams)
+        total += sum(sys.getsizeof(term) for term in self._terms)
+        total += sum(sys.getsizeof(gram) + sys.getsizeof(bucket) for gram, bucket in self._grams.items())
+        return total
@@ -0,0 +1,55 @@
+"""
+Search API routes
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.modules.search.autocomplete import index as autocomplete_index
+from app.modules.search.engine import engine as search_engine
+from app.shared.schemas import success_response
+
+router = APIRouter(tags=["Search"])
+
+
+@router.get("/autocomplete", response_model=dict)
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncSession = Depends(get_db),
+):
+    """Typeahead suggestions: restaurant names, cuisines, specialties and dishes."""
+    await autocomplete_index.ensure_fresh(db)
+    return success_response(
+        data={"query": q, "suggestions": autocomplete_index.query(q, limit)},
+        message="OK",
+    )
+
+
+@router.get("/search", response_model=dict)
+async def global_search(
+    query: str = Query(..., min_length=1),
+    type: str = Query("all", regex="^(all|restaurants|dishes)$"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Global search for restaurants and dishes (dish hits include their restaurant)."""
+    restaurants, dishes = await search_engine.search(
+        query,
+        include_restaurants=type in ("all", "restaurants"),
+        include_dishes=type in ("all", "dishes"),
+        page=page,
+        limit=limit,
+    )
+    return success_response(
+        data={
+            "restaurants": restaurants.hits,
+            "dishes": dishes.hits,
+            "total_restaurants": restaurants.total,
+            "total_dishes": dishes.total,
+            "total_results": restaurants.total + dishes.total,
+            "page": page,
+            "limit": limit,
+        },
+        message="Tìm kiếm thành công"
+    )
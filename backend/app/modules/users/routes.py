@@ -1,16 +1,17 @@
 """
 User API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, update
-from starlette.concurrency import run_in_threadpool
 import os
 import uuid
 
 from app.core.database import get_db
 from app.core.security import get_current_user_id, get_password_hash, verify_password
+from app.core.images import InvalidImage, store_variants
 from app.core.deps import require_admin
+from app.core.uploads import UploadRejected, multipart_openapi, receive_files
 from app.modules.auth.models import User, UserRole
 from app.modules.users.models import UserAddress
 from app.modules.users.schemas import (
@@ -25,8 +26,8 @@ from app.shared.schemas import success_response, error_response
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "smart-travel-images-2025")
 GCS_AVATAR_PREFIX = os.environ.get("GCS_AVATAR_PREFIX", "avatars")
+AVATAR_MAX_BYTES = 2 * 1024 * 1024
 
 
 @router.get("/profile", response_model=dict)
@@ -241,53 +242,45 @@ async def delete_address(
     return success_response(data={"deleted": True}, message="Đã xóa địa chỉ")
 
 
-@router.post("/avatar", response_model=dict)
+@router.post("/avatar", response_model=dict, openapi_extra=multipart_openapi("file"))
 async def upload_avatar(
-    file: UploadFile = File(...),
+    request: Request,
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload user avatar image to GCS and save avatar URL"""
-    if not file.content_type or not file.content_type.startswith("image/"):
-        return error_response("E4000", "File không hợp lệ (chỉ hỗ trợ ảnh)")
-
-    raw = await file.read()
-    if not raw:
-        return error_response("E4000", "File rỗng")
-    if len(raw) > 2 * 1024 * 1024:
-        return error_response("E4000", "Ảnh quá lớn (tối đa 2MB)")
-
-    content_type = file.content_type.lower()
-    ext_map = {
-        "image/jpeg": "jpg",
-        "image/jpg": "jpg",
-        "image/png": "png",
-        "image/webp": "webp",
-        "image/gif": "gif",
-    }
-    ext = ext_map.get(content_type)
-    if not ext:
-        return error_response("E4000", "Định dạng ảnh chưa được hỗ trợ")
-
+    """Upload user avatar image to object storage and save avatar URL"""
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if not user:
         return error_response("E3004", "Không tìm thấy người dùng")
 
-    object_name = f"{GCS_AVATAR_PREFIX}/{user_id}/{uuid.uuid4().hex}.{ext}"
-
+    # The body is streamed to a temporary file and cut off once it passes the 2MB limit.
     try:
-        from google.cloud import storage
-
-        client = storage.Client()
-        bucket = client.bucket(GCS_BUCKET_NAME)
-        blob = bucket.blob(object_name)
-        blob.cache_control = "public, max-age=31536000, immutable"
-        await run_in_threadpool(blob.upload_from_string, raw, content_type=content_type)
-    except Exception as e:
-        return error_response("E5000", "Không upload được avatar", {"error": str(e)})
-
-    avatar_url = f"https://storage.googleapis.com/{GCS_BUCKET_NAME}/{object_name}"
+        async with receive_files(request, max_file_bytes=AVATAR_MAX_BYTES, max_files=1) as files:
+            file = next((f for f in files if f.field_name == "file"), None)
+            if file is None:
+                return error_response("E4000", "Chưa chọn ảnh")
+            if not file.content_type.startswith("image/"):
+                return error_response("E4000", "File không hợp lệ (chỉ hỗ trợ ảnh)")
+            if file.too_large:
+                return error_response("E4000", "Ảnh quá lớn (tối đa 2MB)")
+            if not file.size:
+                return error_response("E4000", "File rỗng")
+            if file.content_type not in {"image/jpeg", "image/jpg", "image/png", "image/webp", "image/gif"}:
+                return error_response("E4000", "Định dạng ảnh chưa được hỗ trợ")
+
+            # Avatars are only shown small: store the "card" variant (resized, metadata stripped).
+            object_base = f"{GCS_AVATAR_PREFIX}/{user_id}/{uuid.uuid4().hex}"
+            try:
+                urls = await store_variants(object_base, file.path, names=("card",))
+            except InvalidImage:
+                return error_response("E4000", "File không hợp lệ (chỉ hỗ trợ ảnh)")
+            except Exception as e:
+                return error_response("E5000", "Không upload được avatar", {"error": str(e)})
+    except UploadRejected as e:
+        return error_response("E4000", e.message)
+
+    avatar_url = urls["card"]
     user.avatar = avatar_url
 
     await db.flush()
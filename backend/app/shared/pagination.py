@@ -0,0 +1,40 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row of a page, encoded as URL-safe base64 JSON. The
+next page is ``WHERE (sort columns) < cursor`` (or ``>``) in the same ORDER BY, which a
+matching composite index serves as a range scan no matter how deep the page is.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> Optional[list[Any]]:
+    """The values of a cursor made by ``encode_cursor``, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def after(columns: Sequence[Any], values: Sequence[Any], descending: bool):
+    """Filter for the rows strictly after ``values`` when ordering by ``columns``."""
+    key = tuple_(*columns)
+    bound = tuple_(*values)
+    return key < bound if descending else key > bound
@@ -0,0 +1,19 @@
+"""
+Ranking helpers shared by the search indexes and the chat recommender.
+"""
+
+from __future__ import annotations
+
+from typing import TypeVar
+
+import numpy as np
+
+_Num = TypeVar("_Num", float, np.ndarray)
+
+
+def popularity(rating: _Num, review_count: _Num) -> _Num:
+    """Rating (0-5) scaled by 10 plus a log-damped review-volume bonus.
+
+    Works element-wise on numpy arrays (the chat index) as well as on plain numbers.
+    """
+    return rating * 10.0 + np.log10(review_count + 1.0) * 8.0
@@ -2,7 +2,7 @@
 Base schemas for API responses
 """
 from pydantic import BaseModel
-from typing import Generic, TypeVar, Optional, List
+from typing import Any, Generic, TypeVar, Optional, List
 from datetime import datetime
 
 T = TypeVar("T")
@@ -96,3 +96,26 @@ def paginated_response(
             }
         }
     }
+
+
+def cursor_response(
+    data: Any,
+    next_cursor: Optional[str],
+    limit: int,
+    message: str = "Success"
+) -> dict:
+    """Create a keyset-paginated response (pass ``next_cursor`` back to get the next page)"""
+    return {
+        "success": True,
+        "data": data,
+        "message": message,
+        "error": None,
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "pagination": {
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None
+            }
+        }
+    }
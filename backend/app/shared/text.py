@@ -0,0 +1,25 @@
+"""
+Vietnamese text normalization helpers shared by the search indexes.
+"""
+import re
+import unicodedata
+from typing import Any
+
+_WORD_RE = re.compile(r"\w+", flags=re.UNICODE)
+
+
+def fold_diacritics(text: Any) -> str:
+    """Lowercase and strip tone marks/diacritics ("Bún bò Huế" -> "bun bo hue", "đ" -> "d")."""
+    raw = str(text or "").lower().replace("đ", "d")
+    normalized = unicodedata.normalize("NFKD", raw)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def normalize_phrase(text: Any) -> str:
+    """Lowercase (NFC) with collapsed whitespace and punctuation, diacritics kept."""
+    raw = unicodedata.normalize("NFC", str(text or "").lower())
+    return " ".join(_WORD_RE.findall(raw)).replace("_", " ").strip()
+
+
+def has_diacritics(text: str) -> bool:
+    return any(ord(ch) > 127 for ch in (text or ""))
@@ -1,22 +1,29 @@
 """
 Import restaurants from hcm_restaurants_with_local_images.json
 """
+import argparse
 import asyncio
 import json
-import uuid
-from datetime import datetime
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from itertools import islice
+from typing import Iterable, Iterator
 
 # Add parent to path
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
-from sqlalchemy import select, delete
-from app.core.database import AsyncSessionLocal, engine, Base
-from app.modules.auth.models import User
-from app.modules.restaurants.models import Restaurant, MenuItem
-from app.modules.reviews.models import Review
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal, init_db
 from app.core.security import get_password_hash
+# Register every mapped class referenced by relationships (User -> Review/ChatSession)
+from app.modules.auth.models import User, UserRole
+from app.modules.chat import models as _chat_models  # noqa: F401
+from app.modules.reviews import models as _review_models  # noqa: F401
+from app.modules.restaurants.importer import CatalogImporter, CatalogRow, content_hash, source_id_for
 
 
 def parse_price_level(price_level: str | None) -> int:
@@ -121,158 +128,288 @@ def build_restaurant_description(
     return " • ".join(parts)
 
 
-async def import_restaurants():
-    """Import restaurants from JSON file"""
-    # Read JSON file
-    json_path = Path(__file__).parent.parent / "hcm_restaurants_with_local_images.json"
-    
-    if not json_path.exists():
-        print(f"❌ File not found: {json_path}")
-        return
-    
-    print(f"📖 Reading {json_path}...")
-    with open(json_path, 'r', encoding='utf-8') as f:
-        restaurants_data = json.load(f)
-    
-    print(f"📊 Found {len(restaurants_data)} restaurants")
-    
-    # Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
+def build_catalog_row(data: dict) -> CatalogRow | None:
+    """Transform one raw JSON record into an upsertable catalog row."""
+    if not data.get("success", True):
+        return None
+
+    # Parse opening hours
+    open_time, close_time = parse_opening_hours(data.get("opening_hours"))
+
+    # Get images - prefer hosted_images, fallback to images
+    images = data.get("hosted_images", []) or data.get("images", [])
+    main_image = images[0] if images else None
+
+    cuisine = extract_cuisine_from_category(
+        data.get("category"),
+        data.get("food_tags"),
+    )
+    specialty = data.get("food_tags", [])
+    price_level = parse_price_level(data.get("price_level"))
+    website = data.get("website")
+
+    values = {
+        "name": data.get("name", "Unknown"),
+        "image": main_image,
+        "images": images[:5],  # Limit to 5 images
+        "cuisine": cuisine,
+        "rating": float(data.get("rating", 0)) if data.get("rating") else 0.0,
+        "review_count": data.get("rating_count", 0) or 0,
+        "price_level": price_level,
+        "open_time": open_time,
+        "close_time": close_time,
+        "specialty": specialty,
+        "description": build_restaurant_description(
+            cuisine=cuisine,
+            price_level=price_level,
+            open_time=open_time,
+            close_time=close_time,
+            specialty=specialty,
+        ),
+        "description_generated": True,
+        "address": data.get("address", ""),
+        "phone": data.get("phone"),
+        "website": website if website and not website.startswith("https://drive.google") else None,
+        "latitude": (data.get("coordinates") or {}).get("lat"),
+        "longitude": (data.get("coordinates") or {}).get("lon"),
+    }
+
+    # Imported comments become anonymous reviews with stable ids.
+    reviews = []
+    for idx, comment in enumerate((data.get("comments") or [])[:5]):  # Limit to 5 reviews per restaurant
+        if not comment.get("text"):
+            continue
+        reviews.append(
+            {
+                "key": f"{idx}:{comment.get('author')}:{comment.get('text')}",
+                "author_name": (comment.get("author") or "Khách hàng")[:255],
+                "rating": max(1, min(5, int(comment.get("rating", 4) or 4))),
+                "title": comment.get("author", "Review"),
+                "content": comment.get("text", ""),
+                "is_verified": True,
+                "visit_date": None,
+            }
+        )
+
+    return CatalogRow(
+        source_id=source_id_for(data),
+        content_hash=content_hash(data),
+        values=values,
+        reviews=reviews,
+    )
+
+
+def transform_chunk(records: list[dict]) -> list[CatalogRow]:
+    """Transform stage (runs in a worker process): raw records -> catalog rows."""
+    rows: list[CatalogRow] = []
+    for data in records:
+        row = build_catalog_row(data)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def iter_json_array(path: Path, read_size: int = 1 << 20) -> Iterator[dict]:
+    """Yield the elements of a top-level JSON array one by one, reading ``read_size`` chars
+    at a time, so the file is never loaded whole."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while not buf and (chunk := f.read(read_size)):
+            buf = chunk.lstrip()
+        if not buf.startswith("["):
+            raise ValueError(f"{path}: expected a JSON array of restaurants")
+        pos = 1
+        eof = False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = -1
+            if end == -1 or (end == len(buf) and not eof):
+                # Element cut off by the read boundary (or maybe a number): read more.
+                more = f.read(read_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            yield item
+            pos = end
+
+
+def iter_chunks(records: Iterable[dict], chunk_size: int) -> Iterator[list[dict]]:
+    """Reader stage: group streamed raw records into fixed-size chunks."""
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        yield chunk
+
+
+async def _transform_stage(
+    chunks: Iterator[list[dict]],
+    queue: asyncio.Queue,
+    pool: ProcessPoolExecutor | None,
+    max_in_flight: int,
+) -> None:
+    """Fan chunks out to the process pool and feed results (in order) into the bounded queue.
+
+    Backpressure: at most ``max_in_flight`` chunks are being transformed at once, and
+    ``queue.put`` blocks while the writer is behind, so memory stays bounded.
+    """
+    loop = asyncio.get_running_loop()
+    pending: deque[asyncio.Future] = deque()
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        if pool is None:
+            await queue.put(transform_chunk(chunk))
+            continue
+        pending.append(loop.run_in_executor(pool, transform_chunk, chunk))
+        if len(pending) >= max_in_flight:
+            await queue.put(await pending.popleft())
+    while pending:
+        await queue.put(await pending.popleft())
+    await queue.put(None)
+
+
+async def _write_stage(queue: asyncio.Queue, importer: CatalogImporter) -> None:
+    """Writer stage: upsert each transformed chunk and commit it."""
+    processed = 0
     async with AsyncSessionLocal() as db:
         try:
-            # Check if data already exists
-            existing = await db.execute(select(Restaurant).limit(1))
-            if existing.scalar():
-                print("⚠️  Database already has restaurants. Clearing...")
-                await db.execute(Restaurant.__table__.delete())
-                await db.execute(Review.__table__.delete())
+            await importer.load(db)
+            while True:
+                rows = await queue.get()
+                if rows is None:
+                    break
+                await importer.apply(db, rows)
                 await db.commit()
-            
-            # Ensure we have users for reviews
-            users_result = await db.execute(select(User))
-            users = users_result.scalars().all()
-            
-            if not users:
-                print("👤 Creating sample users...")
-                admin_user = User(
-                    id=str(uuid.uuid4()),
+
+                processed += len(rows)
+                print(f"   Processed {processed}...")
+
+            await importer.finish(db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def ensure_sample_users() -> None:
+    """Create the sample admin and user accounts on an empty database."""
+    async with AsyncSessionLocal() as db:
+        if (await db.execute(select(User.id).limit(1))).scalar() is not None:
+            return
+        print("👤 Creating sample users...")
+        db.add_all(
+            [
+                User(
                     email="admin@smarttravel.vn",
                     name="Admin",
                     hashed_password=get_password_hash("admin123"),
-                    role="admin",
+                    role=UserRole.ADMIN,
                     is_verified=True,
-                    is_active=True
-                )
-                regular_user = User(
-                    id=str(uuid.uuid4()),
+                    is_active=True,
+                ),
+                User(
                     email="user@example.com",
                     name="Nguyễn Văn A",
                     phone="0912345678",
                     hashed_password=get_password_hash("user123"),
-                    role="user",
+                    role=UserRole.USER,
                     is_verified=True,
-                    is_active=True
-                )
-                db.add_all([admin_user, regular_user])
-                await db.flush()
-                users = [admin_user, regular_user]
-            
-            # Import restaurants
-            print("🍜 Importing restaurants...")
-            imported_count = 0
-            review_count = 0
-            
-            for idx, data in enumerate(restaurants_data):
-                if not data.get("success", True):
-                    continue
-                
-                # Parse opening hours
-                open_time, close_time = parse_opening_hours(data.get("opening_hours"))
-                
-                # Get images - prefer hosted_images, fallback to images
-                images = data.get("hosted_images", []) or data.get("images", [])
-                main_image = images[0] if images else None
-                
-                # Create restaurant
-                cuisine = extract_cuisine_from_category(
-                    data.get("category"),
-                    data.get("food_tags"),
-                )
-                specialty = data.get("food_tags", [])
-
-                restaurant = Restaurant(
-                    id=str(uuid.uuid4()),
-                    name=data.get("name", "Unknown"),
-                    image=main_image,
-                    images=images[:5],  # Limit to 5 images
-                    cuisine=cuisine,
-                    rating=float(data.get("rating", 0)) if data.get("rating") else 0.0,
-                    review_count=data.get("rating_count", 0) or 0,
-                    price_level=parse_price_level(data.get("price_level")),
-                    open_time=open_time,
-                    close_time=close_time,
-                    is_open=True,
-                    specialty=specialty,
-                    description=build_restaurant_description(
-                        cuisine=cuisine,
-                        price_level=parse_price_level(data.get("price_level")),
-                        open_time=open_time,
-                        close_time=close_time,
-                        specialty=specialty,
-                    ),
-                    description_generated=True,
-                    address=data.get("address", ""),
-                    phone=data.get("phone"),
-                    email=None,
-                    website=data.get("website") if data.get("website") and not data.get("website", "").startswith("https://drive.google") else None,
-                    latitude=data.get("coordinates", {}).get("lat"),
-                    longitude=data.get("coordinates", {}).get("lon"),
-                    is_active=True
-                )
-
-                comments = data.get("comments", [])
-                
-                db.add(restaurant)
-                imported_count += 1
-                
-                # Import reviews from comments
-                for comment in comments[:5]:  # Limit to 5 reviews per restaurant
-                    if not comment.get("text"):
-                        continue
-                    
-                    # Use random user for review
-                    import random
-                    review_user = random.choice(users)
-                    
-                    review = Review(
-                        id=str(uuid.uuid4()),
-                        user_id=review_user.id,
-                        restaurant_id=restaurant.id,
-                        rating=int(comment.get("rating", 4)),
-                        title=comment.get("author", "Review"),
-                        content=comment.get("text", ""),
-                        is_verified=True,
-                        visit_date=None
-                    )
-                    db.add(review)
-                    review_count += 1
-                
-                # Progress indicator
-                if (idx + 1) % 50 == 0:
-                    print(f"   Processed {idx + 1}/{len(restaurants_data)}...")
-                    await db.flush()
-            
-            await db.commit()
-            print(f"✅ Successfully imported {imported_count} restaurants and {review_count} reviews!")
-            
-        except Exception as e:
-            await db.rollback()
-            print(f"❌ Error importing: {e}")
-            import traceback
-            traceback.print_exc()
+                    is_active=True,
+                ),
+            ]
+        )
+        await db.commit()
+
+
+async def import_restaurants(
+    json_path: Path | None = None,
+    deactivate_missing: bool = True,
+    workers: int | None = None,
+    chunk_size: int = 200,
+):
+    """Incrementally import restaurants from JSON file (insert new, update changed, deactivate removed).
+
+    Pipeline: streaming chunked reader -> process-pool transform -> bounded queue -> async bulk
+    writer; memory is bounded by the chunks in flight, not by the size of the file.
+    """
+    # Read JSON file
+    json_path = json_path or Path(__file__).parent.parent / "hcm_restaurants_with_local_images.json"
+    
+    if not json_path.exists():
+        print(f"❌ File not found: {json_path}")
+        return
+    
+    print(f"📖 Reading {json_path}...")
+
+    # Create tables
+    await init_db()
+    await ensure_sample_users()
+
+    workers = (os.cpu_count() or 1) if workers is None else max(0, workers)
+    max_in_flight = max(1, workers) * 2
+    importer = CatalogImporter(deactivate_missing=deactivate_missing)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+
+    print(f"🍜 Importing restaurants ({workers or 'no'} worker processes, chunks of {chunk_size})...")
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    error: BaseException | None = None
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(_transform_stage(iter_chunks(iter_json_array(json_path), chunk_size), queue, pool, max_in_flight))
+            tg.create_task(_write_stage(queue, importer))
+    except* Exception as eg:
+        error = eg.exceptions[0]
+        print(f"❌ Error importing: {error}")
+        import traceback
+        traceback.print_exception(error)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    if error is not None:
+        return None
+
+    stats = importer.stats
+    print(
+        f"✅ Import done: {stats.inserted} inserted, {stats.updated} updated, "
+        f"{stats.unchanged} unchanged, {stats.deactivated} deactivated, "
+        f"{stats.reviews_inserted} reviews added"
+    )
+    return stats
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Incrementally import restaurants from JSON")
+    parser.add_argument("--json", type=Path, default=None, help="Path to the restaurants JSON file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Transform worker processes (default: CPU count; 0 or 1 transforms in-process)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=200, help="Records per transform/write chunk")
+    parser.add_argument(
+        "--keep-missing",
+        action="store_true",
+        help="Do not deactivate restaurants that are missing from the file",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(import_restaurants())
+    args = _parse_args()
+    asyncio.run(
+        import_restaurants(
+            json_path=args.json,
+            deactivate_missing=not args.keep_missing,
+            workers=args.workers,
+            chunk_size=max(1, args.chunk_size),
+        )
+    )
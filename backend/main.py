@@ -2,13 +2,19 @@
 Smart Travel System - FastAPI Backend
 Main application entry point
 """
+import os
+from urllib.parse import urlparse
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from fastapi import Depends
 
+from app.core import retention, scheduler
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.core.rate_limit import RateLimitExceeded, rate_limit_exceeded_handler
 from app.core.deps import require_admin
 from app.modules.auth.models import User
 from app.modules.auth import router as auth_router
@@ -18,6 +24,7 @@ from app.modules.reviews import router as reviews_router
 from app.modules.chat import router as chat_router
 from app.modules.contact import router as contact_router
 from app.modules.pages import router as pages_router
+from app.modules.search import router as search_router
 
 
 @asynccontextmanager
@@ -27,10 +34,12 @@ async def lifespan(app: FastAPI):
     print(f"🚀 Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     await init_db()
     print("✅ Database initialized")
+    scheduler.start()
     
     yield
     
     # Shutdown
+    await scheduler.stop()
     await close_db()
     print("👋 Application shutdown complete")
 
@@ -45,6 +54,8 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -62,6 +73,17 @@ app.include_router(reviews_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
 app.include_router(contact_router, prefix="/api")
 app.include_router(pages_router, prefix="/api")
+app.include_router(search_router, prefix="/api")
+
+
+# Local object storage (development): serve uploaded files
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(settings.STORAGE_LOCAL_DIR, exist_ok=True)
+    app.mount(
+        urlparse(settings.STORAGE_LOCAL_BASE_URL).path or "/uploads",
+        StaticFiles(directory=settings.STORAGE_LOCAL_DIR),
+        name="uploads",
+    )
 
 
 # Health check endpoint
@@ -118,6 +140,12 @@ async def debug_db_info():
     return info
 
 
+@app.get("/api/admin/retention-stats")
+async def retention_stats(user: User = Depends(require_admin)):
+    """Counters of the chat session / OTP code retention job on this worker"""
+    return {"success": True, "data": retention.stats()}
+
+
 @app.post("/api/admin/migrate-db")
 async def migrate_db(user: User = Depends(require_admin)):
     """Run database migrations to add new columns"""
@@ -216,17 +244,22 @@ async def fix_encoding(user: User = Depends(require_admin)):
 
 @app.post("/api/admin/seed-data")
 async def seed_data(force: bool = False, user: User = Depends(require_admin)):
-    """Seed database with sample restaurant data - only restaurants with images"""
+    """Seed restaurant data - only restaurants with images.
+
+    Re-seeding (``force=true``) is incremental: restaurants are matched on their source
+    place id, unchanged rows are skipped, changed rows are updated in place and rows that
+    left the feed are deactivated, so ids, user reviews and bookings survive a refresh.
+    """
     import json
+    import random
     from pathlib import Path
-    from sqlalchemy import select, func, delete, text
-    from app.core.database import AsyncSessionLocal, Base, engine
-    from app.modules.restaurants.models import Restaurant, MenuItem
-    from app.modules.reviews.models import Review
+    from sqlalchemy import select, func
+    from app.core.database import AsyncSessionLocal, init_db
+    from app.modules.restaurants.models import Restaurant
+    from app.modules.restaurants.importer import CatalogImporter, CatalogRow, content_hash, source_id_for
     
-    # Ensure all tables exist (including reviews with new schema)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Ensure all tables/columns exist (including source_id/content_hash)
+    await init_db()
     
     async with AsyncSessionLocal() as session:
         # Check if data already exists
@@ -236,15 +269,6 @@ async def seed_data(force: bool = False, user: User = Depends(require_admin)):
         if count > 0 and not force:
             return {"message": f"Database already has {count} restaurants. Use ?force=true to reseed.", "seeded": False}
         
-        # Clear existing data if force=true
-        if force and count > 0:
-            try:
-                await session.execute(delete(Review))  # Delete reviews first (FK constraint)
-            except Exception:
-                pass  # Table might not exist
-            await session.execute(delete(Restaurant))
-            await session.commit()
-        
         # Load JSON data
         json_path = Path(__file__).parent / "hcm_restaurants_with_local_images.json"
         if not json_path.exists():
@@ -268,123 +292,118 @@ async def seed_data(force: bool = False, user: User = Depends(require_admin)):
                 return s[:max_len]
             return s
         
+        GCS_BASE = "https://storage.googleapis.com/smart-travel-images-2025/restaurants/"
+        price_mapping = {
+            "PRICE_LEVEL_FREE": 1, "PRICE_LEVEL_INEXPENSIVE": 1,
+            "PRICE_LEVEL_MODERATE": 2, "PRICE_LEVEL_EXPENSIVE": 3,
+            "PRICE_LEVEL_VERY_EXPENSIVE": 4
+        }
+        
+        def to_catalog_row(r: dict) -> CatalogRow:
+            # Convert restaurant name to filename format: replace spaces with _
+            rest_name = r.get("name", "Unknown")
+            filename_base = rest_name.strip().replace(" ", "_")
+            
+            price_level = r.get("price_level", 2)
+            if isinstance(price_level, str):
+                price_level = price_mapping.get(price_level, 2)
+            
+            # Generate up to 3 GCS image URLs from restaurant name
+            images_list = [
+                f"{GCS_BASE}{filename_base}_1.jpg",
+                f"{GCS_BASE}{filename_base}_2.jpg",
+                f"{GCS_BASE}{filename_base}_3.jpg"
+            ]
+            
+            # Ensure specialty is a proper list
+            specialty = r.get("specialty") or r.get("food_tags") or []
+            if not isinstance(specialty, list):
+                specialty = []
+            
+            # Generate realistic review count based on rating
+            rating = float(r.get("rating") or random.uniform(3.5, 5.0))
+            review_count = int(r.get("review_count") or r.get("user_ratings_total") or random.randint(10, 500))
+            
+            reviews = []
+            for idx, comment in enumerate((r.get("comments") or [])[:20]):  # Limit to 20 reviews per restaurant
+                try:
+                    review_rating = max(1, min(5, int(comment.get("rating", 5))))
+                except Exception:
+                    review_rating = 5
+                reviews.append({
+                    "key": f"{idx}:{comment.get('author')}:{comment.get('text')}",
+                    "author_name": truncate(comment.get("author", "Khách hàng"), 255),
+                    "rating": review_rating,
+                    "content": comment.get("text", "")[:2000] if comment.get("text") else "Đánh giá tốt",
+                    "visit_date": comment.get("date"),
+                    "likes": random.randint(0, 50),
+                    "is_verified": random.choice([True, False]),
+                })
+            
+            return CatalogRow(
+                source_id=source_id_for(r),
+                content_hash=content_hash(r),
+                values={
+                    "name": truncate(rest_name, 255),
+                    "image": truncate(images_list[0], 500),
+                    "images": images_list,
+                    "cuisine": truncate(r.get("cuisine") or r.get("category") or "Vietnamese", 100),
+                    "rating": round(rating, 1),
+                    "review_count": review_count,
+                    "price_level": int(price_level) if price_level else 2,
+                    "open_time": truncate(r.get("open_time", "07:00"), 10),
+                    "close_time": truncate(r.get("close_time", "22:00"), 10),
+                    "specialty": specialty,
+                    "description": r.get("description", ""),
+                    "address": truncate(r.get("address", ""), 500),
+                    "phone": truncate(r.get("phone", ""), 20),
+                    "latitude": float(r.get("latitude") or r.get("lat") or 10.7769),
+                    "longitude": float(r.get("longitude") or r.get("lng") or 106.7009),
+                },
+                reviews=reviews,
+            )
+        
+        importer = CatalogImporter()
+        await importer.load(session)
+        
         # Import only restaurants with matching images
-        import random
-        imported = 0
         skipped = 0
         errors = 0
+        chunk: list[CatalogRow] = []
         for r in restaurants_data:
+            # Skip if no matching image in GCS
+            filename_base = r.get("name", "Unknown").strip().replace(" ", "_")
+            if valid_image_names and filename_base not in valid_image_names:
+                skipped += 1
+                continue
             try:
-                # Generate filename from restaurant name
-                rest_name = r.get("name", "Unknown")
-                filename_base = rest_name.strip().replace(" ", "_")
-                
-                # Skip if no matching image in GCS
-                if valid_image_names and filename_base not in valid_image_names:
-                    skipped += 1
-                    continue
-                
-                # Parse price level
-                price_level = r.get("price_level", 2)
-                if isinstance(price_level, str):
-                    price_mapping = {
-                        "PRICE_LEVEL_FREE": 1, "PRICE_LEVEL_INEXPENSIVE": 1,
-                        "PRICE_LEVEL_MODERATE": 2, "PRICE_LEVEL_EXPENSIVE": 3,
-                        "PRICE_LEVEL_VERY_EXPENSIVE": 4
-                    }
-                    price_level = price_mapping.get(price_level, 2)
-                
-                # Generate GCS image URLs from restaurant name
-                # Convert restaurant name to filename format: replace spaces with _
-                import re
-                
-                GCS_BASE = "https://storage.googleapis.com/smart-travel-images-2025/restaurants/"
-                
-                # Get restaurant name and convert to filename format
-                rest_name = r.get("name", "Unknown")
-                # Replace spaces with underscore, keep Vietnamese chars and dashes
-                filename_base = rest_name.strip().replace(" ", "_")
-                
-                # Generate up to 3 image URLs
-                images_list = [
-                    f"{GCS_BASE}{filename_base}_1.jpg",
-                    f"{GCS_BASE}{filename_base}_2.jpg",
-                    f"{GCS_BASE}{filename_base}_3.jpg"
-                ]
-                image_url = images_list[0]
-                
-                # Ensure specialty is a proper list
-                specialty = r.get("specialty") or r.get("food_tags") or []
-                if not isinstance(specialty, list):
-                    specialty = []
-                
-                # Generate realistic review count based on rating
-                rating = float(r.get("rating") or random.uniform(3.5, 5.0))
-                review_count = int(r.get("review_count") or r.get("user_ratings_total") or random.randint(10, 500))
-                
-                restaurant = Restaurant(
-                    name=truncate(rest_name, 255),
-                    image=truncate(image_url, 500),
-                    images=images_list,  # Generated GCS URLs
-                    cuisine=truncate(r.get("cuisine") or r.get("category") or "Vietnamese", 100),
-                    rating=round(rating, 1),
-                    review_count=review_count,
-                    price_level=int(price_level) if price_level else 2,
-                    open_time=truncate(r.get("open_time", "07:00"), 10),
-                    close_time=truncate(r.get("close_time", "22:00"), 10),
-                    specialty=specialty,  # Use validated specialty list
-                    description=r.get("description", ""),
-                    address=truncate(r.get("address", ""), 500),
-                    phone=truncate(r.get("phone", ""), 20),
-                    latitude=float(r.get("latitude") or r.get("lat") or 10.7769),
-                    longitude=float(r.get("longitude") or r.get("lng") or 106.7009),
-                )
-                session.add(restaurant)
-                await session.flush()  # Get restaurant ID
-                
-                # Import reviews/comments for this restaurant
-                comments = r.get("comments") or []
-                for comment in comments[:20]:  # Limit to 20 reviews per restaurant
-                    try:
-                        review_rating = int(comment.get("rating", 5))
-                        if review_rating < 1:
-                            review_rating = 1
-                        elif review_rating > 5:
-                            review_rating = 5
-                        
-                        review = Review(
-                            restaurant_id=restaurant.id,
-                            author_name=truncate(comment.get("author", "Khách hàng"), 255),
-                            rating=review_rating,
-                            content=comment.get("text", "")[:2000] if comment.get("text") else "Đánh giá tốt",
-                            visit_date=comment.get("date"),
-                            likes=random.randint(0, 50),
-                            is_verified=random.choice([True, False]),
-                        )
-                        session.add(review)
-                    except Exception as rev_err:
-                        print(f"Error importing review: {rev_err}")
-                        continue
-                
-                imported += 1
-                
-                # Commit in batches to avoid memory issues
-                if imported % 50 == 0:
-                    await session.commit()
-                    
+                chunk.append(to_catalog_row(r))
             except Exception as e:
                 errors += 1
                 print(f"Error importing {r.get('name')}: {e}")
-                await session.rollback()
                 continue
+            
+            # Commit in batches to avoid memory issues
+            if len(chunk) >= 50:
+                await importer.apply(session, chunk)
+                await session.commit()
+                chunk = []
         
+        if chunk:
+            await importer.apply(session, chunk)
+        stats = await importer.finish(session)
         await session.commit()
         return {
-            "message": f"Seeded {imported} restaurants with images ({skipped} skipped - no images, {errors} errors)", 
+            "message": (
+                f"Seeded restaurants with images: {stats.inserted} inserted, {stats.updated} updated, "
+                f"{stats.unchanged} unchanged, {stats.deactivated} deactivated "
+                f"({skipped} skipped - no images, {errors} errors)"
+            ),
             "seeded": True, 
-            "imported": imported,
+            "imported": stats.inserted + stats.updated,
             "skipped": skipped,
-            "total": len(restaurants_data)
+            "total": len(restaurants_data),
+            **stats.as_dict(),
         }
 
 
@@ -646,6 +665,7 @@ async def deactivate_restaurants_without_photos(dry_run: bool = False, user: Use
     from sqlalchemy import select, update
 
     from app.core.database import AsyncSessionLocal
+    from app.modules.restaurants.changes import mark_catalog_reset
     from app.modules.restaurants.models import Restaurant
 
     json_path = Path(__file__).parent / "places_photo_index.json"
@@ -688,6 +708,8 @@ async def deactivate_restaurants_without_photos(dry_run: bool = False, user: Use
         result = await session.execute(
             update(Restaurant).where(Restaurant.id.in_(ids_without_photos)).values(is_active=False)
         )
+        # The bulk UPDATE bypasses the change feed: rebuild the in-memory catalog indexes.
+        mark_catalog_reset(session)
         await session.commit()
 
     return {